@@ -0,0 +1,107 @@
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class Overloaded(Exception):
+    """Raised when work can't be admitted; ``retry_after`` is a hint in seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Limit how much work of one kind runs at once, with a bounded wait queue.
+
+    Up to ``limit`` callers hold a slot at a time. Up to ``max_waiting`` more
+    wait for one in arrival order, for at most ``max_wait`` seconds; anyone
+    beyond that is rejected straight away with Overloaded, so a burst turns
+    into quick 429s instead of a growing pile of stuck threads.
+    """
+
+    def __init__(self, name, limit, max_waiting, max_wait):
+        self.name = name
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        # Moving average of how long a slot is held, for Retry-After
+        self._hold_avg = 1.0
+
+    def acquire(self):
+        """Wait for a slot; returns the seconds spent waiting."""
+        started = time.monotonic()
+        with self._cond:
+            if self._active < self.limit and not self._queue:
+                self._active += 1
+                self.admitted += 1
+                return 0.0
+            if len(self._queue) >= self.max_waiting:
+                self.rejected += 1
+                raise Overloaded(f'{self.name}: {self._active} running and {len(self._queue)} waiting',
+                                 self._retry_after_locked())
+            ticket = object()
+            self._queue.append(ticket)
+            try:
+                while self._queue[0] is not ticket or self._active >= self.limit:
+                    remaining = started + self.max_wait - time.monotonic()
+                    if remaining <= 0:
+                        self.timed_out += 1
+                        raise Overloaded(f'{self.name}: waited {self.max_wait:g}s for a slot',
+                                         self._retry_after_locked())
+                    self._cond.wait(remaining)
+            finally:
+                self._queue.remove(ticket)
+                # The next ticket may be able to go now (or after our timeout)
+                self._cond.notify_all()
+            self._active += 1
+            self.admitted += 1
+            waited = time.monotonic() - started
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            return waited
+
+    def release(self, held_for):
+        with self._cond:
+            self._active -= 1
+            self._hold_avg = 0.8 * self._hold_avg + 0.2 * held_for
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """Hold a slot for the duration of the block."""
+        self.acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def _retry_after_locked(self):
+        # Rough seconds until a slot frees up for a new caller
+        backlog = len(self._queue) + 1
+        return max(1, min(60, math.ceil(self._hold_avg * backlog / self.limit)))
+
+    def stats(self):
+        with self._cond:
+            return {
+                'limit': self.limit,
+                'active': self._active,
+                'waiting': len(self._queue),
+                'max_waiting': self.max_waiting,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'avg_wait': round(self.wait_total / self.admitted, 4) if self.admitted else 0.0,
+                'max_wait': round(self.wait_max, 4),
+            }
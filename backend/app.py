@@ -1,10 +1,43 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, g, request, jsonify, send_file
 from flask_cors import CORS
-import yt_dlp
+import requests
 import os
 import tempfile
 import uuid
 import subprocess
+import copy
+import secrets
+import json
+import math
+import threading
+import time
+from functools import wraps
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from admission import AdmissionController, Overloaded
+from batch import run_batch
+from cache import SharedTTLCache, TTLCache
+from deadline import Deadline, DeadlineExceeded
+from filelock import FileLock
+from formats import format_list, rank_formats, select_direct_format
+from jobs import JobManager, JobQueueFull
+from media_cache import MediaCache
+from metrics import Registry
+from prefetch import Prefetcher
+from ratelimit import AdaptiveScheduler
+from profiling import RequestProfiler
+from progress import DownloadAbandoned, ProgressHub
+from refresh import RefreshAhead
+from ydl_pool import YoutubeDLPool
+from zipstream import ZipStream
+from singleflight import SingleFlight, WaitTimeout
+from store import open_store
+import server_timing
+from streaming import media_headers, open_stream
+from utils import canonicalize_url, classify_failure, detect_platform, dir_size, parse_url_expiry
+from yt_dlp.utils import download_range_func, parse_duration
+from werkzeug.wsgi import ClosingIterator
 
 app = Flask(__name__)
 # Enable CORS for all routes with specific origins and methods
@@ -12,7 +45,9 @@ CORS(app, resources={
     r"/api/*": {
         "origins": ["http://localhost:3000", "http://127.0.0.1:3000"],
         "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type"]
+        "allow_headers": ["Content-Type", "Range"],
+        "expose_headers": ["Server-Timing", "X-Clipcut-Profile", "Content-Disposition", "Content-Range",
+                           "Accept-Ranges", "Retry-After"]
     }
 })
 
@@ -48,8 +83,6 @@ ydl_opts = {
     # TikTok specific options
     'extractor_retries': 5,
     'fragment_retries': 5,
-    'retry_sleep': 1,
-    'sleep_interval_requests': 2,
     'http_headers': {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
@@ -58,6 +91,364 @@ ydl_opts = {
     },
 }
 
+# yt-dlp options used by /api/video-info for TikTok URLs
+VIDEO_INFO_TIKTOK_OPTS = {
+    **ydl_opts,
+    'extract_flat': False,
+    'noplaylist': True,
+    'ignore_no_formats_error': True,
+    'force_generic_extractor': True,  # Try generic extractor
+    'extractor_retries': 3,
+    'fragment_retries': 3,
+    'retries': 3,
+    'sleep_interval': 1,
+    'max_sleep_interval': 3,
+    'extractor_args': {
+        'tiktok': {
+            'extract_flat': False,
+            'skip_download': True,
+            'extractor_retries': 3,
+        }
+    },
+    'http_headers': {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+        'Referer': 'https://www.tiktok.com/',
+        'Origin': 'https://www.tiktok.com',
+        'DNT': '1',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+        'Sec-Fetch-Dest': 'document',
+        'Sec-Fetch-Mode': 'navigate',
+        'Sec-Fetch-Site': 'none',
+        'Sec-Fetch-User': '?1',
+        'Cache-Control': 'max-age=0',
+        'TE': 'trailers',
+    },
+}
+
+# yt-dlp options for /api/tiktok-info (info only)
+TIKTOK_INFO_OPTS = {
+    'quiet': True,
+    'no_warnings': False,
+    'extract_flat': False,
+    'http_headers': {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'Referer': 'https://www.tiktok.com/',
+    }
+}
+
+# yt-dlp options for /api/instagram-info (info only)
+INSTAGRAM_INFO_OPTS = {
+    'quiet': True,
+    'no_warnings': False,
+    'extract_flat': False,
+    'http_headers': {
+        'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 15_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Mobile/15E148 Safari/604.1',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+        'Referer': 'https://www.instagram.com/',
+        'Origin': 'https://www.instagram.com',
+        'DNT': '1',
+        'x-requested-with': 'XMLHttpRequest'
+    }
+}
+
+# State shared by every backend process on the node (CLIPCUT_STORE, e.g.
+# sqlite:/var/lib/clipcut/state.db): metadata and negative cache entries,
+# stream tokens, job records and the media cache index. Unset, each process
+# keeps its own.
+shared_store = open_store(os.environ.get('CLIPCUT_STORE'))
+
+def shared_cache(namespace, maxsize, ttl):
+    """A TTLCache, written through to the shared store if there is one."""
+    if shared_store is None:
+        return TTLCache(maxsize=maxsize, ttl=ttl)
+    return SharedTTLCache(shared_store, namespace, maxsize=maxsize, ttl=ttl)
+
+# Metadata cache for extract_info results, keyed on the canonical URL.
+# TTLs are per platform (seconds) since signed media URLs expire at different
+# rates; each can be overridden with CLIPCUT_METADATA_TTL_<PLATFORM>.
+METADATA_CACHE_TTLS = {
+    platform: int(os.environ.get(f'CLIPCUT_METADATA_TTL_{platform.upper()}', ttl))
+    for platform, ttl in {
+        'youtube': 3600,
+        'twitter': 900,
+        'reddit': 900,
+        'tiktok': 300,
+        'instagram': 300,
+        'other': 600,
+    }.items()
+}
+metadata_cache = shared_cache(
+    'metadata',
+    maxsize=int(os.environ.get('CLIPCUT_METADATA_CACHE_SIZE', 1024)),
+    ttl=METADATA_CACHE_TTLS['other'],
+)
+
+# Cached entries are dropped this long before their first media URL expires,
+# so nobody is handed a link that dies mid-download
+EXPIRY_MARGIN = int(os.environ.get('CLIPCUT_EXPIRY_MARGIN', 30))
+
+def annotate_expiry(info):
+    """Set ``expires_at`` (unix time or None) on each format and on ``info``
+    itself, the latter being the earliest expiry of any of its URLs."""
+    expiries = []
+    for fmt in info.get('formats') or []:
+        fmt['expires_at'] = parse_url_expiry(fmt.get('url'))
+        if fmt['expires_at']:
+            expiries.append(fmt['expires_at'])
+    own = parse_url_expiry(info.get('url'))
+    if own:
+        expiries.append(own)
+    info['expires_at'] = min(expiries) if expiries else None
+    return info
+
+def get_cached_info(url):
+    """Return a private copy of the cached info dict for a URL, or None."""
+    key = canonicalize_url(url)
+    info = metadata_cache.get(key)
+    if info is None:
+        return None
+    refresher.hit(key)
+    return copy.deepcopy(info)
+
+def cache_info(url, info):
+    """Store an extract_info result under the URL's canonical form.
+
+    The platform TTL is shortened to the earliest signed-URL expiry found in
+    the info, and the entry is handed to the refresher so it can be
+    re-extracted ahead of whichever ends it first if it's popular.
+    """
+    if info:
+        key = canonicalize_url(url)
+        ttl = METADATA_CACHE_TTLS[detect_platform(key)]
+        expires_at = annotate_expiry(info)['expires_at']
+        if expires_at:
+            ttl = min(ttl, int(expires_at - time.time()) - EXPIRY_MARGIN)
+            if ttl <= 0:
+                return
+        metadata_cache.set(key, copy.deepcopy(info), ttl=ttl)
+        refresher.track(key, url, time.time() + ttl)
+
+# Negative cache: URLs that failed for a lasting reason (private, removed,
+# geo-blocked, unsupported) fail fast for a while instead of going through
+# yt-dlp's retries again. TTLs per reason, overridable with
+# CLIPCUT_NEGATIVE_TTL_<REASON>.
+NEGATIVE_CACHE_TTLS = {
+    reason: int(os.environ.get(f'CLIPCUT_NEGATIVE_TTL_{reason.upper()}', ttl))
+    for reason, ttl in {
+        'private': 300,
+        'unavailable': 600,
+        'geo_blocked': 600,
+        'unsupported': 3600,
+    }.items()
+}
+negative_cache = shared_cache(
+    'negative',
+    maxsize=int(os.environ.get('CLIPCUT_NEGATIVE_CACHE_SIZE', 4096)),
+    ttl=NEGATIVE_CACHE_TTLS['private'],
+)
+
+def remember_failure(url, error):
+    """Cache a classified extraction failure; transient errors are not cached."""
+    if isinstance(error, ExtractionFailed):
+        # Only the primary extractor's error counts: the last fallback runs
+        # the generic extractor, which calls nearly every URL unsupported
+        reason = classify_failure(error.error)
+        debug_error = error.debug_error
+        error = error.error
+    else:
+        reason = classify_failure(error)
+        debug_error = None
+    if reason:
+        print(f"Caching {reason} failure for {url} for {NEGATIVE_CACHE_TTLS[reason]}s")
+        negative_cache.set(canonicalize_url(url), {
+            'reason': reason,
+            'error': str(error),
+            'debug_error': str(debug_error) if debug_error else None,
+        }, ttl=NEGATIVE_CACHE_TTLS[reason])
+
+# Concurrent extractions/downloads of the same canonical URL share one
+# in-flight yt-dlp call instead of each hitting the upstream site
+inflight = SingleFlight()
+
+# Prometheus-style metrics served from /metrics. Stage latencies are labelled
+# by platform so a slow extractor shows up on its own.
+metrics_registry = Registry()
+stage_seconds = metrics_registry.histogram(
+    'clipcut_stage_duration_seconds',
+    'Time spent per request stage (normalize, extract_info, select_format, download, merge, serialize, send_file)')
+upstream_errors = metrics_registry.counter(
+    'clipcut_upstream_errors_total', 'Failed extractions and downloads by error type')
+requests_in_flight = metrics_registry.gauge(
+    'clipcut_requests_in_flight', 'Requests currently being handled, by endpoint')
+
+# Stage names as they appear in the Server-Timing response header
+SERVER_TIMING_NAMES = {
+    'normalize': 'normalize',
+    'extract_info': 'extract',
+    'select_format': 'select-format',
+    'download': 'download',
+    'merge': 'merge',
+    'serialize': 'serialize',
+}
+
+def record_stage(stage, seconds, platform):
+    """Feed a stage duration to the metrics and the Server-Timing header."""
+    stage_seconds.observe(seconds, stage=stage, platform=platform)
+    if stage in SERVER_TIMING_NAMES:
+        server_timing.record(SERVER_TIMING_NAMES[stage], seconds)
+
+@contextmanager
+def timed_stage(stage, platform):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started, platform)
+
+def call_when_sent(response, fn):
+    """Run ``fn()`` once the WSGI server is done sending ``response``.
+
+    send_file and streaming responses are direct passthrough, so
+    Response.call_on_close never runs for them; hook the body's own close(),
+    which the server calls, instead.
+    """
+    if not response.direct_passthrough:
+        response.call_on_close(fn)
+        return response
+    body = response.response
+    close = getattr(body, 'close', None)
+
+    def closed():
+        try:
+            if close:
+                close()
+        finally:
+            fn()
+
+    try:
+        # File wrappers: keeps the server's sendfile fast path
+        body.close = closed
+    except AttributeError:
+        # Generators don't take attributes; wrap them instead
+        response.response = ClosingIterator(body, fn)
+    return response
+
+def observe_until_close(response, stage, platform):
+    """Record a stage that lasts until the response body has been sent."""
+    started = time.perf_counter()
+    return call_when_sent(
+        response, lambda: stage_seconds.observe(time.perf_counter() - started, stage=stage, platform=platform))
+
+# Admission control: separate concurrency limits for metadata lookups and
+# downloads, each with a bounded wait queue. Requests that can't get a slot
+# within CLIPCUT_ADMISSION_MAX_WAIT seconds, or that find the queue full,
+# get a 429 with Retry-After instead of piling up.
+ADMISSION_MAX_WAIT = float(os.environ.get('CLIPCUT_ADMISSION_MAX_WAIT', 10))
+admission = {
+    'info': AdmissionController(
+        'info',
+        limit=int(os.environ.get('CLIPCUT_INFO_CONCURRENCY', 16)),
+        max_waiting=int(os.environ.get('CLIPCUT_INFO_QUEUE', 64)),
+        max_wait=ADMISSION_MAX_WAIT),
+    'download': AdmissionController(
+        'download',
+        limit=int(os.environ.get('CLIPCUT_DOWNLOAD_CONCURRENCY', 4)),
+        max_waiting=int(os.environ.get('CLIPCUT_DOWNLOAD_QUEUE', 16)),
+        max_wait=ADMISSION_MAX_WAIT),
+}
+admission_wait_seconds = metrics_registry.histogram(
+    'clipcut_admission_wait_seconds', 'Time requests waited for an admission slot, by kind')
+admission_rejections = metrics_registry.counter(
+    'clipcut_admission_rejected_total', 'Requests turned away with 429, by kind')
+
+def admitted(kind):
+    """Route decorator: hold a ``kind`` admission slot while the request runs.
+
+    The slot is kept until the response body has been sent, so a download
+    counts against the limit for as long as it uses bandwidth.
+    """
+    controller = admission[kind]
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                waited = controller.acquire()
+            except Overloaded as e:
+                print(f"Rejecting {request.path}: {str(e)}")
+                admission_rejections.inc(kind=kind)
+                response = jsonify({'error': 'Server is busy, try again later', 'type': 'overloaded'})
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response, 429
+            admission_wait_seconds.observe(waited, kind=kind)
+            if waited:
+                server_timing.record('queue', waited)
+            started = time.monotonic()
+            try:
+                response = app.make_response(view(*args, **kwargs))
+            except BaseException:
+                controller.release(time.monotonic() - started)
+                raise
+            return call_when_sent(response, lambda: controller.release(time.monotonic() - started))
+        return wrapper
+    return decorator
+
+# Upstream extract_info calls made through fetch_info, per platform. Lets us
+# check that a download costs one extraction (or none after a lookup).
+extraction_counts = {}
+_extraction_counts_lock = threading.Lock()
+
+def count_extraction(url):
+    platform = detect_platform(url)
+    with _extraction_counts_lock:
+        extraction_counts[platform] = extraction_counts.get(platform, 0) + 1
+
+def shared_call(key, fn, deadline=None):
+    """inflight.do, except that a caller joining someone else's call stops
+    waiting when its own deadline runs out."""
+    try:
+        return inflight.do(key, fn, timeout=deadline.remaining() if deadline else None)
+    except WaitTimeout:
+        raise DeadlineExceeded(f'Request deadline of {deadline.seconds:g}s exceeded')
+
+def fetch_info(url, extract, deadline=None):
+    """Return info for a URL from the cache, or from one shared extract() call."""
+    info = get_cached_info(url)
+    if info is not None:
+        server_timing.record('extract', 0, 'metadata cache hit')
+        return info
+    failure = negative_cache.get(canonicalize_url(url))
+    if failure is not None:
+        print(f"Negative cache hit for {url}: {failure['reason']}")
+        server_timing.record('extract', 0, 'negative cache hit')
+        raise ExtractionFailed(failure['error'], failure['debug_error'], reason=failure['reason'])
+
+    return copy.deepcopy(shared_call(('info', canonicalize_url(url)), lambda: extract_and_cache(url, extract), deadline))
+
+def extract_and_cache(url, extract):
+    """Run one upstream extraction for a URL and cache the outcome."""
+    count_extraction(url)
+    with timed_stage('extract_info', detect_platform(url)):
+        try:
+            result = extract()
+        except Exception as e:
+            remember_failure(url, e)
+            raise
+    cache_info(url, result)
+    return result
+
+def remove_file(path):
+    """Delete a downloaded file once nobody is serving it any more."""
+    try:
+        if path and os.path.exists(path):
+            os.remove(path)
+    except Exception as e:
+        print(f"Error cleaning up temporary file: {e}")
+
 def extract_video_info(info):
     """Extract video information from the yt-dlp info dict."""
     try:
@@ -153,40 +544,50 @@ def extract_video_info(info):
         print(f"Error extracting video info: {str(e)}")
         raise
 
-def debug_extractor_info(ydl, url):
-    """Debug function to get extractor information for a URL."""
-    try:
-        # First try to get the extractor info
-        ie_result = ydl.extract_info(url, download=False, process=False)
-        print(f"Extractor info: {ie_result}")
-        
-        # Then try to get the full info
-        full_info = ydl.extract_info(url, download=True, process=True)
-        print(f"Full info keys: {list(full_info.keys())}")
-        
-        return full_info
-    except Exception as e:
-        print(f"Debug extraction error: {str(e)}")
-        raise
+class ExtractionFailed(Exception):
+    """The primary extraction of a URL and every metadata-only fallback failed.
 
-@app.route('/api/instagram-download', methods=['POST'])
-def download_instagram():
-    data = request.get_json()
-    url = data.get('url')
-    
-    if not url:
-        return jsonify({'error': 'No URL provided'}), 400
+    ``error`` is the primary failure, ``debug_error`` the last fallback's.
+    ``reason`` is set for failures served from the negative cache.
+    """
 
-    print(f"\n=== Processing Instagram download for URL: {url} ===")
-    
-    # Create a temporary file to store the downloaded video
-    temp_file = os.path.join(tempfile.gettempdir(), f"instagram_{uuid.uuid4()}.mp4")
-    
-    try:
+    def __init__(self, error, debug_error, reason=None):
+        super().__init__(str(error))
+        self.error = error
+        self.debug_error = debug_error
+        self.reason = reason
+
+# Directory the generic download profile writes `%(id)s.%(ext)s` files into
+DOWNLOAD_DIR = os.path.join(tempfile.gettempdir(), 'clipcut_downloads')
+
+# yt-dlp format selector for each download profile
+DOWNLOAD_FORMATS = {
+    'generic': 'best[height<=480][ext=mp4]',
+    'reddit': 'best[height<=480][ext=mp4]',
+    'tiktok': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
+    'instagram': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
+}
+
+# Persistent cache of finished downloads, shared by every download route
+media_cache = MediaCache(
+    root=os.environ.get('CLIPCUT_MEDIA_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'clipcut_media_cache')),
+    max_bytes=int(os.environ.get('CLIPCUT_MEDIA_CACHE_BYTES', 5 * 1024 ** 3)),
+    store=shared_store,
+    partial_ttl=int(os.environ.get('CLIPCUT_PARTIAL_TTL', 24 * 3600)),
+)
+
+def download_profile_for(url):
+    """Pick the download profile matching a URL's platform."""
+    platform = detect_platform(url)
+    return platform if platform in DOWNLOAD_FORMATS else 'generic'
+
+def download_options(profile, outtmpl):
+    """Build the yt-dlp options for one of the download profiles."""
+    if profile == 'instagram':
         # Configure yt-dlp options for Instagram
-        ydl_opts = {
-            'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-            'outtmpl': temp_file,
+        return {
+            'format': DOWNLOAD_FORMATS['instagram'],
+            'outtmpl': outtmpl,
             'merge_output_format': 'mp4',
             'quiet': False,
             'no_warnings': False,
@@ -202,52 +603,584 @@ def download_instagram():
                 'x-requested-with': 'XMLHttpRequest'
             }
         }
-        
-        print(f"Downloading Instagram video with options: {ydl_opts}")
-        
+
+    if profile == 'tiktok':
+        # Configure yt-dlp options for TikTok
+        return {
+            'format': DOWNLOAD_FORMATS['tiktok'],
+            'outtmpl': outtmpl,
+            'merge_output_format': 'mp4',
+            'quiet': False,
+            'no_warnings': False,
+            'verbose': True,
+            'nocheckcertificate': True,
+            'http_headers': {
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+                'Accept-Language': 'en-US,en;q=0.5',
+                'Referer': 'https://www.tiktok.com/',
+                'Origin': 'https://www.tiktok.com',
+                'DNT': '1',
+            }
+        }
+
+    # Configure yt-dlp for downloading best quality up to 480p with audio;
+    # the generic and reddit profiles share these options
+    return {
+        **ydl_opts,
+        'format': DOWNLOAD_FORMATS['generic'],
+        'merge_output_format': 'mp4',
+        'outtmpl': outtmpl,
+        'noprogress': True,
+        # Add additional options for Reddit
+        'extractor_args': {
+            'reddit': {
+                'username': None,
+                'password': None,
+                'cookies': None,
+                'skip_auth': True,
+            },
+        },
+        'http_headers': {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+            'Accept-Language': 'en-US,en;q=0.5',
+            'Referer': 'https://www.reddit.com/',
+        },
+    }
+
+# Connections per download, by platform (CLIPCUT_CONNECTIONS_<PLATFORM>):
+# HLS/DASH fragments are fetched this many at a time and Range-capable HTTP
+# files are split into this many byte ranges. 1 keeps a single connection.
+DOWNLOAD_CONNECTIONS = {
+    platform: int(os.environ.get(f'CLIPCUT_CONNECTIONS_{platform.upper()}', connections))
+    for platform, connections in {
+        'youtube': 4,
+        'twitter': 4,
+        'reddit': 4,
+        'tiktok': 2,
+        'instagram': 2,
+        'other': 4,
+    }.items()
+}
+
+# Upstream request pacing per platform, replacing fixed sleeps between
+# requests and retries: (requests per second, burst), each overridable with
+# CLIPCUT_RATE_<PLATFORM>. Rates halve on 403/429 and recover as requests succeed.
+UPSTREAM_RATES = {
+    platform: (float(os.environ.get(f'CLIPCUT_RATE_{platform.upper()}', rate)), burst)
+    for platform, (rate, burst) in {
+        'youtube': (5, 10),
+        'twitter': (2, 5),
+        'reddit': (1, 4),
+        'tiktok': (1, 3),
+        'instagram': (0.5, 2),
+        'other': (5, 10),
+    }.items()
+}
+upstream_scheduler = AdaptiveScheduler(UPSTREAM_RATES)
+
+# Warm YoutubeDL instances per options profile, checked out per request
+YDL_POOL_SIZE = int(os.environ.get('CLIPCUT_YDL_POOL_SIZE', 4))
+ydl_pools = {
+    name: YoutubeDLPool(name, params, size=YDL_POOL_SIZE, scheduler=upstream_scheduler)
+    for name, params in {
+        'video-info': ydl_opts,
+        'video-info-tiktok': VIDEO_INFO_TIKTOK_OPTS,
+        'tiktok-info': TIKTOK_INFO_OPTS,
+        'instagram-info': INSTAGRAM_INFO_OPTS,
+        **{
+            profile: download_options(profile, os.path.join(DOWNLOAD_DIR, '%(id)s.%(ext)s'))
+            for profile in DOWNLOAD_FORMATS
+        },
+    }.items()
+}
+
+def warm_ydl_pools():
+    for pool in ydl_pools.values():
+        pool.warm()
+
+# Titles of cached files, for the Content-Disposition of alias hits
+media_titles = shared_cache('media_titles', maxsize=4096, ttl=7 * 24 * 3600)
+
+# Wall-clock budget per request, in seconds, by kind of route
+# (CLIPCUT_DEADLINE_<ROUTE>). Clients can pass "timeout" in the body (or
+# ?timeout=) to pick their own, up to CLIPCUT_DEADLINE_MAX.
+DEADLINE_DEFAULTS = {
+    route: float(os.environ.get(f'CLIPCUT_DEADLINE_{route.upper()}', seconds))
+    for route, seconds in {
+        'info': 30,
+        'download': 600,
+        'job': 1800,
+    }.items()
+}
+DEADLINE_MAX = float(os.environ.get('CLIPCUT_DEADLINE_MAX', 3600))
+# Share of a download's remaining time that extraction may use; whatever it
+# doesn't use is left for the download itself
+EXTRACT_DEADLINE_SHARE = 0.25
+
+def refresh_cached_info(url):
+    """Re-extract a cached URL with the same pool its info route uses.
+
+    Runs as background work under the info admission limit; returns False
+    when the server is too busy, so the refresher tries again next round.
+    """
+    platform = detect_platform(url)
+    deadline = Deadline(DEADLINE_DEFAULTS['info'])
+    if platform in ('tiktok', 'instagram'):
+        def extract():
+            with ydl_pools[f'{platform}-info'].checkout(deadline=deadline, platform=platform) as ydl:
+                return ydl.extract_info(url, download=False)
+    else:
+        prepared_url, profile = prepare_video_info_url(url)
+        extract = lambda: extract_with_fallback(prepared_url, profile, deadline)
+    try:
+        with admission['info'].slot():
+            shared_call(('info', canonicalize_url(url)), lambda: extract_and_cache(url, extract), deadline)
+    except Overloaded:
+        return False
+    return True
+
+# Popular metadata entries (CLIPCUT_REFRESH_MIN_HITS cache hits) are
+# re-extracted CLIPCUT_REFRESH_AHEAD seconds before their cache entry expires
+# (platform TTL or signed-URL expiry, whichever comes first), so they never drop out of the cache while people are using them
+refresher = RefreshAhead(
+    refresh_cached_info,
+    lead=int(os.environ.get('CLIPCUT_REFRESH_AHEAD', 120)),
+    min_hits=int(os.environ.get('CLIPCUT_REFRESH_MIN_HITS', 3)),
+    interval=int(os.environ.get('CLIPCUT_REFRESH_INTERVAL', 15)),
+)
+
+def parse_timeout(data, route):
+    """Deadline length for a request: its "timeout" or the route default."""
+    value = data.get('timeout') or request.args.get('timeout')
+    if value in (None, ''):
+        return DEADLINE_DEFAULTS[route]
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid timeout: {value}')
+    if not 0 < seconds <= DEADLINE_MAX:
+        raise ValueError(f'Timeout must be between 0 and {DEADLINE_MAX:g} seconds')
+    return seconds
+
+def timeout_response(error, url):
+    print(f"Deadline exceeded for {url}: {str(error)}")
+    upstream_errors.inc(type='timeout', platform=detect_platform(url))
+    return jsonify({'error': str(error), 'url': url, 'type': 'timeout'}), 504
+
+def cancelled_response(error, url):
+    print(f"Download of {url} abandoned: {str(error)}")
+    # 499: the client closed the request (nginx's convention)
+    return jsonify({'error': str(error), 'url': url, 'type': 'cancelled'}), 499
+
+# Live progress of blocking downloads for GET /api/progress/<id>. A download
+# whose clients have all closed their progress streams for
+# CLIPCUT_PROGRESS_GRACE seconds is cancelled.
+progress_hub = ProgressHub(grace=float(os.environ.get('CLIPCUT_PROGRESS_GRACE', 5)))
+PROGRESS_EVENT_RATE = float(os.environ.get('CLIPCUT_PROGRESS_RATE', 4))
+
+def perform_download(url, profile, output_dir=None, progress_hooks=None, clip=None, deadline=None,
+                     postprocessor_hooks=None, connections=None):
+    """Download a video with the given profile through the media cache.
+
+    Returns ``(filename, title)`` for the cached file, or None when yt-dlp
+    produced no info or no file. ``progress_hooks`` are passed straight to
+    yt-dlp so callers can track download progress, as are
+    ``postprocessor_hooks`` for the merge/remux steps. ``clip`` (from
+    parse_clip) limits the download to that time range. Raises
+    DeadlineExceeded once ``deadline`` (by default the download route's)
+    has passed. ``connections`` overrides the platform's connection count.
+    """
+    deadline = deadline or Deadline(DEADLINE_DEFAULTS['download'])
+    alias = f'{profile}:{canonicalize_url(url)}{clip_suffix(clip)}'
+    cached = media_cache.get_alias(alias)
+    if cached:
+        print(f"Media cache hit for {url}: {cached}")
+        server_timing.record('download', 0, 'media cache hit')
+        return cached, media_titles.get(cached, 'video')
+
+    # Stage the download next to the cache so publishing it is a rename
+    output_dir = output_dir or media_cache.staging_dir
+    if clip:
+        outtmpl = os.path.join(output_dir, f"clip_{uuid.uuid4()}.%(ext)s")
+    else:
+        # Stable per site, video and profile, so a retry (or the next run
+        # after a crash) continues the .part file left behind
+        outtmpl = os.path.join(output_dir, f'%(extractor_key)s_%(id)s_{profile}.%(ext)s')
+    os.makedirs(output_dir, exist_ok=True)
+
+    print(f"Downloading video with the {profile} profile to: {outtmpl}")
+
+    overrides = {}
+    if clip:
+        # Only fetch the requested range: ffmpeg seeks the input and, unless
+        # a precise cut was asked for, stream-copies from the nearest keyframe
+        end = float('inf') if clip['end'] is None else clip['end']
+        overrides['download_ranges'] = download_range_func(None, [(clip['start'], end)])
+        overrides['force_keyframes_at_cuts'] = clip['precise']
+
+    # Time the merge postprocessor separately from the download itself
+    merge = {'started': None, 'seconds': 0.0}
+    def merge_hook(d):
+        if 'Merger' not in (d.get('postprocessor') or ''):
+            return
+        if d.get('status') == 'started':
+            merge['started'] = time.perf_counter()
+        elif d.get('status') == 'finished' and merge['started'] is not None:
+            merge['seconds'] += time.perf_counter() - merge['started']
+
+    # The first progress callback marks the end of format selection
+    first_progress = {}
+    def first_progress_hook(d):
+        first_progress.setdefault('at', time.perf_counter())
+
+    platform = detect_platform(url)
+    filename = None
+    staging_lock = None
+    try:
         # Download the video using yt-dlp Python module
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            # Get video info first to check available formats
-            info = ydl.extract_info(url, download=False)
-            print(f"Available formats: {[f['format_id'] for f in info.get('formats', [])]}")
-            
+        with ydl_pools[profile].checkout(outtmpl=outtmpl,
+                                         progress_hooks=[first_progress_hook] + list(progress_hooks or ()),
+                                         postprocessor_hooks=[merge_hook] + list(postprocessor_hooks or ()),
+                                         deadline=deadline,
+                                         platform=platform, connections=connections or DOWNLOAD_CONNECTIONS[platform],
+                                         **overrides) as ydl:
+            # Extract once (or reuse the info from a recent /api/video-info
+            # lookup) and download from that resolved info dict
+            with deadline.stage(EXTRACT_DEADLINE_SHARE):
+                info = fetch_info(url, lambda: ydl.extract_info(url, download=False), deadline)
+            if not info:
+                return None
+            print(f"Available formats: {[f.get('format_id') for f in info.get('formats', [])]}")
+
+            # Different links to the same video share one cache entry
+            media_key = MediaCache.make_key(
+                info.get('extractor_key') or info.get('extractor'), info.get('id'),
+                DOWNLOAD_FORMATS[profile] + clip_suffix(clip))
+            cached = media_cache.get(media_key)
+            if cached:
+                print(f"Media cache hit for {url}: {cached}")
+                server_timing.record('download', 0, 'media cache hit')
+                media_cache.add_alias(alias, media_key)
+                return cached, info.get('title', 'video')
+
             # Download the video
-            ydl.download([url])
+            print(f"Starting download for URL: {info.get('webpage_url') or url}")
+            filename = ydl.prepare_filename(info)
+            if not clip:
+                # One writer per staged file across all processes; whoever
+                # waited here usually finds the file cached once it gets in
+                staging_lock = FileLock(os.path.splitext(filename)[0] + '.lock')
+                if not staging_lock.acquire(timeout=deadline.remaining()):
+                    raise DeadlineExceeded(f'Request deadline of {deadline.seconds:g}s exceeded '
+                                           f'waiting for another download of {url}')
+                cached = media_cache.get(media_key)
+                if cached:
+                    media_cache.add_alias(alias, media_key)
+                    return cached, info.get('title', 'video')
+            started = time.perf_counter()
+            downloaded = ydl.process_ie_result(info, download=True)
+            elapsed = time.perf_counter() - started
+            selecting = first_progress['at'] - started if 'at' in first_progress else 0.0
+            record_stage('select_format', selecting, platform)
+            record_stage('download', elapsed - selecting - merge['seconds'], platform)
+            if merge['started'] is not None:
+                record_stage('merge', merge['seconds'], platform)
+            requested = downloaded.get('requested_downloads') or [{}]
+            filename = requested[0].get('filepath') or ydl.prepare_filename(downloaded)
+
+        # Get the actual filename; merging may have changed the extension
+        base = os.path.splitext(filename)[0]
+        for candidate in [filename, base + '.mp4', base + '.mkv', base + '.webm']:
+            if os.path.exists(candidate):
+                cached = media_cache.put(media_key, candidate, alias=alias)
+                media_titles.set(cached, info.get('title', 'video'))
+                print(f"Download complete. File saved to: {cached}")
+                return cached, info.get('title', 'video')
+        return None
+    except Exception:
+        # Full downloads keep their partial files for the next attempt to
+        # resume; clips have one-off names, so nothing would pick them up
+        if clip:
+            remove_file(filename)
+            remove_file(filename and filename + '.part')
+        raise
+    finally:
+        if staging_lock is not None:
+            staging_lock.release()
+
+def shared_download(url, profile, clip=None, deadline=None, progress_id=None):
+    """perform_download, shared by concurrent requests for the same video
+    (and clip) and reporting to the caller's ``progress_id`` if it sent one."""
+    key = ('download', profile, canonicalize_url(url) + clip_suffix(clip))
+    # Joins a prefetch of the same video if one is running, at full speed
+    prefetcher.claim(key)
+    with progress_hub.track(key, progress_id) as download:
+        return shared_call(key, lambda: perform_download(
+            url, profile, clip=clip, deadline=deadline, progress_hooks=[download.progress_hook],
+            postprocessor_hooks=[download.postprocessor_hook]), deadline)
+
+# Speculative prefetch (CLIPCUT_PREFETCH=1): right after an info lookup, the
+# video is downloaded in the background with the profile its download route
+# uses, so the download request joins that fetch or finds the file cached.
+# Prefetches share CLIPCUT_PREFETCH_BANDWIDTH bytes/s and may leave at most
+# CLIPCUT_PREFETCH_DISK_BYTES of files nobody has asked for yet.
+PREFETCH_ENABLED = os.environ.get('CLIPCUT_PREFETCH', '0') == '1'
+prefetcher = Prefetcher(
+    concurrency=int(os.environ.get('CLIPCUT_PREFETCH_CONCURRENCY', 1)),
+    bandwidth=float(os.environ.get('CLIPCUT_PREFETCH_BANDWIDTH', 2 * 1024 * 1024)),
+    disk_budget=int(os.environ.get('CLIPCUT_PREFETCH_DISK_BYTES', 1024 ** 3)),
+    window=int(os.environ.get('CLIPCUT_PREFETCH_WINDOW', 600)),
+)
+
+def prefetch_download(url, stream_url=None):
+    """Start prefetching a video that was just looked up, if enabled.
+
+    Skipped when the lookup handed out a ``stream_url``, since the frontend
+    downloads through that instead, and while user downloads are using
+    every download slot or queueing for one.
+    """
+    if not PREFETCH_ENABLED or stream_url:
+        return
+    url = normalize_download_url(url)
+    profile = download_profile_for(url)
+    key = ('download', profile, canonicalize_url(url))
+
+    def fetch(hook):
+        # Tracked like a job so a request joining it gets progress events;
+        # one connection, so the hook's pacing holds
+        with progress_hub.track(key, cancellable=False) as download:
+            result = shared_call(key, lambda: perform_download(
+                url, profile, progress_hooks=[hook, download.progress_hook],
+                postprocessor_hooks=[download.postprocessor_hook], connections=1))
+        return os.path.getsize(result[0]) if result else None
+
+    downloads = admission['download'].stats()
+    busy = downloads['waiting'] > 0 or downloads['active'] >= downloads['limit']
+    if prefetcher.submit(key, fetch, busy=busy):
+        print(f"Prefetching {url} with the {profile} profile")
+
+# Single-file format selectors used when streaming; streaming cannot merge
+# separate video and audio tracks
+STREAM_FORMATS = {
+    'generic': DOWNLOAD_FORMATS['generic'],
+    'reddit': DOWNLOAD_FORMATS['reddit'],
+    'tiktok': 'best[ext=mp4]/best',
+    'instagram': 'best[ext=mp4]/best',
+}
+
+def parse_clip(data):
+    """Read the optional ``start``/``end`` clip bounds from a request body.
+
+    Bounds are seconds or ``[[hh:]mm:]ss`` strings; a missing end (None)
+    means "to the end of the video". ``precise`` re-encodes around the cut points
+    instead of cutting on the nearest keyframes with a stream copy. Returns
+    None for a full download; raises ValueError for an invalid range.
+    """
+    start, end = data.get('start'), data.get('end')
+    if start in (None, '') and end in (None, ''):
+        return None
+
+    def seconds(value, default):
+        if value in (None, ''):
+            return default
+        try:
+            parsed = parse_duration(value) if isinstance(value, str) else float(value)
+        except (TypeError, ValueError):
+            parsed = None
+        # NaN would pass every range check below, since its comparisons are false
+        if parsed is None or not math.isfinite(parsed):
+            raise ValueError(f'Invalid time: {value}')
+        return parsed
+
+    start, end = seconds(start, 0.0), seconds(end, None)
+    if start < 0 or (end is not None and end <= start):
+        raise ValueError(f'Invalid clip range: {start}-{end}')
+    return {'start': start, 'end': end, 'precise': bool(data.get('precise'))}
+
+def clip_suffix(clip):
+    """Cache/coalescing key suffix that tells clips of one video apart."""
+    if not clip:
+        return ''
+    end = 'end' if clip['end'] is None else f"{clip['end']:g}"
+    return f"@{clip['start']:g}-{end}{'!' if clip['precise'] else ''}"
+
+def wants_stream(data):
+    """True when the client asked for a streamed rather than staged download."""
+    return bool(data.get('stream')) or request.args.get('stream') in ('1', 'true')
+
+def resolve_stream_info(url, profile, deadline=None):
+    """Info for the single-file format a stream would use.
+
+    The info comes from fetch_info, so a stream right after /api/video-info
+    reuses that lookup; the stream format is then selected from it without
+    going upstream. Returns None when the selected format cannot be piped
+    straight through (it needs merging, or it is HLS/DASH rather than a plain
+    HTTP file).
+    """
+    with ydl_pools[profile].checkout(format=STREAM_FORMATS[profile], deadline=deadline,
+                                     platform=detect_platform(url)) as ydl:
+        info = fetch_info(url, lambda: ydl.extract_info(url, download=False), deadline)
+        if info:
+            info = ydl.process_ie_result(info, download=False)
+
+    if not info or info.get('requested_formats'):
+        return None
+    if info.get('protocol') not in ('http', 'https') or not info.get('url'):
+        return None
+    return info
+
+def stream_download(url, profile, deadline=None):
+    """Pipe the upstream media bytes straight into a chunked response.
+
+    Returns None if the video has no single-file format, in which case the
+    caller falls back to downloading it to disk first.
+    """
+    key = ('stream', profile, canonicalize_url(url))
+    info = shared_call(key, lambda: resolve_stream_info(url, profile, deadline), deadline)
+    if not info:
+        print(f"No single-file format to stream for {url}, falling back to download")
+        return None
+
+    print(f"Streaming {info.get('format_id')} from {info['url']}")
+    upstream, chunks = open_stream(info['url'],
+                                   headers=media_headers(info.get('http_headers'), info.get('cookies')))
+    headers = {
+        'Content-Disposition': f"attachment; filename=\"{info.get('id', 'video')}.{info.get('ext', 'mp4')}\"",
+    }
+    if upstream.headers.get('Content-Length') and not upstream.headers.get('Content-Encoding'):
+        headers['Content-Length'] = upstream.headers['Content-Length']
+    return Response(
+        chunks,
+        headers=headers,
+        mimetype=upstream.headers.get('Content-Type') or 'video/mp4',
+        direct_passthrough=True,
+    )
+
+# Direct-URL passthrough: info lookups pick a single-file format and hand out
+# a short-lived token for it; GET /api/stream/<token> then proxies its bytes
+# without running yt-dlp again.
+STREAM_TOKEN_TTL = int(os.environ.get('CLIPCUT_STREAM_TOKEN_TTL', 1800))
+stream_tokens = shared_cache('stream_tokens', maxsize=8192, ttl=STREAM_TOKEN_TTL)
+
+# Response headers passed through from the upstream media server
+STREAM_RESPONSE_HEADERS = ('Content-Type', 'Content-Length', 'Content-Range', 'Accept-Ranges',
+                           'Last-Modified', 'ETag')
+
+def issue_stream_token(info, records=None):
+    """Register the direct format of ``info`` for /api/stream; returns its path
+    or None. ``records`` is its rank_formats list, if the caller has one."""
+    fmt = select_direct_format(records if records is not None else rank_formats(info))
+    if not fmt:
+        return None
+    # A token is no use once the signed URL behind it has expired
+    ttl = STREAM_TOKEN_TTL
+    expires_at = fmt.expires_at
+    if expires_at:
+        ttl = min(ttl, int(expires_at - time.time()) - EXPIRY_MARGIN)
+        if ttl <= 0:
+            return None
+    token = secrets.token_urlsafe(16)
+    stream_tokens.set(token, {
+        'url': fmt.url,
+        'http_headers': fmt.source.get('http_headers') or info.get('http_headers') or {},
+        'cookies': fmt.source.get('cookies'),
+        'filename': f"{info.get('id') or 'video'}.{fmt.ext}",
+        'format_id': fmt.format_id,
+    }, ttl=ttl)
+    return f'/api/stream/{token}'
+
+@app.route('/api/stream/<token>', methods=['GET'])
+@admitted('download')
+def stream_direct(token):
+    entry = stream_tokens.get(token)
+    if not entry:
+        return jsonify({'error': 'Unknown or expired stream link, look the video up again',
+                        'type': 'stream_expired'}), 410
+
+    # Entries from before cookies were recorded have none
+    headers = media_headers(entry['http_headers'], entry.get('cookies'))
+    for name in ('Range', 'If-Range'):
+        if request.headers.get(name):
+            headers[name] = request.headers[name]
+
+    try:
+        upstream, chunks = open_stream(entry['url'], headers=headers)
+    except requests.HTTPError as e:
+        status = e.response.status_code
+        print(f"Upstream refused stream {token}: HTTP {status}")
+        if status == 416:
+            return Response(status=416, headers={'Content-Range': e.response.headers.get('Content-Range', '')})
+        if status in (403, 404, 410):
+            # The signed URL has expired or been revoked
+            stream_tokens.pop(token)
+            return jsonify({'error': 'Stream link has expired, look the video up again',
+                            'type': 'stream_expired'}), 410
+        return jsonify({'error': f'Upstream error: HTTP {status}', 'type': 'upstream_error'}), 502
+    except requests.RequestException as e:
+        print(f"Error opening stream {token}: {str(e)}")
+        return jsonify({'error': f'Upstream error: {str(e)}', 'type': 'upstream_error'}), 502
+
+    print(f"Proxying {entry['format_id']} ({upstream.status_code}) for stream {token}")
+    response_headers = {name: upstream.headers[name] for name in STREAM_RESPONSE_HEADERS
+                        if name in upstream.headers}
+    if upstream.headers.get('Content-Encoding'):
+        # requests decodes the body, so the upstream length no longer applies
+        response_headers.pop('Content-Length', None)
+    response_headers['Content-Disposition'] = f"attachment; filename=\"{entry['filename']}\""
+    return Response(chunks, status=upstream.status_code, headers=response_headers, direct_passthrough=True)
+
+@app.route('/api/instagram-download', methods=['POST'])
+@admitted('download')
+def download_instagram():
+    data = request.get_json()
+    url = data.get('url')
+    
+    if not url:
+        return jsonify({'error': 'No URL provided'}), 400
+
+    print(f"\n=== Processing Instagram download for URL: {url} ===")
+    
+    try:
+        clip = parse_clip(data)
+        deadline = Deadline(parse_timeout(data, 'download'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        if wants_stream(data) and not clip:
+            response = stream_download(url, 'instagram', deadline)
+            if response is not None:
+                return response
         
-        # Check if file was downloaded
-        if not os.path.exists(temp_file):
+        result = shared_download(url, 'instagram', clip, deadline, data.get('progress_id'))
+        if not result:
             return jsonify({'error': 'Download failed: No file was created'}), 500
-            
-        # Get the actual filename from the download
-        actual_file = temp_file
-        for ext in ['', '.mp4', '.mkv', '.webm']:
-            if os.path.exists(temp_file + ext):
-                actual_file = temp_file + ext
-                break
-                
-        print(f"Download complete. File saved to: {actual_file}")
+        actual_file, _ = result
         
-        # Send the file to the frontend
-        return send_file(
-            actual_file,
-            as_attachment=True,
-            download_name=os.path.basename(actual_file),
-            mimetype='video/mp4',
-            conditional=True
-        )
+        with media_cache.pinned(actual_file):
+            # Send the file to the frontend
+            response = send_file(
+                actual_file,
+                as_attachment=True,
+                download_name=os.path.basename(actual_file),
+                mimetype='video/mp4',
+                conditional=True
+            )
+            return observe_until_close(response, 'send_file', 'instagram')
 
+    except DownloadAbandoned as e:
+        return cancelled_response(e, url)
+    except DeadlineExceeded as e:
+        return timeout_response(e, url)
     except Exception as e:
         print(f"Error in download_instagram: {str(e)}")
+        upstream_errors.inc(type='download_error', platform='instagram')
         return jsonify({'error': f'Error downloading Instagram video: {str(e)}'}), 500
-    finally:
-        # Clean up the temporary file after sending
-        try:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-        except Exception as e:
-            print(f"Error cleaning up temporary file: {e}")
 
 @app.route('/api/tiktok-download', methods=['POST'])
+@admitted('download')
 def download_tiktok():
     data = request.get_json()
     url = data.get('url')
@@ -257,74 +1190,45 @@ def download_tiktok():
 
     print(f"\n=== Processing TikTok download for URL: {url} ===")
     
-    # Create a temporary file to store the downloaded video
-    temp_file = os.path.join(tempfile.gettempdir(), f"tiktok_{uuid.uuid4()}.mp4")
+    try:
+        clip = parse_clip(data)
+        deadline = Deadline(parse_timeout(data, 'download'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     try:
-        # Configure yt-dlp options
-        ydl_opts = {
-            'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-            'outtmpl': temp_file,
-            'merge_output_format': 'mp4',
-            'quiet': False,
-            'no_warnings': False,
-            'verbose': True,
-            'nocheckcertificate': True,
-            'http_headers': {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Referer': 'https://www.tiktok.com/',
-                'Origin': 'https://www.tiktok.com',
-                'DNT': '1',
-            }
-        }
-        
-        print(f"Downloading video with options: {ydl_opts}")
-        
-        # Download the video using yt-dlp Python module
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            # Get video info first to check available formats
-            info = ydl.extract_info(url, download=False)
-            print(f"Available formats: {[f['format_id'] for f in info.get('formats', [])]}")
-            
-            # Download the video
-            ydl.download([url])
+        if wants_stream(data) and not clip:
+            response = stream_download(url, 'tiktok', deadline)
+            if response is not None:
+                return response
         
-        # Check if file was downloaded
-        if not os.path.exists(temp_file):
+        result = shared_download(url, 'tiktok', clip, deadline, data.get('progress_id'))
+        if not result:
             return jsonify({'error': 'Download failed: No file was created'}), 500
-            
-        # Get the actual filename from the download
-        actual_file = temp_file
-        for ext in ['', '.mp4', '.mkv', '.webm']:
-            if os.path.exists(temp_file + ext):
-                actual_file = temp_file + ext
-                break
-                
-        print(f"Download complete. File saved to: {actual_file}")
+        actual_file, _ = result
         
-        # Send the file to the frontend
-        return send_file(
-            actual_file,
-            as_attachment=True,
-            download_name=os.path.basename(actual_file),
-            mimetype='video/mp4',
-            conditional=True
-        )
+        with media_cache.pinned(actual_file):
+            # Send the file to the frontend
+            response = send_file(
+                actual_file,
+                as_attachment=True,
+                download_name=os.path.basename(actual_file),
+                mimetype='video/mp4',
+                conditional=True
+            )
+            return observe_until_close(response, 'send_file', 'tiktok')
 
+    except DownloadAbandoned as e:
+        return cancelled_response(e, url)
+    except DeadlineExceeded as e:
+        return timeout_response(e, url)
     except Exception as e:
         print(f"Error in download_tiktok: {str(e)}")
+        upstream_errors.inc(type='download_error', platform='tiktok')
         return jsonify({'error': f'Error downloading TikTok: {str(e)}'}), 500
-    finally:
-        # Clean up the temporary file after sending
-        try:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-        except Exception as e:
-            print(f"Error cleaning up temporary file: {e}")
 
 @app.route('/api/instagram-info', methods=['POST'])
+@admitted('info')
 def get_instagram_info():
     data = request.get_json()
     url = data.get('url')
@@ -335,58 +1239,57 @@ def get_instagram_info():
     print(f"\n=== Processing Instagram URL with yt-dlp: {url} ===")
     
     try:
-        # Configure yt-dlp options for getting info only
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': False,
-            'extract_flat': False,
-            'http_headers': {
-                'User-Agent': 'Mozilla/5.0 (iPhone; CPU iPhone OS 15_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.0 Mobile/15E148 Safari/604.1',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Referer': 'https://www.instagram.com/',
-                'Origin': 'https://www.instagram.com',
-                'DNT': '1',
-                'x-requested-with': 'XMLHttpRequest'
-            }
-        }
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            # Get video info without downloading
-            info = ydl.extract_info(url, download=False)
-            
-            # Extract thumbnail URLs
-            thumbnails = []
-            if 'thumbnail' in info:
-                thumbnails.append({
-                    'url': info['thumbnail'],
-                    'width': 1080,  # Instagram thumbnails are typically square
-                    'height': 1080
-                })
+        deadline = Deadline(parse_timeout(data, 'info'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        def extract():
+            with ydl_pools['instagram-info'].checkout(deadline=deadline, platform=detect_platform(url)) as ydl:
+                # Get video info without downloading
+                return ydl.extract_info(url, download=False)
+
+        info = fetch_info(url, extract, deadline)
+
+        # Extract thumbnail URLs
+        thumbnails = []
+        if 'thumbnail' in info:
+            thumbnails.append({
+                'url': info['thumbnail'],
+                'width': 1080,  # Instagram thumbnails are typically square
+                'height': 1080
+            })
             
-            # Get the best thumbnail URL (highest resolution)
-            thumbnail_url = thumbnails[0]['url'] if thumbnails else None
+        # Get the best thumbnail URL (highest resolution)
+        thumbnail_url = thumbnails[0]['url'] if thumbnails else None
+        records = rank_formats(info)
             
-            # Prepare response data
-            response_data = {
-                'title': info.get('title', 'Instagram Video'),
-                'thumbnail': thumbnail_url,
-                'thumbnails': thumbnails,
-                'duration': info.get('duration'),
-                'uploader': info.get('uploader', 'Instagram User'),
-                'webpage_url': info.get('webpage_url', url),
-                'formats': info.get('formats', []),
-                'platform': 'instagram'
-            }
+        # Prepare response data
+        response_data = {
+            'title': info.get('title', 'Instagram Video'),
+            'thumbnail': thumbnail_url,
+            'thumbnails': thumbnails,
+            'duration': info.get('duration'),
+            'uploader': info.get('uploader', 'Instagram User'),
+            'webpage_url': info.get('webpage_url', url),
+            'formats': format_list(records),
+            'platform': 'instagram',
+            'stream_url': issue_stream_token(info, records),
+        }
             
-            print(f"Instagram info retrieved successfully. Thumbnail URL: {thumbnail_url}")
-            return jsonify(response_data)
+        print(f"Instagram info retrieved successfully. Thumbnail URL: {thumbnail_url}")
+        prefetch_download(url, response_data['stream_url'])
+        return jsonify(response_data)
             
+    except DeadlineExceeded as e:
+        return timeout_response(e, url)
     except Exception as e:
         print(f"Error in get_instagram_info: {str(e)}")
+        upstream_errors.inc(type='extraction_failed', platform='instagram')
         return jsonify({'error': f'Error getting Instagram info: {str(e)}'}), 500
 
 @app.route('/api/tiktok-info', methods=['POST'])
+@admitted('info')
 def get_tiktok_info():
     data = request.get_json()
     url = data.get('url')
@@ -397,225 +1300,97 @@ def get_tiktok_info():
     print(f"\n=== Processing TikTok URL with yt-dlp: {url} ===")
     
     try:
-        # Configure yt-dlp options for getting info only
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': False,
-            'extract_flat': False,
-            'http_headers': {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Referer': 'https://www.tiktok.com/',
-            }
-        }
-        
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            # Get video info without downloading
-            info = ydl.extract_info(url, download=False)
-            
-            # Extract thumbnail URLs - TikTok typically provides multiple sizes
-            thumbnails = []
-            if 'thumbnail' in info:
-                # Add the main thumbnail
-                thumbnails.append({
-                    'url': info['thumbnail'],
-                    'width': 720,  # Default width if not specified
-                    'height': 1280  # Default height if not specified
-                })
-            
-            # Look for thumbnails in the format list
-            if 'formats' in info:
-                for fmt in info['formats']:
-                    if fmt.get('ext') == 'm3u8' and 'thumbnail' in fmt:
-                        thumbnails.append({
-                            'url': fmt['thumbnail'],
-                            'width': fmt.get('width', 720),
-                            'height': fmt.get('height', 1280)
-                        })
-            
-            # If no thumbnails found in the usual places, try to construct from video ID
-            if not thumbnails and 'id' in info:
-                video_id = info['id']
-                thumbnails.append({
-                    'url': f'https://p16-sign.tiktokcdn-us.com/tos-useast5-avt-0068-tx/{video_id}~c5_720x720.jpeg',
-                    'width': 720,
-                    'height': 720
-                })
-            
-            # Sort thumbnails by resolution (width * height) in descending order
-            thumbnails.sort(key=lambda x: x.get('width', 0) * x.get('height', 0), reverse=True)
+        deadline = Deadline(parse_timeout(data, 'info'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        def extract():
+            with ydl_pools['tiktok-info'].checkout(deadline=deadline, platform=detect_platform(url)) as ydl:
+                # Get video info without downloading
+                return ydl.extract_info(url, download=False)
+
+        info = fetch_info(url, extract, deadline)
+        select_started = time.perf_counter()
+
+        # Extract thumbnail URLs - TikTok typically provides multiple sizes
+        thumbnails = []
+        if 'thumbnail' in info:
+            # Add the main thumbnail
+            thumbnails.append({
+                'url': info['thumbnail'],
+                'width': 720,  # Default width if not specified
+                'height': 1280  # Default height if not specified
+            })
             
-            # Get the best thumbnail URL (highest resolution)
-            thumbnail_url = thumbnails[0]['url'] if thumbnails else None
+        # Look for thumbnails in the format list
+        if 'formats' in info:
+            for fmt in info['formats']:
+                if fmt.get('ext') == 'm3u8' and 'thumbnail' in fmt:
+                    thumbnails.append({
+                        'url': fmt['thumbnail'],
+                        'width': fmt.get('width', 720),
+                        'height': fmt.get('height', 1280)
+                    })
             
-            # Prepare response data
-            response_data = {
-                'title': info.get('title', 'TikTok Video'),
-                'thumbnail': thumbnail_url,
-                'thumbnails': thumbnails,  # Include all available thumbnails
-                'duration': info.get('duration'),
-                'uploader': info.get('uploader', 'TikTok User'),
-                'webpage_url': info.get('webpage_url', url),
-                'formats': info.get('formats', []),
-                'platform': 'tiktok'  # Explicitly set platform
-            }
+        # If no thumbnails found in the usual places, try to construct from video ID
+        if not thumbnails and 'id' in info:
+            video_id = info['id']
+            thumbnails.append({
+                'url': f'https://p16-sign.tiktokcdn-us.com/tos-useast5-avt-0068-tx/{video_id}~c5_720x720.jpeg',
+                'width': 720,
+                'height': 720
+            })
             
-            print(f"TikTok info retrieved successfully. Thumbnail URL: {thumbnail_url}")
-            return jsonify(response_data)
+        # Sort thumbnails by resolution (width * height) in descending order
+        thumbnails.sort(key=lambda x: x.get('width', 0) * x.get('height', 0), reverse=True)
             
-        # Options to get all video information including all formats
-        ydl_opts_get_info = {
-            'quiet': False,
-            'no_warnings': False,
-            'extract_flat': False,  # Need individual formats
-            'force_generic_extractor': False,
-            'extractor_retries': 3,
-            'fragment_retries': 3,
-            'retries': 3,
-            'nocheckcertificate': True,
-            'ignoreerrors': False, 
-            'no_color': True,
-            'cachedir': False,
-            'noplaylist': True,
-            'extractor_args': {
-                'tiktok': {
-                    'extract_flat': False,
-                }
-            },
-            'http_headers': {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Referer': 'https://www.tiktok.com/',
-                'Origin': 'https://www.tiktok.com',
-                'DNT': '1',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'none',
-                'Sec-Fetch-User': '?1',
-                'Cache-Control': 'max-age=0',
-                'TE': 'trailers',
-            }
-        }
-
-        print(f"\n=== Getting all video info for TikTok URL: {url} ===")
-        with yt_dlp.YoutubeDL(ydl_opts_get_info) as ydl:
-            info = ydl.extract_info(url, download=False)
-
-        if not info:
-            print("ERROR: yt-dlp extract_info returned None or empty.")
-            return jsonify({'error': 'Failed to extract video information from TikTok. yt-dlp returned no data.'}), 500
-        
-        print(f"\n=== All Available Formats for {url} (from extract_info) ===")
-        if 'formats' in info and info['formats']:
-            for fmt_idx, fmt_detail in enumerate(info['formats']):
-                format_id = fmt_detail.get('format_id', 'N/A')
-                ext = fmt_detail.get('ext', 'N/A')
-                resolution = fmt_detail.get('resolution', 'N/A')
-                vcodec = fmt_detail.get('vcodec', 'none')
-                acodec = fmt_detail.get('acodec', 'none')
-                note = fmt_detail.get('format_note', '')
-                filesize = fmt_detail.get('filesize') or fmt_detail.get('filesize_approx')
-                filesize_str = f"{filesize / (1024*1024):.2f}MB" if filesize else "N/A"
-                has_url = 'present' if fmt_detail.get('url') else 'missing'
-                print(f"  [{fmt_idx}] ID: {format_id}, Ext: {ext}, Res: {resolution}, Vid: {vcodec}, Aud: {acodec}, Note: {note}, Size: {filesize_str}, URL: {has_url}")
-        else:
-            print("  No 'formats' array found in yt-dlp info or it's empty.")
-
-        # Programmatically select the best format
-        selected_format = None
-        candidates = []
-
-        if 'formats' in info and info['formats']:
-            for fmt_detail in info['formats']:
-                if fmt_detail.get('url') and fmt_detail.get('vcodec', 'none') != 'none' and fmt_detail.get('acodec', 'none') != 'none':
-                    candidates.append(fmt_detail)
-        
-        if candidates:
-            mp4_candidates = [f for f in candidates if f.get('ext') == 'mp4']
-            if mp4_candidates:
-                mp4_candidates.sort(key=lambda f: (int(f.get('height', 0) or 0), int(f.get('vbr', 0) or f.get('tbr', 0) or 0)), reverse=True)
-                selected_format = mp4_candidates[0]
-                print(f"Selected MP4 (with audio): ID {selected_format.get('format_id')}, Res {selected_format.get('resolution')}")
-
-            if not selected_format:
-                webm_candidates = [f for f in candidates if f.get('ext') == 'webm']
-                if webm_candidates:
-                    webm_candidates.sort(key=lambda f: (int(f.get('height', 0) or 0), int(f.get('vbr', 0) or f.get('tbr', 0) or 0)), reverse=True)
-                    selected_format = webm_candidates[0]
-                    print(f"Selected WebM (with audio): ID {selected_format.get('format_id')}, Res {selected_format.get('resolution')}")
+        # Get the best thumbnail URL (highest resolution)
+        thumbnail_url = thumbnails[0]['url'] if thumbnails else None
+        records = rank_formats(info)
             
-            if not selected_format: # Fallback to any candidate if specific extensions not found
-                candidates.sort(key=lambda f: (int(f.get('height', 0) or 0), int(f.get('vbr', 0) or f.get('tbr', 0) or 0)), reverse=True)
-                selected_format = candidates[0]
-                print(f"Selected best available (with audio, any extension): ID {selected_format.get('format_id')}, Res {selected_format.get('resolution')}")
-
-        # Prepare the response
-        video_data_to_return = {
+        # Prepare response data
+        response_data = {
             'title': info.get('title', 'TikTok Video'),
-            'thumbnail': info.get('thumbnail', ''),
-            'duration': info.get('duration', 0),
-            'uploader': info.get('uploader', ''),
+            'thumbnail': thumbnail_url,
+            'thumbnails': thumbnails,  # Include all available thumbnails
+            'duration': info.get('duration'),
+            'uploader': info.get('uploader', 'TikTok User'),
             'webpage_url': info.get('webpage_url', url),
-            'platform': 'tiktok',
-            'formats': [], 
-            'direct_url': None,
-            'selected_format_id': None,
-            'error_message': None
+            'formats': format_list(records),
+            'platform': 'tiktok',  # Explicitly set platform
+            'stream_url': issue_stream_token(info, records),
         }
-
-        if 'formats' in info and info['formats']:
-            for fmt_detail in info['formats']:
-                if fmt_detail.get('url'): 
-                    video_data_to_return['formats'].append({
-                        'url': fmt_detail['url'],
-                        'ext': fmt_detail.get('ext', 'N/A'),
-                        'format_note': fmt_detail.get('format_note', ''),
-                        'format_id': fmt_detail.get('format_id', 'N/A'),
-                        'resolution': fmt_detail.get('resolution', fmt_detail.get('height', '')),
-                        'filesize': fmt_detail.get('filesize') or fmt_detail.get('filesize_approx'),
-                        'vcodec': fmt_detail.get('vcodec', 'none'),
-                        'acodec': fmt_detail.get('acodec', 'none'),
-                        'tbr': fmt_detail.get('tbr')
-                    })
-            video_data_to_return['formats'].sort(key=lambda x: (
-                (int(str(x.get('resolution', '0x0')).split('x')[-1] or 0) if isinstance(x.get('resolution'), str) else int(x.get('resolution',0) or 0)),
-                int(x.get('tbr',0) or 0)
-            ), reverse=True)
-
-        if selected_format and selected_format.get('url'):
-            video_data_to_return['direct_url'] = selected_format['url']
-            video_data_to_return['selected_format_id'] = selected_format.get('format_id')
-            print(f"Final selected format URL for client: {video_data_to_return['direct_url']}")
-        else:
-            print("ERROR: No suitable downloadable format with video and audio found after manual selection.")
-            video_data_to_return['error_message'] = 'No downloadable video format with both video and audio found. Please check backend logs for all available formats.'
-            return jsonify(video_data_to_return), 404
-
-        return jsonify(video_data_to_return)
+        direct_format = select_direct_format(records)
+        if direct_format:
+            response_data['direct_url'] = direct_format.url
+            response_data['selected_format_id'] = direct_format.format_id
             
+        print(f"TikTok info retrieved successfully. Thumbnail URL: {thumbnail_url}")
+        prefetch_download(url, response_data['stream_url'])
+        record_stage('select_format', time.perf_counter() - select_started, 'tiktok')
+        with timed_stage('serialize', 'tiktok'):
+            response = jsonify(response_data)
+        return response
+            
+    except DeadlineExceeded as e:
+        return timeout_response(e, url)
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
         print(f"Error processing TikTok URL: {str(e)}\n{error_trace}")
+        upstream_errors.inc(type='tiktok_processing_error', platform='tiktok')
         return jsonify({
             'error': f'Failed to process TikTok video: {str(e)}',
             'type': 'tiktok_processing_error',
             'details': str(e)
         }), 400
 
-@app.route('/api/video-info', methods=['POST'])
-@app.route('/api/video-info/', methods=['POST'])
-def get_video_info():
-    data = request.get_json()
-    url = data.get('url')
-    
-    if not url:
-        return jsonify({'error': 'No URL provided'}), 400
-    
-    print(f"\n=== Processing URL: {url} ===")
-    
+def prepare_video_info_url(url):
+    """Apply the /api/video-info URL rewrites and pick the YoutubeDL pool.
+
+    Returns ``(url, profile)``.
+    """
     # Normalize URLs
     if 'x.com' in url or 'twitter.com' in url:
         url = url.replace('x.com', 'twitter.com')
@@ -632,220 +1407,255 @@ def get_video_info():
                 url = f'https://www.tiktok.com/@placeholder/video/{video_id}'
                 print(f"Reformatted TikTok URL to: {url}")
     
-    # Create a copy of ydl_opts to modify per request
-    request_ydl_opts = ydl_opts.copy()
-    
-    # Add TikTok specific options if needed
+    # TikTok URLs need their own extractor options
+    profile = 'video-info'
     if 'tiktok.com' in url or 'vm.tiktok.com' in url:
         print("Using TikTok-specific extractor options")
-        request_ydl_opts.update({
-            'extract_flat': False,
-            'noplaylist': True,
-            'ignore_no_formats_error': True,
-            'force_generic_extractor': True,  # Try generic extractor
-            'extractor_retries': 3,
-            'fragment_retries': 3,
-            'retries': 3,
-            'sleep_interval': 1,
-            'max_sleep_interval': 3,
-            'extractor_args': {
-                'tiktok': {
-                    'extract_flat': False,
-                    'skip_download': True,
-                    'extractor_retries': 3,
-                }
-            },
-            'http_headers': {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Referer': 'https://www.tiktok.com/',
-                'Origin': 'https://www.tiktok.com',
-                'DNT': '1',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'none',
-                'Sec-Fetch-User': '?1',
-                'Cache-Control': 'max-age=0',
-                'TE': 'trailers',
-            }
-        })
+        profile = 'video-info-tiktok'
+    return url, profile
+
+# Fallback attempts for /api/video-info never download media and run with
+# retries off and a short socket timeout, so a dead link costs seconds rather
+# than minutes. The whole chain stops once CLIPCUT_INFO_FALLBACK_BUDGET is spent.
+INFO_FALLBACK_TIMEOUT = float(os.environ.get('CLIPCUT_INFO_FALLBACK_TIMEOUT', 8))
+INFO_FALLBACK_BUDGET = float(os.environ.get('CLIPCUT_INFO_FALLBACK_BUDGET', 15))
+INFO_FALLBACK_OVERRIDES = {
+    'skip_download': True,
+    'extractor_retries': 0,
+    'retries': 0,
+    'sleep_interval': 0,
+    'max_sleep_interval': 0,
+}
+
+def info_fallbacks(url, profile):
+    """Yield ``(pool name, ie_key)`` to try after the primary profile fails.
+
+    First the site's dedicated info profile, if it has one, then yt-dlp's
+    generic extractor. ``ie_key`` is passed to extract_info, which ignores
+    the force_generic_extractor param and only honours its arguments.
+    """
+    platform = detect_platform(url)
+    if platform == 'tiktok':
+        yield 'tiktok-info', None
+    elif platform == 'instagram':
+        yield 'instagram-info', None
+    yield 'video-info', 'Generic'
+
+def extract_with_fallback(url, profile, deadline=None):
+    """Run extract_info for /api/video-info, falling back to other profiles.
+
+    Returns the info dict, or None if every attempt came back empty. Raises
+    ExtractionFailed if the primary attempt raised and no fallback succeeded,
+    and DeadlineExceeded once ``deadline`` (by default the info route's) has
+    passed.
+    """
+    deadline = deadline or Deadline(DEADLINE_DEFAULTS['info'])
+    error = None
+    try:
+        print("Attempting to get video info...")
+        with ydl_pools[profile].checkout(skip_download=True, deadline=deadline,
+                                         platform=detect_platform(url)) as ydl:
+            info = ydl.extract_info(url, download=False)
+        if info:
+            print(f"Successfully got info, keys: {list(info.keys())}")
+            print(f"Available formats: {[f.get('ext') for f in info.get('formats', []) if f.get('ext')]}")
+            return info
+        print("No info returned, trying fallback profiles...")
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        print(f"Error extracting info: {str(e)}")
+        if classify_failure(e) in ('private', 'unavailable', 'geo_blocked'):
+            # Another extractor won't see a private or removed video either
+            raise ExtractionFailed(e, None)
+        error = e
+
+    budget_ends = time.monotonic() + min(INFO_FALLBACK_BUDGET, deadline.remaining())
+    fallback_error = None
+    for pool_name, ie_key in info_fallbacks(url, profile):
+        remaining = budget_ends - time.monotonic()
+        if remaining <= 1:
+            print("Fallback budget spent, giving up")
+            break
+        print(f"Trying the {pool_name} profile{' (generic extractor)' if ie_key else ''}...")
+        try:
+            with ydl_pools[pool_name].checkout(
+                    socket_timeout=min(INFO_FALLBACK_TIMEOUT, remaining), deadline=deadline,
+                    platform=detect_platform(url), **INFO_FALLBACK_OVERRIDES) as ydl:
+                info = ydl.extract_info(url, download=False, ie_key=ie_key)
+            if info:
+                print(f"Fallback {pool_name} succeeded, keys: {list(info.keys())}")
+                return info
+        except DeadlineExceeded:
+            raise
+        except Exception as fallback_e:
+            print(f"Fallback {pool_name} failed: {str(fallback_e)}")
+            fallback_error = fallback_e
+
+    if error is not None:
+        raise ExtractionFailed(error, fallback_error)
+    return None
+
+@app.route('/api/video-info', methods=['POST'])
+@app.route('/api/video-info/', methods=['POST'])
+@admitted('info')
+def get_video_info():
+    data = request.get_json()
+    url = data.get('url')
+    
+    if not url:
+        return jsonify({'error': 'No URL provided'}), 400
+    
+    print(f"\n=== Processing URL: {url} ===")
     
     try:
-        with yt_dlp.YoutubeDL(request_ydl_opts) as ydl:
-            # First, try to get basic info without downloading
-            try:
-                print("Attempting to get video info...")
-                info = ydl.extract_info(url, download=False)
-                
-                if not info:
-                    print("No info returned, trying with download=True...")
-                    info = ydl.extract_info(url, download=True)
-                
-                if not info:
-                    print("No video information found (empty response)")
-                    return jsonify({
-                        'error': 'No video information found (empty response)',
-                        'url': url,
-                        'type': 'empty_response'
-                    }), 400
-                    
-                print(f"Successfully got info, keys: {list(info.keys())}")
-                print(f"Available formats: {[f.get('ext') for f in info.get('formats', []) if f.get('ext')]}")
-                
-            except Exception as e:
-                print(f"Error extracting info: {str(e)}")
-                # Try debug extraction
-                try:
-                    print("Trying debug extraction...")
-                    info = debug_extractor_info(ydl, url)
-                    if not info:
-                        raise Exception("Debug extraction returned no data")
-                except Exception as debug_e:
-                    print(f"Debug extraction failed: {str(debug_e)}")
-                    return jsonify({
-                        'error': f'Failed to extract video info: {str(e)}',
-                        'debug_error': str(debug_e),
-                        'url': url,
-                        'type': 'extraction_failed'
-                    }), 400
-            
-            try:
-                video_info = extract_video_info(info)
-                print(f"Extracted video info: {video_info.keys() if video_info else 'None'}")
-                if not video_info:
-                    raise Exception("No video info extracted")
-            except Exception as e:
-                print(f"Error in extract_video_info: {str(e)}")
-                return jsonify({
-                    'error': f'Error processing video info: {str(e)}',
-                    'url': url,
-                    'type': 'processing_error'
-                }), 400
-            
-            # Determine platform
-            extractor = info.get('extractor', '').lower()
-            webpage_url = info.get('webpage_url', '').lower()
-            
-            if 'youtube' in extractor or 'youtu.be' in webpage_url:
-                platform = 'youtube'
-            elif 'twitter' in extractor or 'x.com' in webpage_url or 'twitter.com' in webpage_url:
-                platform = 'twitter'
-            elif 'reddit.com' in webpage_url or 'redd.it' in webpage_url or 'reddit' in extractor:
-                platform = 'reddit'
-            elif 'tiktok.com' in webpage_url or 'tiktok' in extractor:
-                platform = 'tiktok'
-            else:
-                platform = 'other'
-            
-            # Extract relevant information
-            video_info = {
-                'title': info.get('title', 'No title available'),
-                'thumbnail': info.get('thumbnail'),
-                'duration': info.get('duration'),
-                'uploader': info.get('uploader') or info.get('channel') or info.get('channel_follower_count'),
-                'webpage_url': info.get('webpage_url', ''),
-                'platform': platform,
-                'formats': []
-            }
-            
-            # Handle different video formats based on platform
-            formats = []
+        deadline = Deadline(parse_timeout(data, 'info'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    with timed_stage('normalize', detect_platform(url)):
+        url, profile = prepare_video_info_url(url)
+    
+    try:
+        def extract():
+            return extract_with_fallback(url, profile, deadline)
+
+        try:
+            info = fetch_info(url, extract, deadline)
+        except DeadlineExceeded as e:
+            return timeout_response(e, url)
+        except ExtractionFailed as e:
+            upstream_errors.inc(type='extraction_failed', platform=detect_platform(url))
+            return jsonify({
+                'error': f'Failed to extract video info: {str(e.error)}',
+                'debug_error': str(e.debug_error),
+                'reason': e.reason or classify_failure(e.error),
+                'url': url,
+                'type': 'extraction_failed'
+            }), 400
+
+        if not info:
+            print("No video information found (empty response)")
+            upstream_errors.inc(type='empty_response', platform=detect_platform(url))
+            return jsonify({
+                'error': 'No video information found (empty response)',
+                'url': url,
+                'type': 'empty_response'
+            }), 400
+
+        select_started = time.perf_counter()
+        try:
+            video_info = extract_video_info(info)
+            print(f"Extracted video info: {video_info.keys() if video_info else 'None'}")
+            if not video_info:
+                raise Exception("No video info extracted")
+        except Exception as e:
+            print(f"Error in extract_video_info: {str(e)}")
+            upstream_errors.inc(type='processing_error', platform=detect_platform(url))
+            return jsonify({
+                'error': f'Error processing video info: {str(e)}',
+                'url': url,
+                'type': 'processing_error'
+            }), 400
             
-            # Try to get formats from different possible locations
-            if 'requested_formats' in info and info['requested_formats']:
-                formats.extend(info['requested_formats'])
-            if 'formats' in info and info['formats']:
-                formats.extend(info['formats'])
+        # Determine platform
+        extractor = info.get('extractor', '').lower()
+        webpage_url = info.get('webpage_url', '').lower()
             
-            # If no formats found, try to create one from the main URL
-            if not formats and info.get('url'):
-                formats = [{
-                    'url': info['url'],
-                    'ext': info.get('ext', 'mp4'),
-                    'width': info.get('width'),
-                    'height': info.get('height'),
-                    'filesize': info.get('filesize')
-                }]
+        if 'youtube' in extractor or 'youtu.be' in webpage_url:
+            platform = 'youtube'
+        elif 'twitter' in extractor or 'x.com' in webpage_url or 'twitter.com' in webpage_url:
+            platform = 'twitter'
+        elif 'reddit.com' in webpage_url or 'redd.it' in webpage_url or 'reddit' in extractor:
+            platform = 'reddit'
+        elif 'tiktok.com' in webpage_url or 'tiktok' in extractor:
+            platform = 'tiktok'
+        else:
+            platform = 'other'
             
-            for f in formats:
-                try:
-                    # Skip if no URL
-                    if not f.get('url'):
-                        continue
-                        
-                    # Get format extension
-                    ext = f.get('ext', 'mp4')
-                    if ext == 'unknown_video' and 'url' in f:
-                        # Try to determine extension from URL
-                        url = f['url'].split('?')[0].lower()
-                        if '.mp4' in url:
-                            ext = 'mp4'
-                        elif '.webm' in url:
-                            ext = 'webm'
-                        elif '.m3u8' in url:
-                            ext = 'm3u8'
-                    
-                    # Skip unsupported formats
-                    if ext not in ['mp4', 'webm', 'm3u8', 'mpd']:
-                        continue
-                    
-                    # Get resolution
-                    width = f.get('width', 0) or 0
-                    height = f.get('height', 0) or 0
-                    resolution = f.get('resolution')
-                    if not resolution and width and height:
-                        resolution = f'{width}x{height}'
-                    
-                    # Get filesize
-                    filesize = f.get('filesize')
-                    if not filesize and 'filesize_approx' in f:
-                        filesize = f['filesize_approx']
-                    
-                    # Add format
-                    video_info['formats'].append({
-                        'format_id': f.get('format_id', f'format_{len(video_info["formats"])}'),
-                        'ext': ext,
-                        'resolution': resolution or 'unknown',
-                        'filesize': filesize,
-                        'url': f['url']
-                    })
-                    
-                except Exception as e:
-                    print(f"Error processing format {f.get('format_id')}: {str(e)}")
+        # Extract relevant information
+        video_info = {
+            'title': info.get('title', 'No title available'),
+            'thumbnail': info.get('thumbnail'),
+            'duration': info.get('duration'),
+            'uploader': info.get('uploader') or info.get('channel') or info.get('channel_follower_count'),
+            'webpage_url': info.get('webpage_url', ''),
+            'platform': platform,
+            'formats': []
+        }
             
-            # Sort formats by resolution (highest first)
-            def get_resolution_sort_key(fmt):
-                res = fmt.get('resolution', '0x0')
-                try:
-                    if 'x' in res:
-                        w, h = map(int, res.split('x'))
-                        return (w * h, w, h)
-                    return (0, 0, 0)
-                except:
-                    return (0, 0, 0)
-                    
-            video_info['formats'].sort(key=get_resolution_sort_key, reverse=True)
+        # One ranked index of the formats serves both the list and the
+        # stream link
+        records = rank_formats(info)
+        video_info['formats'] = format_list(records)
+        video_info['stream_url'] = issue_stream_token(info, records)
+        record_stage('select_format', time.perf_counter() - select_started, platform)
+        prefetch_download(data.get('url'), video_info['stream_url'])
             
-            return jsonify(video_info)
+        with timed_stage('serialize', platform):
+            response = jsonify(video_info)
+        return response
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/download', methods=['POST'])
-@app.route('/api/download/', methods=['POST'])
-def download_video():
+# Batch lookups share one pool; each platform gets at most
+# BATCH_PLATFORM_LIMIT concurrent extractions so one site can't hog it
+BATCH_MAX_URLS = int(os.environ.get('CLIPCUT_BATCH_MAX_URLS', 500))
+BATCH_PLATFORM_LIMIT = int(os.environ.get('CLIPCUT_BATCH_PLATFORM_LIMIT', 4))
+batch_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('CLIPCUT_BATCH_WORKERS', 16)),
+    thread_name_prefix='clipcut-batch',
+)
+
+def lookup_video_summary(url):
+    """Extract a URL and project it like extract_video_info; None if empty."""
+    with timed_stage('normalize', detect_platform(url)):
+        prepared_url, profile = prepare_video_info_url(url)
+    deadline = Deadline(DEADLINE_DEFAULTS['info'])
+    with admission['info'].slot():
+        info = fetch_info(prepared_url, lambda: extract_with_fallback(prepared_url, profile, deadline), deadline)
+    return extract_video_info(info) if info else None
+
+@app.route('/api/video-info/batch', methods=['POST'])
+def get_video_info_batch():
     data = request.get_json()
-    url = data.get('url')
+    urls = data.get('urls')
     
-    if not url:
-        return jsonify({'error': 'No URL provided'}), 400
+    if not urls or not isinstance(urls, list):
+        return jsonify({'error': 'No URLs provided'}), 400
+    if len(urls) > BATCH_MAX_URLS:
+        return jsonify({'error': f'Too many URLs (max {BATCH_MAX_URLS})'}), 400
     
-    print(f"\n=== Processing download for URL: {url} ===")
+    print(f"\n=== Processing batch of {len(urls)} URLs ===")
     
-    # Normalize URLs
+    def generate():
+        # One NDJSON line per URL, in the order the lookups finish
+        results = run_batch(batch_executor, urls, lookup_video_summary,
+                            group=detect_platform, limit_per_group=BATCH_PLATFORM_LIMIT)
+        for index, url, video_info, error in results:
+            line = {'index': index, 'url': url}
+            if isinstance(error, DeadlineExceeded):
+                line.update(error=str(error), type='timeout')
+            elif isinstance(error, Overloaded):
+                line.update(error='Server is busy, try again later', type='overloaded', retry_after=error.retry_after)
+            elif isinstance(error, ExtractionFailed):
+                line.update(error=f'Failed to extract video info: {str(error.error)}', type='extraction_failed',
+                            reason=error.reason or classify_failure(error.error))
+            elif error is not None:
+                line.update(error=f'Error processing video info: {str(error)}', type='processing_error')
+            elif not video_info:
+                line.update(error='No video information found (empty response)', type='empty_response')
+            else:
+                line['data'] = video_info
+            if 'type' in line:
+                upstream_errors.inc(type=line['type'], platform=detect_platform(url))
+            yield json.dumps(line) + '\n'
+    
+    return Response(generate(), mimetype='application/x-ndjson')
+
+def normalize_download_url(url):
+    """Rewrite a URL the way /api/download fetches it."""
     if 'x.com' in url or 'twitter.com' in url:
         url = url.replace('x.com', 'twitter.com')
     
@@ -855,77 +1665,336 @@ def download_video():
         url = url.split('?')[0]
         # Ensure we're using the old.reddit.com for better compatibility
         url = url.replace('www.reddit.com', 'old.reddit.com')
+    return url
+
+@app.route('/api/download', methods=['POST'])
+@app.route('/api/download/', methods=['POST'])
+@admitted('download')
+def download_video():
+    data = request.get_json()
+    url = data.get('url')
+    
+    if not url:
+        return jsonify({'error': 'No URL provided'}), 400
+    
+    print(f"\n=== Processing download for URL: {url} ===")
+    
+    with timed_stage('normalize', detect_platform(url)):
+        url = normalize_download_url(url)
     
     try:
-        # Create a temporary directory for downloads
-        temp_dir = os.path.join(tempfile.gettempdir(), 'clipcut_downloads')
-        os.makedirs(temp_dir, exist_ok=True)
+        clip = parse_clip(data)
+        deadline = Deadline(parse_timeout(data, 'download'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    profile = 'reddit' if detect_platform(url) == 'reddit' else 'generic'
+    try:
+        if wants_stream(data) and not clip:
+            response = stream_download(url, profile, deadline)
+            if response is not None:
+                return response
         
-        # Configure yt-dlp for downloading best quality up to 480p with audio
-        download_opts = {
-            **ydl_opts,
-            'format': 'best[height<=480][ext=mp4]',
-            'merge_output_format': 'mp4',
-            'outtmpl': os.path.join(temp_dir, f'%(id)s.%(ext)s'),
-            'noprogress': True,
-            # Add additional options for Reddit
-            'extractor_args': {
-                'reddit': {
-                    'username': None,
-                    'password': None,
-                    'cookies': None,
-                    'skip_auth': True,
-                },
-            },
-            'http_headers': {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Referer': 'https://www.reddit.com/',
-            },
-        }
+        result = shared_download(url, profile, clip, deadline, data.get('progress_id'))
+        if not result:
+            return jsonify({'error': 'Could not retrieve video information'}), 400
+        filename, title = result
         
-        with yt_dlp.YoutubeDL(download_opts) as ydl:
-            # Get info first to set filename
-            info = ydl.extract_info(url, download=False)
-            print(f"Video info: {info}")
-            
-            if not info:
-                return jsonify({'error': 'Could not retrieve video information'}), 400
-            
-            # For Reddit, we might need to get the direct media URL
-            if 'reddit.com' in url or 'redd.it' in url:
-                print("Processing Reddit video...")
-                if 'url' in info and info['url']:
-                    # Use the direct media URL if available
-                    url = info['url']
-                    print(f"Using direct media URL: {url}")
-            
-            # Download the video
-            print(f"Starting download for URL: {url}")
-            ydl.download([url])
-            
-            # Get the actual filename
-            filename = ydl.prepare_filename(info)
-            
+        with media_cache.pinned(filename):
             # Return the file for download
-            return send_file(
+            response = send_file(
                 filename,
                 as_attachment=True,
-                download_name=f"{info.get('title', 'video')}.mp4",
+                download_name=f"{title}.mp4",
                 mimetype='video/mp4'
             )
+            return observe_until_close(response, 'send_file', detect_platform(url))
             
+    except DownloadAbandoned as e:
+        return cancelled_response(e, url)
+    except DeadlineExceeded as e:
+        return timeout_response(e, url)
     except Exception as e:
         print(f"Download error: {str(e)}")
+        upstream_errors.inc(type='download_error', platform=detect_platform(url))
         return jsonify({'error': f'Failed to download video: {str(e)}'}), 500
-    finally:
-        # Clean up the downloaded file after sending
-        try:
-            if 'filename' in locals() and os.path.exists(filename):
-                os.remove(filename)
-        except Exception as e:
-            print(f"Error cleaning up file {filename}: {str(e)}")
+
+# Background download jobs: POST /api/jobs returns immediately and the
+# download runs on a bounded worker pool
+def run_download_job(job):
+    # Jobs report to /api/progress/<job id> too, but run to completion
+    # whether or not anyone is watching
+    with progress_hub.track(('job', job.id), job.id, cancellable=False) as download:
+        return perform_download(job.url, job.profile,
+                                progress_hooks=[job.progress_hook, download.progress_hook],
+                                postprocessor_hooks=[download.postprocessor_hook], clip=job.clip,
+                                deadline=Deadline(job.timeout))
+
+download_jobs = JobManager(
+    run=run_download_job,
+    base_dir=os.path.join(tempfile.gettempdir(), 'clipcut_jobs'),
+    max_workers=int(os.environ.get('CLIPCUT_JOB_WORKERS', 4)),
+    max_queued=int(os.environ.get('CLIPCUT_JOB_QUEUE', 32)),
+    ttl=int(os.environ.get('CLIPCUT_JOB_TTL', 3600)),
+    store=shared_store,
+)
+
+@app.route('/api/jobs', methods=['POST'])
+def create_download_job():
+    data = request.get_json()
+    url = data.get('url')
+    
+    if not url:
+        return jsonify({'error': 'No URL provided'}), 400
+    
+    profile = data.get('profile') or download_profile_for(url)
+    if profile not in DOWNLOAD_FORMATS:
+        return jsonify({'error': f'Unknown download profile: {profile}'}), 400
+    
+    try:
+        clip = parse_clip(data)
+        timeout = parse_timeout(data, 'job')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        job = download_jobs.submit(url, profile, clip=clip, timeout=timeout)
+    except JobQueueFull as e:
+        return jsonify({'error': f'Too many download jobs, try again later: {str(e)}'}), 429
+    
+    print(f"Queued download job {job.id} for URL: {url}")
+    return jsonify({
+        **job.to_dict(),
+        'status_url': f'/api/jobs/{job.id}',
+        'file_url': f'/api/jobs/{job.id}/file',
+    }), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_download_job(job_id):
+    job = download_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/file', methods=['GET'])
+def get_download_job_file(job_id):
+    job = download_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Unknown job'}), 404
+    if job.state != 'finished':
+        return jsonify({'error': f'Job is {job.state}', 'state': job.state, 'details': job.error}), 409
+    
+    with media_cache.pinned(job.filename):
+        if not os.path.exists(job.filename):
+            return jsonify({'error': 'Job file has been evicted from the media cache'}), 410
+        response = send_file(
+            job.filename,
+            as_attachment=True,
+            download_name=f"{job.title or 'video'}.mp4",
+            mimetype='video/mp4',
+            conditional=True
+        )
+        return observe_until_close(response, 'send_file', detect_platform(job.url))
+
+# How long a progress stream waits for the download it names to start
+PROGRESS_ATTACH_TIMEOUT = 10
+
+@app.route('/api/progress/<progress_id>', methods=['GET'])
+def progress_events(progress_id):
+    """Server-Sent Events for the download sent with this ``progress_id``
+    (or the download job with this id)."""
+    wait = PROGRESS_ATTACH_TIMEOUT
+    job = download_jobs.get(progress_id)
+    if job is not None and job.state == 'queued':
+        # Queued jobs only register once a worker picks them up
+        wait = job.timeout
+    channel = progress_hub.get(progress_id, timeout=wait)
+    if channel is None:
+        return jsonify({'error': 'Unknown progress id', 'type': 'unknown_progress'}), 404
+    return Response(
+        progress_hub.events(channel, interval=1.0 / PROGRESS_EVENT_RATE),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+# Batch downloads get their own pool since each item can take minutes
+BATCH_MAX_DOWNLOADS = int(os.environ.get('CLIPCUT_BATCH_MAX_DOWNLOADS', 50))
+batch_download_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('CLIPCUT_BATCH_DOWNLOAD_WORKERS', 4)),
+    thread_name_prefix='clipcut-batch-download',
+)
+
+def download_for_batch(url):
+    """Download one batch item through the same path as the single routes."""
+    # Rewritten as /api/download does, so both share one flight and cache key
+    url = normalize_download_url(url)
+    profile = download_profile_for(url)
+    key = ('download', profile, canonicalize_url(url))
+    deadline = Deadline(DEADLINE_DEFAULTS['download'])
+    with admission['download'].slot():
+        return shared_call(key, lambda: perform_download(url, profile, deadline=deadline), deadline)
+
+def archive_member_name(index, title, filename):
+    safe_title = ''.join(c if c.isalnum() or c in ' -_.' else '_' for c in title or 'video')
+    return f"{index + 1:03d} - {safe_title.strip()[:80]}{os.path.splitext(filename)[1]}"
+
+@app.route('/api/download/batch', methods=['POST'])
+def download_batch():
+    data = request.get_json()
+    urls = data.get('urls')
+    
+    if not urls or not isinstance(urls, list):
+        return jsonify({'error': 'No URLs provided'}), 400
+    if len(urls) > BATCH_MAX_DOWNLOADS:
+        return jsonify({'error': f'Too many URLs (max {BATCH_MAX_DOWNLOADS})'}), 400
+    
+    print(f"\n=== Processing batch download of {len(urls)} URLs ===")
+    
+    def generate():
+        archive = ZipStream()
+        errors = []
+        results = run_batch(batch_download_executor, urls, download_for_batch,
+                            group=detect_platform, limit_per_group=BATCH_PLATFORM_LIMIT)
+        # Members are appended in the order their downloads finish
+        for index, url, result, error in results:
+            if error is not None or not result:
+                print(f"Batch download failed for {url}: {error}")
+                errors.append(f"{index + 1:03d} {url}: {error or 'No file was created'}")
+                continue
+            filename, title = result
+            with media_cache.pinned(filename):
+                member = open(filename, 'rb')
+            with member:
+                yield from archive.add_file(archive_member_name(index, title, filename), member)
+        
+        if errors:
+            yield from archive.add_bytes('errors.txt', ('\n'.join(errors) + '\n').encode('utf-8'))
+        yield from archive.close()
+    
+    return Response(
+        generate(),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="clipcut-{len(urls)}-videos.zip"'},
+    )
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({
+        'metadata': metadata_cache.stats(),
+        'negative': negative_cache.stats(),
+        'ydl_pools': {name: pool.stats() for name, pool in ydl_pools.items()},
+        'extractions': dict(extraction_counts),
+        'media': media_cache.stats(),
+        'admission': {kind: controller.stats() for kind, controller in admission.items()},
+        'stream_tokens': len(stream_tokens),
+        'upstream_rates': upstream_scheduler.stats(),
+        'refresh_ahead': refresher.stats(),
+        'prefetch': prefetcher.stats(),
+        'progress': progress_hub.stats(),
+        'ttls': METADATA_CACHE_TTLS,
+        'negative_ttls': NEGATIVE_CACHE_TTLS,
+    })
+
+# ?profile=1 captures a cProfile of that one request into CLIPCUT_PROFILE_DIR.
+# Off unless CLIPCUT_PROFILING=1, since profiling slows the request down.
+PROFILING_ENABLED = os.environ.get('CLIPCUT_PROFILING', '0') == '1'
+request_profiler = RequestProfiler(
+    os.environ.get('CLIPCUT_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'clipcut_profiles')))
+
+@app.before_request
+def track_request_start():
+    requests_in_flight.inc(endpoint=request.endpoint or 'unknown')
+    if PROFILING_ENABLED and request.args.get('profile') == '1':
+        g.profiler = request_profiler.start()
+
+@app.after_request
+def add_request_timing(response):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        name = request_profiler.stop(profiler, request.endpoint or 'unknown')
+        print(f"Saved request profile to {os.path.join(request_profiler.directory, name)}")
+        response.headers['X-Clipcut-Profile'] = name
+    timing = server_timing.header_value()
+    if timing:
+        response.headers['Server-Timing'] = timing
+    return response
+
+@app.teardown_request
+def track_request_end(exc=None):
+    requests_in_flight.dec(endpoint=request.endpoint or 'unknown')
+    # after_request is skipped when a handler raises; don't leave the profiler on
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        request_profiler.stop(profiler, request.endpoint or 'unknown')
+
+def cache_ratio_samples():
+    samples = []
+    for name, stats in (('metadata', metadata_cache.stats()), ('negative', negative_cache.stats()),
+                        ('media', media_cache.stats())):
+        samples.append(({'cache': name}, stats.get('hit_ratio') or 0.0))
+    return samples
+
+def temp_bytes_samples():
+    return [
+        ({'dir': 'media_cache'}, media_cache.stats()['bytes']),
+        ({'dir': 'staging'}, dir_size(media_cache.staging_dir)),
+        ({'dir': 'jobs'}, dir_size(download_jobs.base_dir)),
+    ]
+
+metrics_registry.gauge('clipcut_cache_hit_ratio', 'Hit ratio of the metadata and media caches',
+                       callback=cache_ratio_samples)
+metrics_registry.gauge('clipcut_cache_entries', 'Entries held by the metadata and media caches',
+                       callback=lambda: [({'cache': 'metadata'}, len(metadata_cache)),
+                                         ({'cache': 'media'}, media_cache.stats()['entries'])])
+metrics_registry.gauge('clipcut_temp_bytes', 'Bytes on disk in the media cache and temp directories',
+                       callback=temp_bytes_samples)
+metrics_registry.gauge('clipcut_downloads_in_flight', 'Distinct extractions and downloads running upstream',
+                       callback=lambda: [({}, inflight.in_flight())])
+
+def admission_samples(field):
+    return [({'kind': kind}, controller.stats()[field]) for kind, controller in admission.items()]
+
+metrics_registry.gauge('clipcut_admission_active', 'Requests holding an admission slot, by kind',
+                       callback=lambda: admission_samples('active'))
+metrics_registry.gauge('clipcut_admission_queue_depth', 'Requests waiting for an admission slot, by kind',
+                       callback=lambda: admission_samples('waiting'))
+
+metrics_registry.gauge('clipcut_upstream_rate', 'Current upstream request rate allowed per platform (req/s)',
+                       callback=lambda: [({'platform': platform}, stats['rate'])
+                                         for platform, stats in upstream_scheduler.stats().items()])
+metrics_registry.gauge('clipcut_upstream_throttles', 'Upstream 403/429 responses seen per platform',
+                       callback=lambda: [({'platform': platform}, stats['throttles'])
+                                         for platform, stats in upstream_scheduler.stats().items()])
+
+metrics_registry.gauge('clipcut_refresh_ahead', 'Metadata entries tracked, hot, refreshed and failed by the refresher',
+                       callback=lambda: [({'state': state}, value) for state, value in refresher.stats().items()])
+
+metrics_registry.gauge('clipcut_prefetch', 'Speculative downloads by outcome, and hits on them',
+                       callback=lambda: [({'state': state}, prefetcher.stats()[state])
+                                         for state in ('started', 'completed', 'failed', 'skipped', 'hits')])
+metrics_registry.gauge('clipcut_prefetch_bytes', 'Bytes downloaded by prefetches, unclaimed so far and wasted',
+                       callback=lambda: [({'kind': kind}, prefetcher.stats()[f'{kind}_bytes'])
+                                         for kind in ('downloaded', 'unclaimed', 'wasted')])
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+def start_background_work():
+    # Build one instance per profile in the background so the first requests
+    # don't pay for it
+    threading.Thread(target=warm_ydl_pools, daemon=True, name='clipcut-ydl-warm').start()
+    if refresher.lead > 0:
+        refresher.start()
+    # Jobs left unfinished by a previous run (or a crashed worker) carry on
+    download_jobs.recover()
+
+# Background work belongs to the process that serves requests. Under
+# `python app.py` the werkzeug reloader runs this module twice: the parent
+# only watches files and restarts the child (WERKZEUG_RUN_MAIN=true), which
+# serves. Imported by a WSGI server, the module is never __main__.
+if __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    start_background_work()
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 3001))
@@ -0,0 +1,41 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+
+def run_batch(executor, items, fn, group=None, limit_per_group=4):
+    """Run ``fn(item)`` for every item and yield results as they finish.
+
+    Yields ``(index, item, result, error)`` in completion order, so one slow
+    item never holds back the others. ``group(item)`` names the bucket an item
+    belongs to (e.g. its platform); at most ``limit_per_group`` items of one
+    bucket run at a time. Items are only handed to the executor when their
+    bucket has room, so waiting items never tie up worker threads. Closing the
+    generator early stops scheduling further items.
+    """
+    group = group or (lambda item: None)
+    waiting = {}
+    for index, item in enumerate(items):
+        waiting.setdefault(group(item), deque()).append((index, item))
+    running = {name: 0 for name in waiting}
+    futures = {}
+
+    def fill():
+        for name, queue in waiting.items():
+            while queue and running[name] < limit_per_group:
+                index, item = queue.popleft()
+                futures[executor.submit(fn, item)] = (index, item, name)
+                running[name] += 1
+
+    try:
+        fill()
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, item, name = futures.pop(future)
+                running[name] -= 1
+                error = future.exception()
+                yield index, item, (None if error else future.result()), error
+            fill()
+    finally:
+        for future in futures:
+            future.cancel()
@@ -0,0 +1,122 @@
+"""Benchmark multi-connection downloads against the single-stream path.
+
+Serves a random file from a local HTTP server that throttles every
+connection (as CDNs do) and supports Range requests, both as one
+progressive file and as an HLS playlist of 1 MiB segments. Each file is then
+downloaded through a YoutubeDLPool checkout with 1, 4 and 8 connections,
+and the wall-clock time is reported and the result checked byte for byte.
+
+    python bench_segmented.py [--size-mb 24] [--rate-mb 4] [--connections 1 4 8]
+"""
+import argparse
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ydl_pool import YoutubeDLPool
+
+SEGMENT = 1024 * 1024
+CHUNK = 64 * 1024
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    data = b''
+    rate = 4 * 1024 * 1024  # bytes/s per connection
+
+    def log_message(self, *args):
+        pass
+
+    def send_body(self, body):
+        for i in range(0, len(body), CHUNK):
+            self.wfile.write(body[i:i + CHUNK])
+            time.sleep(CHUNK / self.rate)
+
+    def do_GET(self):
+        if self.path.endswith('.m3u8'):
+            body = ('#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-TARGETDURATION:2\n#EXT-X-MEDIA-SEQUENCE:0\n'
+                    + ''.join(f'#EXTINF:2.0,\nseg{i}.ts\n' for i in range(len(self.data) // SEGMENT))
+                    + '#EXT-X-ENDLIST\n').encode()
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        segment = re.match(r'/seg(\d+)\.ts', self.path)
+        if segment:
+            index = int(segment.group(1))
+            body = self.data[index * SEGMENT:(index + 1) * SEGMENT]
+            self.send_response(200)
+        else:
+            byte_range = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range') or '')
+            if byte_range:
+                start = int(byte_range.group(1))
+                end = int(byte_range.group(2)) if byte_range.group(2) else len(self.data) - 1
+                body = self.data[start:end + 1]
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {start}-{end}/{len(self.data)}')
+            else:
+                body = self.data
+                self.send_response(200)
+            self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.send_body(body)
+
+
+def info_for(base, kind, run):
+    if kind == 'hls':
+        fmt = {'format_id': 'hls', 'url': base + '/v.m3u8', 'protocol': 'm3u8_native'}
+    else:
+        fmt = {'format_id': 'mp4', 'url': base + '/v.mp4', 'protocol': 'https'}
+    fmt.update(ext='mp4', height=480, vcodec='h264', acodec='aac')
+    return {'id': run, 'title': run, 'ext': 'mp4', 'extractor': 'generic', 'extractor_key': 'Generic',
+            'webpage_url': f'{base}/{run}', 'formats': [fmt]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-mb', type=int, default=24)
+    parser.add_argument('--rate-mb', type=float, default=4, help='per-connection server rate in MiB/s')
+    parser.add_argument('--connections', type=int, nargs='+', default=[1, 4, 8])
+    args = parser.parse_args()
+
+    _Handler.data = os.urandom(args.size_mb * SEGMENT)
+    _Handler.rate = args.rate_mb * 1024 * 1024
+    expected = hashlib.md5(_Handler.data).digest()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    directory = tempfile.mkdtemp()
+    pool = YoutubeDLPool('bench', {'quiet': True, 'no_warnings': True, 'noprogress': True,
+                                   'format': 'best', 'cachedir': False}, size=1)
+    print(f'{args.size_mb} MiB file, server capped at {args.rate_mb:g} MiB/s per connection:')
+    try:
+        for kind in ('progressive', 'hls'):
+            for connections in args.connections:
+                run = f'{kind}{connections}'
+                outtmpl = os.path.join(directory, '%(id)s.%(ext)s')
+                with pool.checkout(outtmpl=outtmpl, connections=connections) as ydl:
+                    started = time.perf_counter()
+                    result = ydl.process_ie_result(info_for(base, kind, run), download=True)
+                    elapsed = time.perf_counter() - started
+                    path = result['requested_downloads'][0]['filepath']
+                with open(path, 'rb') as f:
+                    intact = hashlib.md5(f.read()).digest() == expected
+                os.remove(path)
+                print(f'  {kind:<12} connections={connections:<2} {elapsed:6.2f} s   '
+                      f'{args.size_mb / elapsed:6.1f} MiB/s   intact={intact}')
+    finally:
+        server.shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
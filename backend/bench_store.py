@@ -0,0 +1,114 @@
+"""Benchmark the shared SQLite store.
+
+Measures lookup latency for a metadata-sized entry (in-process TTLCache hit,
+SharedTTLCache hit, and a shared hit read from SQLite) and write throughput
+with several processes writing at once, as the backend workers on a node do.
+
+    python bench_store.py [--processes 4] [--writes 2000] [--db /tmp/bench.db]
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+from cache import SharedTTLCache, TTLCache
+from store import SQLiteStore
+
+
+def sample_info(n_formats=40):
+    """Roughly the shape and size of a YouTube extract_info result."""
+    return {
+        'id': 'dQw4w9WgXcQ',
+        'title': 'Sample video',
+        'extractor_key': 'Youtube',
+        'webpage_url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+        'formats': [{
+            'format_id': str(i),
+            'url': f'https://rr1---sn-example.googlevideo.com/videoplayback?expire=1900000000&id={i}&' + 'x' * 600,
+            'ext': 'mp4',
+            'height': 144 * (i % 8 + 1),
+            'tbr': 100.0 * i,
+            'vcodec': 'avc1.4d401e',
+            'acodec': 'mp4a.40.2',
+            'http_headers': {'User-Agent': 'Mozilla/5.0', 'Accept': '*/*'},
+        } for i in range(n_formats)],
+    }
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda p: samples[min(len(samples) - 1, int(len(samples) * p))] * 1e6
+    return f'p50 {pick(0.5):8.1f} us   p99 {pick(0.99):8.1f} us   mean {statistics.mean(samples) * 1e6:8.1f} us'
+
+
+def time_calls(fn, count):
+    samples = []
+    for i in range(count):
+        started = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_lookups(path, count):
+    info = sample_info()
+    store = SQLiteStore(path)
+    local = TTLCache(maxsize=count, ttl=600)
+    shared = SharedTTLCache(store, 'metadata', maxsize=count, ttl=600)
+    for i in range(count):
+        local.set(f'url{i}', info)
+        shared.set(f'url{i}', info)
+    print(f'Lookups of a {len(str(info)) // 1024} KiB info dict, {count} keys:')
+    print('  TTLCache hit             ', percentiles(time_calls(lambda i: local.get(f'url{i}'), count)))
+    print('  SharedTTLCache local hit ', percentiles(time_calls(lambda i: shared.get(f'url{i}'), count)))
+    # A fresh cache, as in another process: every lookup is read from SQLite
+    other = SharedTTLCache(store, 'metadata', maxsize=count, ttl=600)
+    print('  SharedTTLCache shared hit', percentiles(time_calls(lambda i: other.get(f'url{i}'), count)))
+    print('  SQLiteStore.get          ', percentiles(time_calls(lambda i: store.get('metadata', f'url{i}'), count)))
+
+
+def _writer(path, worker, writes, value, ready, results):
+    store = SQLiteStore(path)
+    ready.wait()
+    started = time.perf_counter()
+    for i in range(writes):
+        store.set('bench', f'{worker}:{i}', value, ttl=600)
+    results.put(time.perf_counter() - started)
+
+
+def bench_writers(path, processes, writes):
+    for label, value in (('small record (job)', {'state': 'running', 'progress': {'percent': 42.0}}),
+                         ('info dict', sample_info())):
+        ready = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=_writer, args=(path, w, writes, value, ready, results))
+                   for w in range(processes)]
+        for worker in workers:
+            worker.start()
+        time.sleep(0.5)
+        started = time.perf_counter()
+        ready.set()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+        total = processes * writes
+        print(f'{processes} processes x {writes} writes, {label}: '
+              f'{total / elapsed:8.0f} writes/s ({elapsed:.2f}s)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--writes', type=int, default=2000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--db', default=os.path.join(tempfile.mkdtemp(), 'bench.db'))
+    args = parser.parse_args()
+    bench_lookups(args.db, args.lookups)
+    for processes in sorted({1, args.processes}):
+        bench_writers(args.db, processes, args.writes)
+
+
+if __name__ == '__main__':
+    main()
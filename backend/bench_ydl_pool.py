@@ -0,0 +1,125 @@
+"""Benchmark pooled YoutubeDL instances against building one per request.
+
+Runs metadata lookups against a stub extractor that fetches its video page
+from a local keep-alive HTTP server, once with a fresh YoutubeDL per lookup
+(as the routes used to) and once through a YoutubeDLPool, and reports the
+per-lookup time and the number of TCP connections the server saw.
+
+    python bench_ydl_pool.py [--lookups 200] [--threads 4]
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import yt_dlp
+from yt_dlp.extractor.common import InfoExtractor
+
+from ydl_pool import YoutubeDLPool
+
+# Roughly the options of the app's video-info profile
+PARAMS = {
+    'quiet': True,
+    'no_warnings': True,
+    'skip_download': True,
+    'noplaylist': True,
+    'cachedir': False,
+    'socket_timeout': 30,
+    'http_headers': {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'Accept-Language': 'en-US,en;q=0.5',
+    },
+}
+
+
+class StubIE(InfoExtractor):
+    _VALID_URL = r'http://127\.0\.0\.1:\d+/video/(?P<id>\w+)'
+    IE_NAME = 'stub'
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        data = self._download_json(url, video_id)
+        return {
+            'id': video_id,
+            'title': data['title'],
+            'formats': [{'format_id': '18', 'url': data['media'], 'ext': 'mp4', 'height': 360,
+                         'vcodec': 'avc1', 'acodec': 'mp4a'}],
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    connections = set()
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        with self.lock:
+            self.connections.add(self.client_address)
+        body = json.dumps({'title': 'Stub video', 'media': f'http://127.0.0.1/media{self.path}.mp4'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def lookup_fresh(url):
+    started = time.perf_counter()
+    with yt_dlp.YoutubeDL(dict(PARAMS)) as ydl:
+        ydl.add_info_extractor(StubIE())
+        built = time.perf_counter()
+        ydl.extract_info(url, download=False)
+    return built - started, time.perf_counter() - started
+
+
+def make_lookup_pooled(pool):
+    def lookup(url):
+        started = time.perf_counter()
+        with pool.checkout() as ydl:
+            if 'stub' not in ydl._ies:
+                ydl.add_info_extractor(StubIE())
+            built = time.perf_counter()
+            ydl.extract_info(url, download=False)
+        return built - started, time.perf_counter() - started
+    return lookup
+
+
+def run(label, lookup, base, lookups, threads):
+    _Handler.connections.clear()
+    with ThreadPoolExecutor(threads) as executor:
+        results = list(executor.map(lookup, [f'{base}/video/v{i}' for i in range(lookups)]))
+    setup = [r[0] for r in results]
+    total = [r[1] for r in results]
+    pick = lambda samples, p: sorted(samples)[min(len(samples) - 1, int(len(samples) * p))] * 1e3
+    print(f'  {label:<22} setup mean {statistics.mean(setup) * 1e3:7.2f} ms   '
+          f'lookup p50 {pick(total, 0.5):7.2f} ms   p99 {pick(total, 0.99):7.2f} ms   '
+          f'connections {len(_Handler.connections)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lookups', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    pool = YoutubeDLPool('bench', PARAMS, size=args.threads)
+    pool.warm(args.threads)
+    print(f'{args.lookups} lookups on {args.threads} threads:')
+    run('fresh YoutubeDL', lookup_fresh, base, args.lookups, args.threads)
+    run('YoutubeDLPool checkout', make_lookup_pooled(pool), base, args.lookups, args.threads)
+    print(f'  pool: {pool.stats()}')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+
+from store import StoreError
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a TTL.
+
+    Entries are evicted when the cache grows past ``maxsize`` (least recently
+    used first) or when their TTL runs out. Hit/miss/eviction counters are kept
+    so they can be reported by the API.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+            return entry[0] if entry else default
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_MISSING = object()
+
+
+class SharedTTLCache(TTLCache):
+    """TTLCache that also reads and writes through a shared Store.
+
+    Lookups are served from this process's entries first; a local miss
+    falls through to ``store`` (entries set by other processes), and a
+    shared hit is kept locally for the rest of its TTL. Writes and pops go
+    to both. Store failures are logged and the cache carries on locally.
+    Values must be JSON-serialisable; they come back as plain JSON types.
+    """
+
+    def __init__(self, store, namespace, maxsize=1024, ttl=300):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.store = store
+        self.namespace = namespace
+        self.shared_hits = 0
+
+    def get(self, key, default=None):
+        value = super().get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        try:
+            entry = self.store.get(self.namespace, key)
+        except StoreError as e:
+            print(f"Shared {self.namespace} cache read failed: {e}")
+            return default
+        if entry is None:
+            return default
+        value, expires_at = entry
+        ttl = expires_at - time.time() if expires_at is not None else self.ttl
+        if ttl <= 0:
+            return default
+        super().set(key, value, ttl=ttl)
+        with self._lock:
+            # Count it as the hit it turned out to be
+            self.misses -= 1
+            self.hits += 1
+            self.shared_hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        super().set(key, value, ttl=ttl)
+        try:
+            self.store.set(self.namespace, key, value, ttl=self.ttl if ttl is None else ttl)
+        except StoreError as e:
+            print(f"Shared {self.namespace} cache write failed: {e}")
+
+    def pop(self, key, default=None):
+        value = super().pop(key, default)
+        try:
+            self.store.delete(self.namespace, key)
+        except StoreError as e:
+            print(f"Shared {self.namespace} cache delete failed: {e}")
+        return value
+
+    def stats(self):
+        stats = super().stats()
+        stats['shared_hits'] = self.shared_hits
+        return stats
@@ -0,0 +1,72 @@
+import time
+from contextlib import contextmanager
+
+from yt_dlp.networking import Request
+from yt_dlp.utils import DownloadCancelled
+
+
+class DeadlineExceeded(DownloadCancelled):
+    """A request ran out of time.
+
+    Subclasses DownloadCancelled so yt-dlp lets it propagate out of progress
+    hooks and extractors instead of wrapping it or retrying.
+    """
+
+    def __init__(self, msg='Request deadline exceeded'):
+        super().__init__(msg)
+
+
+class Deadline:
+    """Wall-clock budget for one request, shared by everything it calls.
+
+    yt-dlp has no notion of an overall timeout, so a Deadline is applied to a
+    YoutubeDL instance at checkout: every HTTP request gets its socket timeout
+    capped to the time left, and every request and progress callback checks
+    the deadline and raises DeadlineExceeded once it has passed.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires
+
+    def check(self):
+        if self.expired():
+            raise DeadlineExceeded(f'Request deadline of {self.seconds:g}s exceeded')
+
+    def cap(self, seconds):
+        """``seconds`` shortened to the time left (at least a second)."""
+        return max(1.0, min(seconds, self.remaining()))
+
+    @contextmanager
+    def stage(self, fraction):
+        """Limit a stage of the work to ``fraction`` of the time left.
+
+        Inside the block the deadline ends early; afterwards the original
+        expiry is restored, so time the stage didn't use stays available to
+        the stages after it.
+        """
+        saved = self.expires
+        self.expires = min(saved, time.monotonic() + self.remaining() * fraction)
+        try:
+            yield self
+        finally:
+            self.expires = saved
+
+    def wrap_urlopen(self, urlopen, socket_timeout):
+        def checked_urlopen(req):
+            self.check()
+            if isinstance(req, str):
+                req = Request(req)
+            if isinstance(req, Request):
+                req.extensions['timeout'] = self.cap(req.extensions.get('timeout') or socket_timeout)
+            return urlopen(req)
+        return checked_urlopen
+
+    def progress_hook(self, d):
+        self.check()
@@ -0,0 +1,41 @@
+import fcntl
+import os
+import time
+
+
+class FileLock:
+    """Exclusive lock on a file, shared by every process on the node.
+
+    Uses flock(2), so the lock goes away with the process that held it: a
+    crashed worker never leaves a stale lock behind.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def acquire(self, timeout=None, poll=0.25):
+        """Take the lock, waiting up to ``timeout`` seconds (forever if None);
+        returns whether it was taken."""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self._fd = fd
+                return True
+            except BlockingIOError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    os.close(fd)
+                    return False
+                time.sleep(poll)
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+    @property
+    def locked(self):
+        return self._fd is not None
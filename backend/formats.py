@@ -0,0 +1,125 @@
+from urllib.parse import urlsplit
+
+from yt_dlp.utils import determine_protocol
+
+from utils import parse_url_expiry
+
+# Extensions the info routes list; storyboards, subtitles and the like are left out
+LISTED_EXTS = ('mp4', 'webm', 'm3u8', 'mpd')
+
+
+class FormatRecord:
+    """Compact view of one yt-dlp format, built once per lookup.
+
+    ``source`` is the format dict it was built from, for the odd field
+    (``http_headers``) that is only needed once a format has been picked.
+    """
+
+    __slots__ = ('format_id', 'url', 'ext', 'protocol', 'height', 'width', 'bitrate',
+                 'vcodec', 'acodec', 'has_video', 'has_audio', 'size', 'expires_at', 'source')
+
+    def __init__(self, fmt, position=0):
+        self.source = fmt
+        self.format_id = fmt.get('format_id') or f'format_{position}'
+        self.url = fmt.get('url')
+        self.ext = _ext(fmt)
+        self.protocol = fmt.get('protocol') or determine_protocol(fmt)
+        self.width, self.height = _dimensions(fmt)
+        self.bitrate = fmt.get('tbr') or (fmt.get('vbr') or 0) + (fmt.get('abr') or 0)
+        self.vcodec = fmt.get('vcodec')
+        self.acodec = fmt.get('acodec')
+        # Missing codecs mean unknown, not absent
+        self.has_video = self.vcodec != 'none'
+        self.has_audio = self.acodec != 'none'
+        self.size = fmt.get('filesize') or fmt.get('filesize_approx')
+        self.expires_at = fmt['expires_at'] if 'expires_at' in fmt else parse_url_expiry(self.url)
+
+    @property
+    def direct(self):
+        """One plain HTTP file with both video and audio, which can be piped as is."""
+        return self.protocol in ('http', 'https') and self.has_video and self.has_audio
+
+    @property
+    def codecs_known(self):
+        return self.vcodec is not None and self.acodec is not None
+
+    def rank_key(self):
+        return (self.has_video, self.height, self.width, self.has_audio, self.bitrate, self.ext == 'mp4')
+
+    def as_dict(self):
+        """JSON form listed by the info routes."""
+        return {
+            'format_id': self.format_id,
+            'ext': self.ext,
+            'resolution': f'{self.width}x{self.height}' if self.width and self.height else (
+                self.source.get('resolution') or 'unknown'),
+            'height': self.height or None,
+            'width': self.width or None,
+            'bitrate': self.bitrate or None,
+            'vcodec': self.vcodec,
+            'acodec': self.acodec,
+            'has_audio': self.has_audio,
+            'filesize': self.size,
+            'url': self.url,
+            'expires_at': self.expires_at,
+        }
+
+
+def _ext(fmt):
+    ext = fmt.get('ext')
+    if ext and ext != 'unknown_video':
+        return ext
+    # Guess from the URL path
+    path = urlsplit(fmt.get('url') or '').path.lower()
+    for candidate in ('mp4', 'webm', 'm3u8', 'mpd'):
+        if path.endswith('.' + candidate):
+            return candidate
+    return ext or 'mp4'
+
+
+def _dimensions(fmt):
+    width, height = fmt.get('width') or 0, fmt.get('height') or 0
+    if not (width and height):
+        resolution = fmt.get('resolution') or ''
+        w, x, h = resolution.partition('x')
+        if x and w.isdigit() and h.isdigit():
+            width, height = width or int(w), height or int(h)
+    return int(width), int(height)
+
+
+def rank_formats(info):
+    """The formats of ``info`` (or ``info`` itself if it has none) that have
+    a URL, as FormatRecords ranked best first: video before audio-only, then
+    by resolution, audio, bitrate and mp4 over other containers."""
+    records = [FormatRecord(fmt, i) for i, fmt in enumerate(info.get('formats') or [info]) if fmt.get('url')]
+    records.sort(key=FormatRecord.rank_key, reverse=True)
+    return records
+
+
+def pick(records, accept, prefer=None):
+    """The best-ranked record passing ``accept``, or None.
+
+    With ``prefer``, it is the best-ranked among those with the highest
+    ``prefer(record)``, found in the same single scan.
+    """
+    best = best_value = None
+    for record in records:
+        if not accept(record):
+            continue
+        if prefer is None:
+            return record
+        value = prefer(record)
+        if best is None or value > best_value:
+            best, best_value = record, value
+    return best
+
+
+def select_direct_format(records):
+    """Pick the best format that is one plain HTTP file with video and audio,
+    preferring known codecs and mp4."""
+    return pick(records, lambda r: r.direct, prefer=lambda r: (r.codecs_known, r.ext == 'mp4'))
+
+
+def format_list(records):
+    """The ranked list the info routes return."""
+    return [record.as_dict() for record in records if record.ext in LISTED_EXTS]
@@ -0,0 +1,265 @@
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from filelock import FileLock
+from store import StoreError
+
+# Least seconds between two shared-store writes of a running job's progress
+PROGRESS_SAVE_INTERVAL = 1.0
+# Each job's directory holds its record and a lock held while it runs
+RECORD_FILE = 'job.json'
+LOCK_FILE = '.lock'
+
+
+class JobQueueFull(Exception):
+    """Raised when the job pool and its wait queue are both full."""
+
+
+class Job:
+    """State of one queued download, updated from yt-dlp progress hooks."""
+
+    def __init__(self, url, profile, output_dir, clip=None, timeout=None):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.profile = profile
+        self.clip = clip
+        self.timeout = timeout
+        self.output_dir = output_dir
+        self.state = 'queued'
+        self.progress = {
+            'downloaded_bytes': 0,
+            'total_bytes': None,
+            'percent': 0.0,
+            'speed': None,
+            'eta': None,
+        }
+        self.filename = None
+        self.title = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Called with the job after progress updates (see JobManager)
+        self.on_progress = None
+        self.lock = None
+
+    @classmethod
+    def from_record(cls, record):
+        """Rebuild a job from its saved record (another process's, or a previous run's)."""
+        job = cls.__new__(cls)
+        job.id = record['job_id']
+        job.on_progress = None
+        job.lock = None
+        for name in ('url', 'profile', 'clip', 'timeout', 'output_dir', 'state', 'progress', 'filename',
+                     'title', 'error', 'created_at', 'started_at', 'finished_at'):
+            setattr(job, name, record.get(name))
+        return job
+
+    def record(self):
+        """to_dict plus the server-side fields another process needs."""
+        return dict(self.to_dict(), filename=self.filename, output_dir=self.output_dir)
+
+    def progress_hook(self, d):
+        """yt-dlp progress hook; called from the worker thread."""
+        status = d.get('status')
+        if status == 'downloading':
+            downloaded = d.get('downloaded_bytes') or 0
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            self.progress = {
+                'downloaded_bytes': downloaded,
+                'total_bytes': total,
+                'percent': round(downloaded * 100.0 / total, 1) if total else None,
+                'speed': d.get('speed'),
+                'eta': d.get('eta'),
+            }
+        elif status == 'finished':
+            self.progress = dict(self.progress, percent=100.0, eta=0)
+        if self.on_progress is not None:
+            self.on_progress(self)
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'url': self.url,
+            'profile': self.profile,
+            'clip': self.clip,
+            'timeout': self.timeout,
+            'state': self.state,
+            'progress': self.progress,
+            'title': self.title,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobManager:
+    """Run downloads on a bounded worker pool and keep their results around.
+
+    ``run(job)`` does the actual download and returns ``(filename, title)`` or
+    None. At most ``max_workers`` jobs run at once and at most ``max_queued``
+    more wait for a worker; submitting beyond that raises JobQueueFull.
+    Finished jobs and their files are dropped after ``ttl`` seconds.
+
+    With a shared ``store`` (store.Store), job records are saved there as
+    they change, so any process on the node can report a job's state and
+    serve its file; the job itself still runs in the process it was
+    submitted to.
+
+    Records are also written to each job's directory under ``base_dir``,
+    and the running process holds a lock there. ``recover()`` (at startup)
+    requeues unfinished jobs whose lock nobody holds, i.e. whose process
+    died, and reloads finished ones so they can still be fetched.
+    """
+
+    def __init__(self, run, base_dir, max_workers=4, max_queued=32, ttl=3600, store=None):
+        self.run = run
+        self.base_dir = base_dir
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.ttl = ttl
+        self.store = store
+        self._jobs = {}
+        self._saved_at = {}
+        self._active = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='clipcut-job')
+
+    def submit(self, url, profile, clip=None, timeout=None):
+        self.expire()
+        with self._lock:
+            if self._active >= self.max_workers + self.max_queued:
+                raise JobQueueFull(f'{self._active} download jobs already pending')
+            job = Job(url, profile, os.path.join(self.base_dir, uuid.uuid4().hex), clip=clip, timeout=timeout)
+            self._jobs[job.id] = job
+            self._active += 1
+        os.makedirs(job.output_dir, exist_ok=True)
+        job.lock = FileLock(os.path.join(job.output_dir, LOCK_FILE))
+        job.lock.acquire()
+        self._start(job)
+        return job
+
+    def _start(self, job):
+        job.on_progress = self._progress
+        self._save(job)
+        self._executor.submit(self._work, job)
+
+    def recover(self):
+        """Pick up the jobs in ``base_dir`` that no running process owns."""
+        if not os.path.isdir(self.base_dir):
+            return
+        requeued = 0
+        for entry in os.scandir(self.base_dir):
+            try:
+                with open(os.path.join(entry.path, RECORD_FILE)) as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                continue
+            lock = FileLock(os.path.join(entry.path, LOCK_FILE))
+            if not lock.acquire(timeout=0):
+                continue  # Another process is running it
+            job = Job.from_record(record)
+            with self._lock:
+                if job.id in self._jobs:
+                    lock.release()
+                    continue
+                self._jobs[job.id] = job
+                if job.finished_at:
+                    lock.release()
+                    continue
+                self._active += 1
+            # Resumes from whatever partial files the last attempt left
+            job.state = 'queued'
+            job.lock = lock
+            self._start(job)
+            requeued += 1
+        if requeued:
+            print(f"Requeued {requeued} unfinished download jobs")
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            try:
+                entry = self.store.get('jobs', job_id)
+            except StoreError as e:
+                print(f"Shared job store read failed: {e}")
+                entry = None
+            if entry is not None:
+                job = Job.from_record(entry[0])
+        return job
+
+    def _save(self, job):
+        tmp = os.path.join(job.output_dir, RECORD_FILE + '.tmp')
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(job.record(), f)
+            os.replace(tmp, os.path.join(job.output_dir, RECORD_FILE))
+        except OSError as e:
+            print(f"Could not save download job {job.id}: {e}")
+        self._save_shared(job)
+
+    def _save_shared(self, job):
+        if self.store is None:
+            return
+        self._saved_at[job.id] = time.monotonic()
+        try:
+            # Unfinished jobs are kept until they finish, whatever that takes
+            self.store.set('jobs', job.id, job.record(), ttl=self.ttl if job.finished_at else None)
+        except StoreError as e:
+            print(f"Shared job store write failed: {e}")
+
+    def _progress(self, job):
+        if self.store is not None and time.monotonic() - self._saved_at.get(job.id, 0) >= PROGRESS_SAVE_INTERVAL:
+            self._save_shared(job)
+
+    def _work(self, job):
+        job.state = 'running'
+        job.started_at = time.time()
+        self._save(job)
+        try:
+            result = self.run(job)
+            if not result:
+                raise Exception('Download failed: No file was created')
+            job.filename, job.title = result
+            job.state = 'finished'
+        except Exception as e:
+            print(f"Download job {job.id} failed: {str(e)}")
+            job.error = str(e)
+            job.state = 'failed'
+        finally:
+            job.finished_at = time.time()
+            self._save(job)
+            self._saved_at.pop(job.id, None)
+            job.lock.release()
+            with self._lock:
+                self._active -= 1
+
+    def expire(self):
+        """Forget finished jobs older than the TTL and delete their files."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [job for job in self._jobs.values()
+                       if job.finished_at and job.finished_at < cutoff]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            shutil.rmtree(job.output_dir, ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            states = {}
+            for job in self._jobs.values():
+                states[job.state] = states.get(job.state, 0) + 1
+            return {
+                'workers': self.max_workers,
+                'max_queued': self.max_queued,
+                'active': self._active,
+                'states': states,
+            }
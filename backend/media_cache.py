@@ -0,0 +1,313 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from store import StoreError
+
+
+class MediaCache:
+    """Content-addressed cache of downloaded media files with a byte quota.
+
+    Files are keyed by (extractor, video id, format selector) rather than by
+    the URL, so different links to the same video share one entry. Files are
+    published with an atomic rename, the least recently used ones are evicted
+    once the quota is exceeded, and files pinned by a reader are never evicted
+    while they are being opened. Nor are files published or looked up in the
+    last ``fresh_for`` seconds: ``put`` and ``get`` hand out a path the
+    caller has yet to pin, and a concurrent ``put`` (or one file bigger than
+    what is left of the quota) must not evict it in between.
+
+    With a shared ``store`` (store.Store), the index of files and aliases is
+    also written there, so a file another process on this node downloaded
+    is found even though this process's index was built before it existed.
+    Pins are recorded there too (expiring after ``pin_ttl`` seconds in case
+    their process dies), and eviction works from the shared index, so the
+    quota holds for the node rather than for each process.
+    """
+
+    def __init__(self, root, max_bytes, store=None, partial_ttl=24 * 3600, pin_ttl=3600, fresh_for=60):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.store = store
+        self.partial_ttl = partial_ttl
+        self.pin_ttl = pin_ttl
+        self.fresh_for = fresh_for
+        self._pruned_at = 0.0
+        self.staging_dir = os.path.join(root, '.staging')
+        self._entries = OrderedDict()  # key -> (path, size), least recent first
+        self._aliases = {}  # alias (e.g. canonical URL + profile) -> key
+        self._pins = {}  # path -> number of readers
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load()
+
+    @staticmethod
+    def make_key(extractor, video_id, format_selector):
+        raw = f'{extractor}\0{video_id}\0{format_selector}'.lower()
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def prune_staging(self):
+        """Delete staged files untouched for ``partial_ttl`` seconds.
+
+        Downloads are staged under stable names so that a retry, or the next
+        run after a crash, resumes their partial files; whatever nobody came
+        back for is cleaned up here.
+        """
+        self._pruned_at = time.monotonic()
+        cutoff = time.time() - self.partial_ttl
+        for entry in os.scandir(self.staging_dir):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _load(self):
+        """Index files left by a previous run, oldest access first."""
+        os.makedirs(self.staging_dir, exist_ok=True)
+        self.prune_staging()
+
+        found = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+            for name in filenames:
+                if name.startswith('.'):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((st.st_mtime, os.path.splitext(name)[0], path, st.st_size))
+
+        for _, key, path, size in sorted(found):
+            self._entries[key] = (path, size)
+            self._bytes += size
+        if self.store is not None:
+            # Files from before the store was configured count towards the quota too
+            shared = {key for key, _ in self._shared('items', 'media') or []}
+            for key, (path, size) in self._entries.items():
+                if key not in shared:
+                    self._shared('set', 'media', key, [path, size])
+        self._evict()
+
+    def get(self, key):
+        """Return the cached file path for ``key``, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and not os.path.exists(entry[0]):
+                self._drop(key)
+                entry = None
+        if entry is None:
+            entry = self._adopt(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        try:
+            # Persist the access order for the next restart
+            os.utime(entry[0])
+        except OSError:
+            pass
+        return entry[0]
+
+    def _adopt(self, key):
+        """Index a file another process put in the shared store; None if unknown."""
+        if self.store is None:
+            return None
+        entry = self._shared('get', 'media', key)
+        if entry is None or not os.path.exists(entry[0][0]):
+            return None
+        path, size = entry[0]
+        with self._lock:
+            # Already counted in the shared index, so nothing to evict for it
+            if key not in self._entries:
+                self._entries[key] = (path, size)
+                self._bytes += size
+            return self._entries[key]
+
+    def _shared(self, method, *args):
+        """Call the shared store, logging (and ignoring) failures."""
+        try:
+            return getattr(self.store, method)(*args)
+        except StoreError as e:
+            print(f"Shared media index {method} failed: {e}")
+            return None
+
+    def get_alias(self, alias):
+        """Look up a file by an alias recorded with ``put``, skipping extraction."""
+        with self._lock:
+            key = self._aliases.get(alias)
+        if key is None and self.store is not None:
+            entry = self._shared('get', 'media_alias', alias)
+            key = entry and entry[0]
+        return self.get(key) if key else None
+
+    def add_alias(self, alias, key):
+        with self._lock:
+            if key not in self._entries:
+                return
+            self._aliases[alias] = key
+        if self.store is not None:
+            self._shared('set', 'media_alias', alias, key)
+
+    def put(self, key, src, alias=None):
+        """Move a finished download into the cache and return its new path."""
+        if time.monotonic() - self._pruned_at > 600:
+            self.prune_staging()
+        ext = os.path.splitext(src)[1]
+        dest_dir = os.path.join(self.root, key[:2])
+        dest = os.path.join(dest_dir, key + ext)
+        os.makedirs(dest_dir, exist_ok=True)
+        try:
+            os.replace(src, dest)
+        except OSError:
+            # Different filesystem: copy next to the destination, then rename
+            tmp = os.path.join(dest_dir, f'.{uuid.uuid4().hex}{ext}')
+            shutil.copyfile(src, tmp)
+            os.replace(tmp, dest)
+            os.remove(src)
+        # yt-dlp dates files by the server's Last-Modified; eviction goes by
+        # mtime, so make the new file the most recently used
+        os.utime(dest)
+
+        size = os.path.getsize(dest)
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries[key][1]
+            self._entries[key] = (dest, size)
+            self._entries.move_to_end(key)
+            self._bytes += size
+            if alias:
+                self._aliases[alias] = key
+        if self.store is not None:
+            # Indexed before evicting, so the scan counts it
+            self._shared('set', 'media', key, [dest, size])
+            if alias:
+                self._shared('set', 'media_alias', alias, key)
+        with self._lock:
+            self._evict()
+        return dest
+
+    @contextmanager
+    def pinned(self, path):
+        """Keep ``path`` from being evicted while a reader opens it."""
+        with self._lock:
+            self._pins[path] = self._pins.get(path, 0) + 1
+            if self._pins[path] == 1 and self.store is not None:
+                self._shared('set', 'media_pin', self._pin_key(path), path, self.pin_ttl)
+        try:
+            yield path
+        finally:
+            with self._lock:
+                self._pins[path] -= 1
+                if not self._pins[path]:
+                    del self._pins[path]
+                    if self.store is not None:
+                        self._shared('delete', 'media_pin', self._pin_key(path))
+
+    @staticmethod
+    def _pin_key(path):
+        return f'{os.getpid()}:{path}'
+
+    def _drop(self, key):
+        path, size = self._entries.pop(key)
+        self._bytes -= size
+        for alias in [a for a, k in self._aliases.items() if k == key]:
+            del self._aliases[alias]
+        if self.store is not None:
+            # Shared aliases of the key are left to miss on lookup
+            self._shared('delete', 'media', key)
+        return path
+
+    def _evict(self):
+        # Caller holds the lock (or is __init__)
+        if self.store is not None and self._evict_shared():
+            return
+        fresh_since = time.time() - self.fresh_for
+        for key in list(self._entries):
+            if self._bytes <= self.max_bytes:
+                break
+            path = self._entries[key][0]
+            if path in self._pins or self._mtime(path) > fresh_since:
+                continue
+            self._remove_file(self._drop(key))
+
+    def _evict_shared(self):
+        """Evict by the shared index, least recently used file (by mtime)
+        first, skipping fresh files and those any process has pinned. False
+        if the store could not be read, to fall back to this process's own
+        index."""
+        shared = self._shared('items', 'media')
+        if shared is None:
+            return False
+        pins = {path for _, path in self._shared('items', 'media_pin') or []}
+        pins.update(self._pins)
+        files = []
+        total = 0
+        for key, (path, size) in shared:
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                # Evicted or deleted behind the index's back
+                self._forget(key)
+                continue
+            files.append((mtime, key, path, size))
+            total += size
+        fresh_since = time.time() - self.fresh_for
+        for mtime, key, path, size in sorted(files):
+            if total <= self.max_bytes:
+                break
+            if path in pins or mtime > fresh_since:
+                continue
+            self._forget(key)
+            self._remove_file(path)
+            total -= size
+        return True
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return 0.0
+
+    def _forget(self, key):
+        if key in self._entries:
+            self._drop(key)
+        else:
+            self._shared('delete', 'media', key)
+
+    def _remove_file(self, path):
+        self.evictions += 1
+        try:
+            # Readers that already opened the file keep their handle
+            os.remove(path)
+        except FileNotFoundError:
+            # Another process evicted it first
+            pass
+        except OSError as e:
+            print(f"Error evicting cached media {path}: {e}")
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,176 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from yt_dlp.utils import DownloadCancelled
+
+
+class PrefetchCancelled(DownloadCancelled):
+    """A speculative download would go over the prefetch disk budget."""
+
+
+class _Bandwidth:
+    """Token bucket in bytes shared by every prefetch; allows one second of burst."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._paid_until = time.monotonic()
+        self._lock = threading.Lock()
+
+    def delay(self, nbytes):
+        """Seconds to wait after receiving ``nbytes`` to stay under the rate."""
+        if not self.rate or nbytes <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._paid_until = max(self._paid_until, now - 1.0) + nbytes / self.rate
+            return max(0.0, self._paid_until - now)
+
+
+class _Prefetch:
+    def __init__(self, key):
+        self.key = key
+        self.promoted = threading.Event()
+        self.claimed = False
+        self.seen_bytes = None
+        self.downloaded_bytes = 0
+        self.total_bytes = None
+
+
+class Prefetcher:
+    """Speculative downloads of videos that were just looked up.
+
+    ``submit(key, fetch)`` runs ``fetch(hook)`` on one of ``concurrency``
+    background workers; ``fetch`` downloads the video for ``key`` with
+    ``hook`` among its yt-dlp progress hooks and returns the size of the
+    file it produced, or None. The hook paces every running prefetch to
+    ``bandwidth`` bytes/s in total and cancels one that would take the
+    unclaimed prefetched bytes past ``disk_budget``.
+
+    ``claim(key)`` is called when a request asks for ``key``: it lifts the
+    limits from a prefetch still running and counts a hit if the video was
+    prefetched. Prefetched files nobody claimed within ``window`` seconds,
+    and the bytes of failed prefetches, count as wasted.
+    """
+
+    def __init__(self, concurrency=1, bandwidth=2 * 1024 * 1024, disk_budget=1024 ** 3, window=600):
+        self.concurrency = concurrency
+        self.disk_budget = disk_budget
+        self.window = window
+        self._bandwidth = _Bandwidth(bandwidth)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='clipcut-prefetch')
+        self._running = {}    # key -> _Prefetch
+        self._unclaimed = {}  # key -> (bytes, finished_at)
+        self._lock = threading.Lock()
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.redundant = 0
+        self.hits = 0
+        self.downloaded_bytes = 0
+        self.wasted_bytes = 0
+
+    def submit(self, key, fetch, busy=False):
+        """Start prefetching ``key`` unless it is running or waiting to be
+        claimed already; skipped when ``busy``, when every worker is taken or
+        when the disk budget is used up. Returns whether it started."""
+        with self._lock:
+            self._expire_locked()
+            if key in self._running or key in self._unclaimed:
+                return False
+            if (busy or len(self._running) >= self.concurrency
+                    or self._reserved_bytes_locked() >= self.disk_budget):
+                self.skipped += 1
+                return False
+            prefetch = self._running[key] = _Prefetch(key)
+            self.started += 1
+        self._executor.submit(self._work, prefetch, fetch)
+        return True
+
+    def claim(self, key):
+        """A request wants ``key``; returns whether it was prefetched."""
+        with self._lock:
+            prefetch = self._running.get(key)
+            if prefetch is not None:
+                prefetch.promoted.set()
+                if not prefetch.claimed:
+                    prefetch.claimed = True
+                    self.hits += 1
+                return True
+            if self._unclaimed.pop(key, None) is not None:
+                self.hits += 1
+                return True
+        return False
+
+    def _work(self, prefetch, fetch):
+        size = None
+        try:
+            size = fetch(lambda d: self._progress_hook(prefetch, d))
+        except Exception as e:
+            print(f"Prefetch of {prefetch.key[-1]} failed: {str(e)}")
+        with self._lock:
+            del self._running[prefetch.key]
+            if size is None:
+                self.failed += 1
+                self.downloaded_bytes += prefetch.downloaded_bytes
+                if not prefetch.claimed:
+                    self.wasted_bytes += prefetch.downloaded_bytes
+                return
+            if not prefetch.downloaded_bytes:
+                # Already cached or downloaded by someone else; nothing was prefetched
+                self.redundant += 1
+                if prefetch.claimed:
+                    self.hits -= 1
+                return
+            self.completed += 1
+            self.downloaded_bytes += size
+            if not prefetch.claimed:
+                self._unclaimed[prefetch.key] = (size, time.monotonic())
+
+    def _progress_hook(self, prefetch, d):
+        if d.get('status') != 'downloading':
+            return
+        downloaded = d.get('downloaded_bytes') or 0
+        # The first report may include a resumed .part; only pace what follows
+        received = downloaded - prefetch.seen_bytes if prefetch.seen_bytes is not None else 0
+        prefetch.seen_bytes = downloaded
+        prefetch.downloaded_bytes = downloaded
+        prefetch.total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate')
+        if prefetch.promoted.is_set():
+            return
+        with self._lock:
+            reserved = self._reserved_bytes_locked()
+        if reserved > self.disk_budget:
+            raise PrefetchCancelled(f'Prefetch would exceed the disk budget of {self.disk_budget} bytes')
+        # Returns early once a request claims the download
+        prefetch.promoted.wait(self._bandwidth.delay(received))
+
+    def _reserved_bytes_locked(self):
+        """Unclaimed prefetched bytes plus the expected size of running prefetches."""
+        running = sum(p.total_bytes or p.downloaded_bytes
+                      for p in self._running.values() if not p.promoted.is_set())
+        return running + sum(size for size, _ in self._unclaimed.values())
+
+    def _expire_locked(self):
+        cutoff = time.monotonic() - self.window
+        for key in [k for k, (_, finished_at) in self._unclaimed.items() if finished_at <= cutoff]:
+            self.wasted_bytes += self._unclaimed.pop(key)[0]
+
+    def stats(self):
+        with self._lock:
+            self._expire_locked()
+            useful = self.started - self.redundant
+            return {
+                'started': self.started,
+                'completed': self.completed,
+                'failed': self.failed,
+                'skipped': self.skipped,
+                'redundant': self.redundant,
+                'in_flight': len(self._running),
+                'hits': self.hits,
+                'hit_ratio': round(self.hits / useful, 4) if useful else None,
+                'downloaded_bytes': self.downloaded_bytes,
+                'unclaimed_bytes': sum(size for size, _ in self._unclaimed.values()),
+                'wasted_bytes': self.wasted_bytes,
+            }
@@ -0,0 +1,42 @@
+import cProfile
+import os
+import threading
+import time
+import uuid
+
+
+class RequestProfiler:
+    """Capture a cProfile of a single request and save it to ``directory``.
+
+    Only one request is profiled at a time (the interpreter allows a single
+    active profiler); a second ``?profile=1`` request while one is running
+    is served normally without a profile. Saved files can be inspected with
+    ``python -m pstats <file>`` or snakeviz.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start profiling the calling thread; returns None if busy."""
+        if not self._lock.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            self._lock.release()
+            return None
+        return profiler
+
+    def stop(self, profiler, label):
+        """Stop ``profiler`` and write its stats; returns the file name."""
+        try:
+            profiler.disable()
+            os.makedirs(self.directory, exist_ok=True)
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}_{label}_{uuid.uuid4().hex[:8]}.prof"
+            profiler.dump_stats(os.path.join(self.directory, name))
+            return name
+        finally:
+            self._lock.release()
@@ -0,0 +1,239 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from yt_dlp.utils import DownloadCancelled
+
+from cache import TTLCache
+
+# Postprocessor names (or fragments of them) and the phase they report
+POSTPROCESSOR_PHASES = (
+    ('Merger', 'merging'),
+    ('Remux', 'remuxing'),
+    ('Convertor', 'remuxing'),
+)
+
+
+class DownloadAbandoned(DownloadCancelled):
+    """Every request waiting for a download has stopped listening to it."""
+
+    def __init__(self, msg='Download cancelled: nobody is waiting for it'):
+        super().__init__(msg)
+
+
+class ProgressChannel:
+    """Progress of a download as seen by one waiting request.
+
+    Holds only the latest state; listeners wait for its version to change
+    and always get the newest state, so a burst of updates between two
+    reads is coalesced into one.
+    """
+
+    def __init__(self, cancellable=True):
+        self.cancellable = cancellable
+        self.state = {
+            'phase': 'queued',
+            'downloaded_bytes': 0,
+            'total_bytes': None,
+            'percent': None,
+            'speed': None,
+            'eta': None,
+        }
+        self.version = 0
+        self.done = False
+        self.listeners = 0
+        self.watched = False
+        self.left_at = None
+        self._cond = threading.Condition()
+
+    def update(self, **changes):
+        with self._cond:
+            if self.done:
+                return
+            self.state = dict(self.state, **changes)
+            self.version += 1
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            if self.done:
+                return
+            if error is None:
+                self.state = dict(self.state, phase='finished', eta=0)
+            else:
+                self.state = dict(self.state, phase='failed', error=str(error))
+            self.done = True
+            self.version += 1
+            self._cond.notify_all()
+
+    def wait(self, version, timeout):
+        """Block until the state is newer than ``version`` or ``timeout`` passes;
+        returns ``(version, state, done)``."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != version or self.done, timeout)
+            return self.version, self.state, self.done
+
+    @contextmanager
+    def listen(self):
+        with self._cond:
+            self.listeners += 1
+            self.watched = True
+        try:
+            yield self
+        finally:
+            with self._cond:
+                self.listeners -= 1
+                self.left_at = time.monotonic()
+
+    def abandoned(self, grace):
+        """True once this request's client stopped listening for ``grace``
+        seconds. Requests that never opened a progress stream never count as
+        abandoned, since there is no way to tell whether they are still there."""
+        with self._cond:
+            return (self.cancellable and self.watched and not self.done and self.listeners == 0
+                    and time.monotonic() - self.left_at >= grace)
+
+
+class _Download:
+    """One running download and the channels of the requests sharing it."""
+
+    def __init__(self, grace):
+        self.grace = grace
+        self.channels = []
+        self.state = {}
+        self._lock = threading.Lock()
+
+    def attach(self, channel):
+        with self._lock:
+            self.channels.append(channel)
+            state = dict(self.state)
+        if state:
+            channel.update(**state)
+
+    def detach(self, channel):
+        with self._lock:
+            self.channels.remove(channel)
+
+    def _publish(self, **changes):
+        with self._lock:
+            self.state.update(changes)
+            channels = list(self.channels)
+        for channel in channels:
+            channel.update(**changes)
+        if channels and all(channel.abandoned(self.grace) for channel in channels):
+            raise DownloadAbandoned()
+
+    def progress_hook(self, d):
+        """yt-dlp progress hook; raises DownloadAbandoned if nobody is waiting."""
+        status = d.get('status')
+        if status == 'downloading':
+            downloaded = d.get('downloaded_bytes') or 0
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            self._publish(
+                phase='downloading',
+                downloaded_bytes=downloaded,
+                total_bytes=total,
+                percent=round(downloaded * 100.0 / total, 1) if total else None,
+                speed=d.get('speed'),
+                eta=d.get('eta'),
+            )
+        elif status == 'finished':
+            self._publish(phase='downloaded', percent=100.0, eta=0)
+
+    def postprocessor_hook(self, d):
+        """yt-dlp postprocessor hook reporting the merge/remux phase."""
+        if d.get('status') != 'started':
+            return
+        name = d.get('postprocessor') or ''
+        phase = next((phase for part, phase in POSTPROCESSOR_PHASES if part in name), 'postprocessing')
+        self._publish(phase=phase, postprocessor=name)
+
+
+class ProgressHub:
+    """Progress of in-flight downloads, looked up by client-chosen ids.
+
+    Requests that share a download (same key) each get their own channel
+    fed by the same hooks. A download is cancelled, from inside its progress
+    hooks, once every request waiting for it had a progress stream open and
+    all of those streams have been gone for ``grace`` seconds. Finished
+    channels are kept for ``retention`` seconds so a stream opened late
+    still gets the outcome.
+    """
+
+    def __init__(self, grace=5.0, retention=300):
+        self.grace = grace
+        self._downloads = {}
+        self._channels = {}
+        self._finished = TTLCache(maxsize=4096, ttl=retention)
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def track(self, key, progress_id=None, cancellable=True):
+        """Register a request waiting for the download ``key``; yields the
+        download, whose hooks are to be passed to yt-dlp."""
+        channel = ProgressChannel(cancellable)
+        with self._cond:
+            download = self._downloads.get(key)
+            if download is None:
+                download = self._downloads[key] = _Download(self.grace)
+            download.attach(channel)
+            if progress_id:
+                self._channels[progress_id] = channel
+                self._cond.notify_all()
+        error = None
+        try:
+            yield download
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            channel.finish(error)
+            with self._cond:
+                download.detach(channel)
+                if not download.channels and self._downloads.get(key) is download:
+                    del self._downloads[key]
+                if progress_id and self._channels.get(progress_id) is channel:
+                    del self._channels[progress_id]
+                    self._finished.set(progress_id, channel)
+
+    def get(self, progress_id, timeout=0):
+        """Channel for ``progress_id``, waiting up to ``timeout`` seconds for
+        the request that uses it to arrive."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                channel = self._channels.get(progress_id) or self._finished.get(progress_id)
+                remaining = deadline - time.monotonic()
+                if channel is not None or remaining <= 0:
+                    return channel
+                self._cond.wait(remaining)
+
+    def events(self, channel, interval=0.25, keepalive=5.0):
+        """Server-Sent Events for ``channel``: at most one ``progress`` event
+        per ``interval`` seconds, then a final ``done`` event.
+
+        Comments are sent when nothing changes so a closed connection is
+        noticed and the channel stops counting it as a listener.
+        """
+        with channel.listen():
+            version = -1
+            while True:
+                new_version, state, done = channel.wait(version, keepalive)
+                if done:
+                    yield f'event: done\ndata: {json.dumps(state)}\n\n'
+                    return
+                if new_version == version:
+                    yield ': keepalive\n\n'
+                    continue
+                version = new_version
+                yield f'event: progress\ndata: {json.dumps(state)}\n\n'
+                time.sleep(interval)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'downloads': len(self._downloads),
+                'tracked_ids': len(self._channels),
+                'listeners': sum(channel.listeners for channel in self._channels.values()),
+            }
@@ -0,0 +1,130 @@
+import threading
+import time
+
+from yt_dlp.networking.exceptions import HTTPError
+
+from deadline import DeadlineExceeded
+from utils import detect_platform
+
+# Status codes that mean "slow down" rather than "this URL is broken"
+THROTTLE_STATUSES = (403, 429)
+
+
+class _Bucket:
+    def __init__(self, rate, burst, min_rate):
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.throttled_at = 0.0
+        self.throttles = 0
+        self.waited = 0.0
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class AdaptiveScheduler:
+    """Per-platform token buckets for upstream requests, adapting to throttling.
+
+    Every request yt-dlp makes to a platform's own hosts takes a token from
+    that platform's bucket, so a platform that never throttles us runs at
+    full speed while a touchy one is paced. A 403/429 from any request made
+    on behalf of a platform halves its rate (at most once per ``cooldown``
+    seconds, since a throttle usually fails several requests at once); each
+    successful request then wins back a little of the base rate (AIMD).
+
+    ``rates`` maps platform to ``(requests per second, burst)``.
+    """
+
+    def __init__(self, rates, min_rate=0.05, recovery=0.05, cooldown=2.0):
+        self.recovery = recovery
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._buckets = {
+            platform: _Bucket(rate, burst, min_rate) for platform, (rate, burst) in rates.items()
+        }
+
+    def _bucket(self, platform):
+        return self._buckets.get(platform) or self._buckets['other']
+
+    def acquire(self, platform, deadline=None):
+        """Wait for a token; raises DeadlineExceeded if it won't come in time."""
+        bucket = self._bucket(platform)
+        with self._lock:
+            bucket.refill(time.monotonic())
+            # Reserve the token now (tokens may go negative) so waiters are
+            # served in arrival order without polling
+            bucket.tokens -= 1
+            wait = -bucket.tokens / bucket.rate if bucket.tokens < 0 else 0.0
+            if deadline is not None and wait > deadline.remaining():
+                bucket.tokens += 1
+                raise DeadlineExceeded(f'Request deadline of {deadline.seconds:g}s exceeded '
+                                       f'waiting for the {platform} rate limit')
+            bucket.waited += wait
+        if wait:
+            time.sleep(wait)
+
+    def throttled(self, platform):
+        bucket = self._bucket(platform)
+        with self._lock:
+            now = time.monotonic()
+            bucket.throttles += 1
+            if now - bucket.throttled_at < self.cooldown:
+                return
+            bucket.throttled_at = now
+            bucket.refill(now)
+            bucket.rate = max(bucket.min_rate, bucket.rate / 2)
+            # Drop the saved-up burst too, or the next requests go out at once
+            bucket.tokens = min(bucket.tokens, 0.0)
+        print(f"Upstream throttling from {platform}, rate now {bucket.rate:.2f} req/s")
+
+    def succeeded(self, platform):
+        bucket = self._bucket(platform)
+        with self._lock:
+            if bucket.rate < bucket.base_rate:
+                bucket.refill(time.monotonic())
+                bucket.rate = min(bucket.base_rate, bucket.rate + bucket.base_rate * self.recovery)
+
+    def retry_delay(self, platform, attempt):
+        """Sleep before retry ``attempt``: exponential, scaled by the current rate."""
+        bucket = self._bucket(platform)
+        return min(30.0, (1.0 / bucket.rate) * 2 ** attempt)
+
+    def retry_sleep_functions(self, platform):
+        """yt-dlp ``retry_sleep_functions`` that back off with the platform's rate."""
+        sleep = lambda n: self.retry_delay(platform, n)
+        return {'http': sleep, 'fragment': sleep, 'extractor': sleep}
+
+    def wrap_urlopen(self, urlopen, platform, deadline=None):
+        """Pace and watch the requests a YoutubeDL makes on behalf of ``platform``."""
+        def scheduled_urlopen(req):
+            url = req if isinstance(req, str) else getattr(req, 'url', '')
+            # Page and API requests are paced; media/CDN fetches only report back
+            if detect_platform(url) == platform:
+                self.acquire(platform, deadline)
+            try:
+                response = urlopen(req)
+            except HTTPError as e:
+                if e.status in THROTTLE_STATUSES:
+                    self.throttled(platform)
+                raise
+            self.succeeded(platform)
+            return response
+        return scheduled_urlopen
+
+    def stats(self):
+        with self._lock:
+            return {
+                platform: {
+                    'rate': round(bucket.rate, 3),
+                    'base_rate': bucket.base_rate,
+                    'tokens': round(bucket.tokens, 2),
+                    'throttles': bucket.throttles,
+                    'waited': round(bucket.waited, 3),
+                }
+                for platform, bucket in self._buckets.items()
+            }
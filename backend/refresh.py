@@ -0,0 +1,91 @@
+import threading
+import time
+
+
+class RefreshAhead:
+    """Re-extract popular cache entries shortly before they expire.
+
+    ``track(key, url, expires_at)`` is called whenever an entry is cached,
+    with the time the cache will drop it, and
+    ``hit(key)`` whenever it is served. Every ``interval`` seconds, entries
+    with at least ``min_hits`` hits that expire within ``lead`` seconds are
+    handed to ``refresh(url)`` (most popular first, at most ``batch`` per
+    round), which is expected to re-extract and re-cache them, or to return
+    False if it can't right now. Hit counts are halved after each refresh so
+    an entry only stays hot while it is used.
+    """
+
+    def __init__(self, refresh, lead=120, min_hits=3, interval=15, batch=8):
+        self.refresh = refresh
+        self.lead = lead
+        self.min_hits = min_hits
+        self.interval = interval
+        self.batch = batch
+        self._entries = {}  # key -> {'url', 'expires_at', 'hits'}
+        self._lock = threading.Lock()
+        self.refreshed = 0
+        self.failures = 0
+        self.skipped = 0
+
+    def track(self, key, url, expires_at):
+        with self._lock:
+            entry = self._entries.setdefault(key, {'url': url, 'hits': 0})
+            entry['url'] = url
+            entry['expires_at'] = expires_at
+
+    def hit(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry['hits'] += 1
+
+    def due(self):
+        """Keys worth refreshing now, most popular first; forgets expired ones."""
+        now = time.time()
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e['expires_at'] <= now]:
+                del self._entries[key]
+            due = [(e['hits'], key, e['url']) for key, e in self._entries.items()
+                   if e['hits'] >= self.min_hits and e['expires_at'] - now <= self.lead]
+        due.sort(reverse=True)
+        return [(key, url) for _, key, url in due[:self.batch]]
+
+    def run_once(self):
+        for key, url in self.due():
+            try:
+                if self.refresh(url) is False:
+                    # Busy; the entry stays due and is retried next round
+                    self.skipped += 1
+                    continue
+                with self._lock:
+                    self.refreshed += 1
+                    entry = self._entries.get(key)
+                    if entry is not None:
+                        entry['hits'] //= 2
+            except Exception as e:
+                print(f"Refresh-ahead failed for {url}: {str(e)}")
+                with self._lock:
+                    self.failures += 1
+                    # Let it expire normally rather than retrying every round
+                    self._entries.pop(key, None)
+
+    def start(self):
+        def loop():
+            while True:
+                time.sleep(self.interval)
+                try:
+                    self.run_once()
+                except Exception as e:
+                    print(f"Refresh-ahead round failed: {str(e)}")
+
+        threading.Thread(target=loop, daemon=True, name='clipcut-refresh').start()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tracked': len(self._entries),
+                'hot': sum(1 for e in self._entries.values() if e['hits'] >= self.min_hits),
+                'refreshed': self.refreshed,
+                'failures': self.failures,
+                'skipped': self.skipped,
+            }
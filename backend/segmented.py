@@ -0,0 +1,260 @@
+import json
+import os
+import threading
+import time
+
+from yt_dlp.downloader import get_suitable_downloader
+from yt_dlp.downloader.http import HttpFD
+from yt_dlp.networking import Request
+from yt_dlp.networking.exceptions import RequestError
+from yt_dlp.utils import DownloadError, parse_http_range
+from yt_dlp.utils.networking import HTTPHeaderDict
+
+# Files are only split when every segment gets at least this many bytes
+MIN_SEGMENT_SIZE = 2 * 1024 * 1024
+READ_SIZE = 256 * 1024
+# Attempts per segment; a retry resumes from the last byte written
+SEGMENT_RETRIES = 3
+
+
+class SegmentedHttpFD(HttpFD):
+    """HttpFD that fetches a progressive file over several connections.
+
+    The file's size is probed with a one-byte Range request; if the server
+    honours it, the ``.part`` file is preallocated and ``connections`` threads
+    each fetch one byte range into their own slice of it. Servers without
+    Range support, small files and partial (already ranged) requests fall
+    back to the normal single-connection download.
+
+    Segments are written into ``<name>.part.segmented`` rather than the
+    ``.part`` file, which single-connection downloads assume to hold bytes
+    from the start only. Progress per segment is saved next to it, so a
+    later attempt at the same file resumes every segment where it stopped.
+    A ``.part`` left by a single-connection attempt is taken over, and
+    before falling back to one connection the segmented file is cut back
+    to the bytes written contiguously from the start and handed back as
+    the ``.part``.
+
+    Requests go through ``ydl.urlopen``, so a checkout's Deadline and
+    upstream pacing apply to every segment.
+    """
+
+    def __init__(self, ydl, params, connections):
+        super().__init__(ydl, params)
+        self.connections = connections
+
+    def real_download(self, filename, info_dict):
+        headers = HTTPHeaderDict({'Accept-Encoding': 'identity'}, info_dict.get('http_headers'))
+        tmpfilename = self.temp_name(filename)
+        data_file = tmpfilename + '.segmented'
+        state_file = tmpfilename + '.segments'
+        size = None
+        if not (self.connections < 2 or headers.get('Range') or info_dict.get('request_data')
+                or self.params.get('test')):
+            size = self._probe_size(info_dict['url'], headers)
+        segments = min(self.connections, (size or 0) // MIN_SEGMENT_SIZE)
+        if segments < 2:
+            self._hand_off(tmpfilename, data_file, state_file)
+            return super().real_download(filename, info_dict)
+
+        bounds = [size * i // segments for i in range(segments + 1)]
+        written = self._resume_state(tmpfilename, data_file, state_file, size, bounds)
+        if any(written):
+            self.to_screen(f'[download] Resuming at {sum(written)} of {size} bytes over {segments} connections')
+        else:
+            self.to_screen(f'[download] Fetching {size} bytes over {segments} connections')
+        with open(data_file, 'r+b' if os.path.exists(data_file) else 'wb') as f:
+            f.truncate(size)
+        self._save_state(state_file, size, bounds, written)
+        errors = []
+        stop = threading.Event()
+
+        def fetch(index):
+            start, end = bounds[index], bounds[index + 1] - 1
+            try:
+                # Unbuffered, so bytes counted in ``written`` are with the OS
+                # and survive this process crashing
+                with open(data_file, 'r+b', buffering=0) as out:
+                    for attempt in range(SEGMENT_RETRIES):
+                        offset = start + written[index]
+                        if offset > end or stop.is_set():
+                            return
+                        try:
+                            self._fetch_range(info_dict['url'], headers, offset, end, out, written, index, stop)
+                        except (RequestError, OSError) as e:
+                            if attempt == SEGMENT_RETRIES - 1:
+                                raise
+                            self.report_retry(e, attempt + 1, SEGMENT_RETRIES - 1)
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+
+        workers = [threading.Thread(target=fetch, args=(i,), daemon=True, name=f'clipcut-segment-{i}')
+                   for i in range(segments)]
+        started = time.time()
+        resumed = sum(written)
+
+        def report():
+            downloaded = sum(written)
+            elapsed = time.time() - started
+            speed = (downloaded - resumed) / elapsed if elapsed else None
+            self._hook_progress({
+                'status': 'downloading',
+                'downloaded_bytes': downloaded,
+                'total_bytes': size,
+                'tmpfilename': data_file,
+                'filename': filename,
+                'elapsed': elapsed,
+                'speed': speed,
+                'eta': (size - downloaded) / speed if speed else None,
+                'ctx_id': info_dict.get('ctx_id'),
+            }, info_dict)
+
+        # Report straight away, as HttpFD does once the response starts:
+        # callers take the first progress callback as the download's start
+        report()
+        for worker in workers:
+            worker.start()
+        try:
+            # Progress hooks (and so deadline checks) run on the calling
+            # thread only, as they do for yt-dlp's own downloaders
+            while any(worker.is_alive() for worker in workers):
+                stop.wait(0.5)
+                self._save_state(state_file, size, bounds, written)
+                report()
+        finally:
+            stop.set()
+            for worker in workers:
+                worker.join()
+            self._save_state(state_file, size, bounds, written)
+
+        if errors:
+            raise errors[0]
+        if sum(written) != size:
+            raise DownloadError(f'Segmented download ended early: {sum(written)} of {size} bytes')
+
+        self.try_rename(data_file, filename)
+        self._remove(state_file)
+        self._hook_progress({
+            'status': 'finished',
+            'downloaded_bytes': size,
+            'total_bytes': size,
+            'filename': filename,
+            'elapsed': time.time() - started,
+            'ctx_id': info_dict.get('ctx_id'),
+        }, info_dict)
+        return True
+
+    def _resume_state(self, tmpfilename, data_file, state_file, size, bounds):
+        """Bytes already in place per segment from an earlier attempt."""
+        nothing = [0] * (len(bounds) - 1)
+        if not self.params.get('continuedl', True):
+            for path in (data_file, state_file):
+                self._remove(path)
+            return nothing
+        if os.path.exists(data_file):
+            state = self._load_state(state_file)
+            if state and state.get('size') == size and state.get('bounds') == bounds:
+                return state['written']
+            # A different split leaves holes we can't account for; keep
+            # what runs contiguously from the start
+            self._hand_off(tmpfilename, data_file, state_file)
+        if not os.path.exists(tmpfilename):
+            return nothing
+        # A single-connection .part: its bytes run contiguously from the start
+        have = min(os.path.getsize(tmpfilename), size)
+        os.replace(tmpfilename, data_file)
+        return [max(0, min(have - start, end - start)) for start, end in zip(bounds, bounds[1:])]
+
+    def _hand_off(self, tmpfilename, data_file, state_file):
+        """Turn what a segmented attempt left behind back into a ``.part``
+        holding only the bytes written contiguously from the start."""
+        if not os.path.exists(data_file):
+            self._remove(state_file)
+            return
+        state = self._load_state(state_file) or {}
+        bounds, written = state.get('bounds') or [0], state.get('written') or []
+        prefix = 0
+        for start, end, done in zip(bounds, bounds[1:], written):
+            prefix = start + done
+            if prefix < end:
+                break
+        if prefix and (not os.path.exists(tmpfilename) or os.path.getsize(tmpfilename) < prefix):
+            with open(data_file, 'r+b') as f:
+                f.truncate(prefix)
+            os.replace(data_file, tmpfilename)
+        else:
+            self._remove(data_file)
+        self._remove(state_file)
+
+    @staticmethod
+    def _load_state(state_file):
+        try:
+            with open(state_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _save_state(self, state_file, size, bounds, written):
+        tmp = state_file + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'size': size, 'bounds': bounds, 'written': list(written)}, f)
+        os.replace(tmp, state_file)
+
+    def _probe_size(self, url, headers):
+        """Total size if the server answers a Range request with 206, else None."""
+        try:
+            response = self.ydl.urlopen(Request(url, headers={**headers, 'Range': 'bytes=0-0'}))
+        except RequestError:
+            return None
+        try:
+            if response.status != 206:
+                return None
+            _, _, total = parse_http_range(response.headers.get('Content-Range'))
+            return total
+        finally:
+            response.close()
+
+    def _fetch_range(self, url, headers, start, end, out, written, index, stop):
+        response = self.ydl.urlopen(Request(url, headers={**headers, 'Range': f'bytes={start}-{end}'}))
+        try:
+            if response.status != 206:
+                raise DownloadError(f'Server ignored Range request (HTTP {response.status})')
+            out.seek(start)
+            while not stop.is_set() and start <= end:
+                chunk = response.read(min(READ_SIZE, end - start + 1))
+                if not chunk:
+                    raise OSError(f'Connection closed at byte {start} of segment ending at {end}')
+                out.write(chunk)
+                start += len(chunk)
+                written[index] += len(chunk)
+        finally:
+            response.close()
+
+
+def wrap_dl(ydl, connections):
+    """Replacement for ``ydl.dl`` that sends plain HTTP downloads to a
+    SegmentedHttpFD; everything else goes to yt-dlp's usual downloader.
+    With one connection it only hands back what an earlier segmented
+    attempt left behind before the normal download."""
+    original = ydl.dl
+
+    def segmented_dl(name, info, subtitle=False, test=False):
+        if (test or subtitle or name == '-' or not info.get('url')
+                or get_suitable_downloader(info, ydl.params) is not HttpFD):
+            return original(name, info, subtitle, test)
+        fd = SegmentedHttpFD(ydl, ydl.params, connections)
+        for hook in ydl._progress_hooks:
+            fd.add_progress_hook(hook)
+        new_info = ydl._copy_infodict(info)
+        if new_info.get('http_headers') is None:
+            new_info['http_headers'] = ydl._calc_headers(new_info)
+        return fd.download(name, new_info, subtitle)
+    return segmented_dl
@@ -0,0 +1,28 @@
+from flask import g, has_request_context
+
+
+def record(name, seconds, description=None):
+    """Add a stage duration to the current request's Server-Timing header.
+
+    Does nothing outside a request (job workers, batch threads), so callers
+    don't need to care where they run.
+    """
+    if not has_request_context():
+        return
+    if 'server_timing' not in g:
+        g.server_timing = []
+    g.server_timing.append((name, seconds, description))
+
+
+def header_value():
+    """Render the recorded stages as a Server-Timing header, or None."""
+    entries = g.get('server_timing')
+    if not entries:
+        return None
+    parts = []
+    for name, seconds, description in entries:
+        part = f'{name};dur={seconds * 1000:.1f}'
+        if description:
+            part += f';desc="{description}"'
+        parts.append(part)
+    return ', '.join(parts)
@@ -0,0 +1,84 @@
+import threading
+from contextlib import contextmanager
+
+
+class WaitTimeout(Exception):
+    """A caller gave up waiting for a call another caller is running."""
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.refs = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key runs the function; callers that arrive while it
+    is still in flight wait for it and get the same result (or the same
+    exception) instead of starting their own.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, timeout=None):
+        """Run ``fn`` once for all concurrent callers of ``key``."""
+        with self.hold(key, fn, timeout=timeout) as result:
+            return result
+
+    @contextmanager
+    def hold(self, key, fn, timeout=None):
+        """Like ``do`` but share the result until every caller exits the block.
+
+        Callers arriving while another is still inside get the same result
+        rather than a new call. A caller that joins a running call waits at most ``timeout`` seconds
+        for it and then raises WaitTimeout; the call itself keeps running.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+            call.refs += 1
+
+        try:
+            if leader:
+                try:
+                    call.result = fn()
+                except BaseException as e:
+                    call.error = e
+                finally:
+                    call.done.set()
+            elif not call.done.wait(timeout):
+                raise WaitTimeout(f'Timed out waiting for in-flight call {key!r}')
+
+            if call.error is not None:
+                raise call.error
+            yield call.result
+        finally:
+            with self._lock:
+                call.refs -= 1
+                if call.refs == 0 and self._calls.get(key) is call:
+                    del self._calls[key]
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+            }
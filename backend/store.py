@@ -0,0 +1,138 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class StoreError(Exception):
+    """A shared store could not be read or written."""
+
+
+class Store:
+    """Key-value store shared by the backend processes on one node.
+
+    Values are JSON-serialisable and live in namespaces ('metadata', 'jobs',
+    'media', ...). ``ttl`` is in seconds; entries without one never expire.
+    Expiry uses wall-clock time since it is compared across processes.
+    Implementations raise StoreError when the backing storage fails.
+    """
+
+    def get(self, namespace, key):
+        """Return ``(value, expires_at)`` for a live entry, or None."""
+        raise NotImplementedError
+
+    def set(self, namespace, key, value, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, namespace, key):
+        raise NotImplementedError
+
+    def items(self, namespace):
+        """``(key, value)`` pairs of the live entries in ``namespace``."""
+        raise NotImplementedError
+
+    def purge(self):
+        """Drop expired entries; returns how many were removed."""
+        raise NotImplementedError
+
+
+class SQLiteStore(Store):
+    """Store in an SQLite database file in WAL mode.
+
+    WAL lets readers in every process run alongside a writer, and writers
+    from different processes queue on the database lock for up to
+    ``timeout`` seconds. Each thread gets its own connection. Expired rows
+    are skipped on read and purged every ``purge_every`` writes.
+    """
+
+    def __init__(self, path, timeout=5.0, purge_every=1000):
+        self.path = path
+        self.timeout = timeout
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        try:
+            conn = self._conn()
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                PRIMARY KEY (namespace, key)
+            ) WITHOUT ROWID''')
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at)')
+        except sqlite3.Error as e:
+            raise StoreError(f'Cannot open store {path}: {e}')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit: every statement is its own short transaction
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            # Durable across process crashes; only an OS crash can lose the
+            # last few commits, which is fine for a cache and job index
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace, key):
+        try:
+            row = self._conn().execute(
+                'SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?',
+                (namespace, key)).fetchone()
+        except sqlite3.Error as e:
+            raise StoreError(str(e))
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, namespace, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl is not None else None
+        # Values we don't know how to encode (yt-dlp leaves a few objects in
+        # info dicts) are stored as their repr rather than failing the write
+        data = json.dumps(value, default=repr, separators=(',', ':'))
+        try:
+            self._conn().execute(
+                'INSERT OR REPLACE INTO entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)',
+                (namespace, key, data, expires_at))
+        except sqlite3.Error as e:
+            raise StoreError(str(e))
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self.purge()
+
+    def delete(self, namespace, key):
+        try:
+            self._conn().execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (namespace, key))
+        except sqlite3.Error as e:
+            raise StoreError(str(e))
+
+    def items(self, namespace):
+        try:
+            rows = self._conn().execute(
+                'SELECT key, value FROM entries WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)',
+                (namespace, time.time())).fetchall()
+        except sqlite3.Error as e:
+            raise StoreError(str(e))
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def purge(self):
+        try:
+            cursor = self._conn().execute('DELETE FROM entries WHERE expires_at <= ?', (time.time(),))
+        except sqlite3.Error as e:
+            raise StoreError(str(e))
+        return cursor.rowcount
+
+
+def open_store(spec):
+    """Open the store described by ``spec`` (``sqlite:<path>``); None for none."""
+    if not spec:
+        return None
+    scheme, _, location = spec.partition(':')
+    if scheme == 'sqlite' and location:
+        return SQLiteStore(location)
+    raise ValueError(f'Unknown store: {spec}')
@@ -0,0 +1,90 @@
+import queue
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from yt_dlp.cookies import LenientSimpleCookie
+
+# Bytes read from the upstream per chunk and how many chunks may sit in the
+# buffer between the upstream reader and the client
+CHUNK_SIZE = 256 * 1024
+MAX_BUFFERED_CHUNKS = 16
+
+# Shared keep-alive session so repeated fetches from the same CDN reuse
+# connections instead of doing a new TCP/TLS handshake each time
+session = requests.Session()
+session.mount('http://', HTTPAdapter(pool_connections=16, pool_maxsize=64))
+session.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=64))
+
+_DONE = object()
+
+
+def media_headers(http_headers, cookies=None):
+    """Request headers for a media URL yt-dlp resolved.
+
+    yt-dlp keeps a format's cookies out of its ``http_headers`` and in its
+    ``cookies`` field instead (``name=value; Domain=...; Path=...``); CDNs
+    that gate media on them (TikTok's does) refuse requests without them,
+    so they are sent as a Cookie header here.
+    """
+    headers = dict(http_headers or {})
+    if cookies:
+        pairs = '; '.join(f'{m.key}={m.coded_value}' for m in LenientSimpleCookie(cookies).values())
+        if pairs:
+            headers['Cookie'] = pairs
+    return headers
+
+
+def open_stream(url, headers=None, chunk_size=CHUNK_SIZE, max_buffered=MAX_BUFFERED_CHUNKS, timeout=30):
+    """Open an upstream media URL and return ``(upstream_response, chunks)``.
+
+    A reader thread pulls chunks from the upstream into a bounded queue while
+    ``chunks`` hands them to the client. When the client is slower than the
+    upstream the queue fills and the reader blocks, so no more than
+    ``max_buffered`` chunks are ever held in memory. Closing ``chunks`` (the
+    client went away) stops the reader and releases the upstream connection.
+    """
+    upstream = session.get(url, headers=headers, stream=True, timeout=timeout)
+    try:
+        upstream.raise_for_status()
+    except Exception:
+        upstream.close()
+        raise
+
+    buffer = queue.Queue(maxsize=max_buffered)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def reader():
+        try:
+            for chunk in upstream.iter_content(chunk_size):
+                if chunk and not put(chunk):
+                    return
+            put(_DONE)
+        except Exception as e:
+            put(e)
+        finally:
+            upstream.close()
+
+    def chunks():
+        try:
+            while True:
+                item = buffer.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+
+    threading.Thread(target=reader, daemon=True, name='clipcut-stream').start()
+    return upstream, chunks()
@@ -0,0 +1,95 @@
+import os
+import re
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# The backend is a flat set of modules run from backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep app's caches, staging and job directories out of the real temp dir
+tempfile.tempdir = tempfile.mkdtemp(prefix='clipcut-tests-')
+os.environ.setdefault('CLIPCUT_REFRESH_AHEAD', '0')
+
+# Importing app starts a thread building YoutubeDL instances, which look up
+# sys.stdout as they go; let it finish before pytest starts swapping that
+import app
+for thread in threading.enumerate():
+    if thread.name == 'clipcut-ydl-warm':
+        thread.join()
+
+
+@pytest.fixture
+def serve():
+    """Start a local HTTP server for a handler class; returns its base URL."""
+    servers = []
+
+    def serve(handler):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f'http://127.0.0.1:{server.server_port}'
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    """Serves ``data`` at any path, honouring Range unless ``ranges`` is off;
+    ``/*.m3u8`` is an HLS playlist of ``segment``-byte pieces of it
+    (``/seg<n>.ts``). Requests are logged as (path, Range header)."""
+
+    protocol_version = 'HTTP/1.1'
+    data = b''
+    ranges = True
+    segment = 64 * 1024
+    requests = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.requests.append((self.path, self.headers.get('Range')))
+        if self.path.endswith('.m3u8'):
+            count = -(-len(self.data) // self.segment)
+            body = ('#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-TARGETDURATION:2\n#EXT-X-MEDIA-SEQUENCE:0\n'
+                    + ''.join(f'#EXTINF:2.0,\nseg{i}.ts\n' for i in range(count))
+                    + '#EXT-X-ENDLIST\n').encode()
+            return self.reply(200, body, 'application/vnd.apple.mpegurl')
+        segment = re.match(r'/seg(\d+)\.ts', self.path)
+        if segment:
+            index = int(segment.group(1))
+            return self.reply(200, self.data[index * self.segment:(index + 1) * self.segment], 'video/mp2t')
+        byte_range = re.match(r'bytes=(\d+)-(\d*)$', self.headers.get('Range') or '')
+        if not (self.ranges and byte_range):
+            return self.reply(200, self.data)
+        start = int(byte_range.group(1))
+        end = min(int(byte_range.group(2) or len(self.data) - 1), len(self.data) - 1)
+        if start >= len(self.data):
+            return self.reply(416, b'', extra={'Content-Range': f'bytes */{len(self.data)}'})
+        self.reply(206, self.data[start:end + 1], extra={'Content-Range': f'bytes {start}-{end}/{len(self.data)}'})
+
+    def reply(self, status, body, content_type='video/mp4', extra=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if self.ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        for name, value in (extra or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def media(serve):
+    """Serve bytes with MediaHandler; returns ``(base_url, handler_class)``."""
+    def media(data, **attrs):
+        handler = type('Handler', (MediaHandler,), dict(data=data, requests=[], **attrs))
+        return serve(handler), handler
+    return media
@@ -0,0 +1,69 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, Overloaded
+
+
+def test_slots_are_handed_out_in_arrival_order():
+    controller = AdmissionController('test', limit=1, max_waiting=4, max_wait=5)
+    assert controller.acquire() == 0.0
+    order = []
+
+    def wait(name):
+        controller.acquire()
+        order.append(name)
+        controller.release(0.01)
+
+    threads = []
+    for name in ('first', 'second', 'third'):
+        threads.append(threading.Thread(target=wait, args=(name,)))
+        threads[-1].start()
+        while controller.stats()['waiting'] < len(threads):
+            time.sleep(0.005)
+    controller.release(0.01)
+    for thread in threads:
+        thread.join(5)
+
+    assert order == ['first', 'second', 'third']
+    assert controller.stats()['admitted'] == 4
+    assert controller.stats()['active'] == 0
+
+
+def test_full_queue_is_rejected_with_a_retry_hint():
+    controller = AdmissionController('test', limit=1, max_waiting=0, max_wait=5)
+    controller.acquire()
+    controller.release(4.0)
+    controller.acquire()
+
+    with pytest.raises(Overloaded) as rejected:
+        controller.acquire()
+
+    # Average hold time 0.8 * 1s + 0.2 * 4s, for one caller ahead per slot
+    assert rejected.value.retry_after == 2
+    assert controller.stats()['rejected'] == 1
+
+
+def test_waiting_too_long_is_rejected():
+    controller = AdmissionController('test', limit=1, max_waiting=1, max_wait=0.05)
+    controller.acquire()
+
+    with pytest.raises(Overloaded):
+        controller.acquire()
+    assert controller.stats()['timed_out'] == 1
+    assert controller.stats()['waiting'] == 0
+
+
+def test_overloaded_route_answers_429_with_retry_after(monkeypatch):
+    import app
+
+    controller = app.admission['info']
+    monkeypatch.setattr(controller, 'limit', 1)
+    monkeypatch.setattr(controller, 'max_waiting', 0)
+    with controller.slot():
+        response = app.app.test_client().post('/api/video-info', json={'url': 'https://example.com/v'})
+
+    assert response.status_code == 429
+    assert response.get_json()['type'] == 'overloaded'
+    assert int(response.headers['Retry-After']) >= 1
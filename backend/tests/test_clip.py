@@ -0,0 +1,39 @@
+import pytest
+
+import app
+
+
+@pytest.mark.parametrize('data, expected', [
+    ({}, None),
+    ({'start': '', 'end': None}, None),
+    ({'start': '1:30', 'end': 95}, {'start': 90.0, 'end': 95.0, 'precise': False}),
+    ({'end': '10', 'precise': True}, {'start': 0.0, 'end': 10.0, 'precise': True}),
+])
+def test_parse_clip(data, expected):
+    assert app.parse_clip(data) == expected
+
+
+@pytest.mark.parametrize('data', [
+    {'start': [1]},
+    {'start': {'s': 1}},
+    {'end': 'soon'},
+    {'start': float('nan')},
+    {'start': 0, 'end': float('inf')},
+    {'start': -1},
+    {'start': 10, 'end': 5},
+])
+def test_parse_clip_rejects_invalid_bounds(data):
+    with pytest.raises(ValueError):
+        app.parse_clip(data)
+
+
+@pytest.mark.parametrize('body', [
+    '{"url": "https://example.com/v", "start": [1]}',
+    '{"url": "https://example.com/v", "start": NaN}',
+    '{"url": "https://example.com/v", "end": Infinity}',
+])
+def test_download_answers_invalid_clip_with_json_400(body):
+    # Closing the response gives back its download admission slot
+    with app.app.test_client().post('/api/download', data=body, content_type='application/json') as response:
+        assert response.status_code == 400
+        assert 'Invalid time' in response.get_json()['error']
@@ -0,0 +1,63 @@
+import time
+
+import pytest
+import yt_dlp
+from yt_dlp.networking import Request
+
+from deadline import Deadline, DeadlineExceeded
+
+
+def test_remaining_and_check():
+    deadline = Deadline(0.05)
+    assert 0 < deadline.remaining() <= 0.05
+    deadline.check()
+    time.sleep(0.06)
+    assert deadline.expired() and deadline.remaining() == 0
+    with pytest.raises(DeadlineExceeded):
+        deadline.check()
+
+
+def test_stage_limits_then_restores():
+    deadline = Deadline(10)
+    expires = deadline.expires
+    with deadline.stage(0.5):
+        assert deadline.remaining() <= 5
+    assert deadline.expires == expires
+
+
+def test_urlopen_timeouts_are_capped_to_the_time_left():
+    deadline = Deadline(3)
+    seen = []
+    urlopen = deadline.wrap_urlopen(lambda req: seen.append(req), socket_timeout=30)
+
+    urlopen('https://example.com/a')
+    urlopen(Request('https://example.com/b', extensions={'timeout': 2}))
+
+    assert 2.5 < seen[0].extensions['timeout'] <= 3
+    assert seen[1].extensions['timeout'] == 2
+    # Never below a second, so a nearly spent deadline still gets a try
+    assert Deadline(0.1).cap(30) == 1.0
+
+
+def test_urlopen_after_the_deadline_raises():
+    deadline = Deadline(0)
+    urlopen = deadline.wrap_urlopen(lambda req: pytest.fail('request sent'), socket_timeout=30)
+    with pytest.raises(DeadlineExceeded):
+        urlopen('https://example.com/a')
+
+
+def test_video_info_answers_504_once_the_deadline_passes(monkeypatch):
+    import app
+
+    def stub_extract_info(self, url, download=False, **kwargs):
+        time.sleep(0.3)
+        # Goes through the deadline the pool applied at checkout
+        self.urlopen(url)
+
+    monkeypatch.setattr(yt_dlp.YoutubeDL, 'extract_info', stub_extract_info)
+
+    response = app.app.test_client().post(
+        '/api/video-info', json={'url': 'https://example.com/videos/slow', 'timeout': 0.2})
+
+    assert response.status_code == 504
+    assert response.get_json()['type'] == 'timeout'
@@ -0,0 +1,32 @@
+import os
+
+import yt_dlp
+
+BODY = os.urandom(300 * 1024)
+
+
+def test_download_after_video_info_extracts_once(media, monkeypatch):
+    import app
+
+    base, _ = media(BODY)
+    calls = []
+
+    def stub_extract_info(self, url, download=False, **kwargs):
+        calls.append(url)
+        return {'id': 'once', 'title': 'Once', 'extractor': 'generic', 'extractor_key': 'Generic',
+                'webpage_url': url,
+                'formats': [{'format_id': 'h264', 'url': base + '/once.mp4', 'ext': 'mp4', 'protocol': 'http',
+                             'vcodec': 'h264', 'acodec': 'aac', 'height': 360}]}
+
+    monkeypatch.setattr(yt_dlp.YoutubeDL, 'extract_info', stub_extract_info)
+    url = 'https://example.com/videos/extract-once'
+    client = app.app.test_client()
+    before = app.extraction_counts.get('other', 0)
+
+    assert client.post('/api/video-info', json={'url': url}).status_code == 200
+    with client.post('/api/download', json={'url': url}) as response:
+        assert response.status_code == 200
+        assert response.data == BODY
+
+    assert len(calls) == 1
+    assert app.extraction_counts['other'] - before == 1
@@ -0,0 +1,61 @@
+from formats import FormatRecord, format_list, pick, rank_formats, select_direct_format
+
+
+def fmt(format_id, **fields):
+    fields.setdefault('url', f'https://cdn.example.com/{format_id}.mp4')
+    return dict(format_id=format_id, **fields)
+
+
+INFO = {'formats': [
+    fmt('audio', ext='m4a', vcodec='none', acodec='mp4a', abr=128),
+    fmt('360', ext='mp4', height=360, width=640, vcodec='avc1', acodec='mp4a', tbr=800),
+    fmt('720-webm', ext='webm', height=720, width=1280, vcodec='vp9', acodec='opus', tbr=1500),
+    fmt('720-mp4', ext='mp4', height=720, width=1280, vcodec='avc1', acodec='mp4a', tbr=1500),
+    fmt('1080-video', ext='mp4', height=1080, width=1920, vcodec='avc1', acodec='none', tbr=3000),
+    fmt('hls', ext='mp4', height=1080, protocol='m3u8_native', vcodec='avc1', acodec='mp4a',
+        url='https://cdn.example.com/master.m3u8'),
+    {'format_id': 'storyboard', 'ext': 'mhtml'},  # no URL
+]}
+
+
+def test_formats_are_ranked_best_first():
+    ranked = [record.format_id for record in rank_formats(INFO)]
+    assert ranked == ['1080-video', 'hls', '720-mp4', '720-webm', '360', 'audio']
+
+
+def test_direct_format_is_one_http_file_with_audio():
+    assert select_direct_format(rank_formats(INFO)).format_id == '720-mp4'
+    assert select_direct_format(rank_formats({'formats': [INFO['formats'][0]]})) is None
+
+
+def test_known_codecs_win_over_a_higher_resolution():
+    info = {'formats': [fmt('unknown', ext='mp4', height=1080), fmt('known', ext='mp4', height=720,
+                                                                   vcodec='avc1', acodec='mp4a')]}
+    assert select_direct_format(rank_formats(info)).format_id == 'known'
+
+
+def test_single_format_info_ranks_itself():
+    info = fmt('only', ext='unknown_video', url='https://cdn.example.com/v.webm?expire=1900000000', height=480)
+    [record] = rank_formats(info)
+    assert record.ext == 'webm'
+    assert record.expires_at == 1900000000
+    assert record.direct  # missing codecs mean unknown, not absent
+
+
+def test_resolution_string_fills_in_dimensions():
+    record = FormatRecord(fmt('r', resolution='854x480'))
+    assert (record.width, record.height) == (854, 480)
+    assert record.as_dict()['resolution'] == '854x480'
+
+
+def test_format_list_leaves_out_other_containers():
+    listed = format_list(rank_formats(INFO))
+    assert [f['format_id'] for f in listed] == ['1080-video', 'hls', '720-mp4', '720-webm', '360']
+    assert listed[0]['has_audio'] is False
+
+
+def test_pick_prefers_within_the_accepted_records():
+    records = rank_formats(INFO)
+    assert pick(records, lambda r: r.has_audio).format_id == 'hls'
+    assert pick(records, lambda r: r.height == 720, prefer=lambda r: r.ext == 'webm').format_id == '720-webm'
+    assert pick(records, lambda r: False) is None
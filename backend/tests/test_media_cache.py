@@ -0,0 +1,123 @@
+import os
+import time
+
+import pytest
+
+from media_cache import MediaCache
+
+KEYS = {name: name * 32 for name in ('aa', 'bb', 'cc', 'dd')}
+
+
+@pytest.fixture
+def staged():
+    def staged(cache, name, size):
+        path = os.path.join(cache.staging_dir, name + '.mp4')
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+        return path
+    return staged
+
+
+def age(path, seconds):
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def test_least_recently_used_file_is_evicted(tmp_path, staged):
+    cache = MediaCache(str(tmp_path), max_bytes=100, fresh_for=0)
+    first = cache.put(KEYS['aa'], staged(cache, 'a', 40))
+    second = cache.put(KEYS['bb'], staged(cache, 'b', 40))
+    age(first, 20)
+    age(second, 30)
+    assert cache.get(KEYS['aa']) == first  # now the most recent
+
+    cache.put(KEYS['cc'], staged(cache, 'c', 40))
+
+    assert os.path.exists(first)
+    assert not os.path.exists(second)
+    assert cache.get(KEYS['bb']) is None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_pinned_file_is_not_evicted(tmp_path, staged):
+    cache = MediaCache(str(tmp_path), max_bytes=50)
+    first = cache.put(KEYS['aa'], staged(cache, 'a', 40))
+    age(first, 120)
+
+    with cache.pinned(first):
+        second = cache.put(KEYS['bb'], staged(cache, 'b', 40))
+        assert os.path.exists(first)
+    assert os.path.exists(second)
+
+
+def test_put_returns_a_file_that_still_exists(tmp_path, staged):
+    cache = MediaCache(str(tmp_path), max_bytes=50)
+
+    # Bigger than the whole quota
+    path = cache.put(KEYS['aa'], staged(cache, 'a', 80))
+    assert os.path.exists(path)
+
+    # A concurrent put must not evict the file the first caller is about to send
+    other = cache.put(KEYS['bb'], staged(cache, 'b', 40))
+    assert os.path.exists(path) and os.path.exists(other)
+
+    # Once no longer fresh, the quota applies again
+    age(path, 120)
+    age(other, 90)
+    cache.put(KEYS['cc'], staged(cache, 'c', 10))
+    assert not os.path.exists(path)
+    assert os.path.exists(other)
+
+
+def test_index_survives_a_restart(tmp_path, staged):
+    cache = MediaCache(str(tmp_path), max_bytes=100)
+    path = cache.put(KEYS['aa'], staged(cache, 'a', 10))
+
+    assert MediaCache(str(tmp_path), max_bytes=100).get(KEYS['aa']) == path
+
+
+@pytest.fixture
+def store(tmp_path):
+    from store import SQLiteStore
+    return SQLiteStore(str(tmp_path / 'state.db'))
+
+
+def test_processes_share_the_index(tmp_path, staged, store):
+    root = str(tmp_path / 'media')
+    first, second = MediaCache(root, 100, store=store), MediaCache(root, 100, store=store)
+
+    path = first.put(KEYS['aa'], staged(first, 'a', 10), alias='generic:https://example.com/v')
+
+    assert second.get_alias('generic:https://example.com/v') == path
+
+
+def test_quota_holds_across_processes(tmp_path, staged, store):
+    root = str(tmp_path / 'media')
+    first, second = MediaCache(root, 100, store=store), MediaCache(root, 100, store=store)
+    old = first.put(KEYS['aa'], staged(first, 'a', 40))
+    newer = second.put(KEYS['bb'], staged(second, 'b', 40))
+    age(old, 300)
+    age(newer, 200)
+
+    # Each process alone holds 40 bytes, but the node holds 120
+    first.put(KEYS['cc'], staged(first, 'c', 40))
+
+    assert not os.path.exists(old)
+    assert os.path.exists(newer)
+    assert sorted(key[:2] for key, _ in store.items('media')) == ['bb', 'cc']
+
+
+def test_pins_hold_across_processes(tmp_path, staged, store):
+    root = str(tmp_path / 'media')
+    first, second = MediaCache(root, 50, store=store), MediaCache(root, 50, store=store)
+    path = first.put(KEYS['aa'], staged(first, 'a', 40))
+    age(path, 300)
+
+    with first.pinned(path):
+        other = second.put(KEYS['bb'], staged(second, 'b', 40))
+        assert os.path.exists(path)
+    assert store.items('media_pin') == []
+
+    age(other, 200)
+    second.put(KEYS['cc'], staged(second, 'c', 5))
+    assert not os.path.exists(path)
@@ -0,0 +1,45 @@
+import yt_dlp
+from yt_dlp.utils import ExtractorError, UnsupportedError
+
+from utils import canonicalize_url
+
+
+def test_transient_primary_error_is_not_cached_as_unsupported(monkeypatch):
+    import app
+
+    calls = []
+
+    def stub_extract_info(self, url, download=False, ie_key=None, **kwargs):
+        calls.append(ie_key)
+        if ie_key == 'Generic':
+            raise UnsupportedError(url)
+        raise ExtractorError('Sign in to confirm you’re not a bot')
+
+    monkeypatch.setattr(yt_dlp.YoutubeDL, 'extract_info', stub_extract_info)
+    url = 'https://example.com/videos/bot-check'
+
+    response = app.app.test_client().post('/api/video-info', json={'url': url})
+
+    assert response.status_code == 400
+    assert response.get_json()['reason'] is None
+    assert calls == [None, 'Generic']
+    assert app.negative_cache.get(canonicalize_url(url)) is None
+
+    # A repeat lookup tries upstream again instead of a cached failure
+    app.app.test_client().post('/api/video-info', json={'url': url})
+    assert calls == [None, 'Generic'] * 2
+
+
+def test_lasting_primary_error_is_cached(monkeypatch):
+    import app
+
+    def stub_extract_info(self, url, download=False, ie_key=None, **kwargs):
+        raise ExtractorError('This video is private')
+
+    monkeypatch.setattr(yt_dlp.YoutubeDL, 'extract_info', stub_extract_info)
+    url = 'https://example.com/videos/private'
+
+    response = app.app.test_client().post('/api/video-info', json={'url': url})
+
+    assert response.get_json()['reason'] == 'private'
+    assert app.negative_cache.get(canonicalize_url(url))['reason'] == 'private'
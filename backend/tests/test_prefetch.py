@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from prefetch import Prefetcher, PrefetchCancelled, _Bandwidth
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def fetch_of(size, chunks=4):
+    def fetch(hook):
+        for i in range(1, chunks + 1):
+            hook({'status': 'downloading', 'downloaded_bytes': size * i // chunks, 'total_bytes': size})
+        return size
+    return fetch
+
+
+def test_prefetched_video_counts_as_a_hit_when_claimed():
+    prefetcher = Prefetcher(bandwidth=0)
+    assert prefetcher.submit('a', fetch_of(1000))
+    wait_for(lambda: prefetcher.stats()['completed'] == 1)
+
+    assert not prefetcher.submit('a', fetch_of(1000))  # still waiting to be claimed
+    assert prefetcher.claim('a')
+    assert not prefetcher.claim('a')
+    stats = prefetcher.stats()
+    assert stats['hits'] == 1 and stats['hit_ratio'] == 1.0 and stats['unclaimed_bytes'] == 0
+
+
+def test_busy_or_full_prefetcher_skips():
+    prefetcher = Prefetcher(concurrency=1, bandwidth=0)
+    release = threading.Event()
+    assert not prefetcher.submit('a', fetch_of(10), busy=True)
+    assert prefetcher.submit('b', lambda hook: release.wait(5) and 10)
+    assert not prefetcher.submit('c', fetch_of(10))
+    release.set()
+    assert prefetcher.stats()['skipped'] == 2
+
+
+def test_prefetch_over_the_disk_budget_is_cancelled():
+    prefetcher = Prefetcher(bandwidth=0, disk_budget=500)
+    errors = []
+
+    def fetch(hook):
+        try:
+            fetch_of(1000)(hook)
+        except PrefetchCancelled as e:
+            errors.append(e)
+            raise
+
+    prefetcher.submit('a', fetch)
+    wait_for(lambda: prefetcher.stats()['failed'] == 1)
+    assert errors
+    assert prefetcher.stats()['wasted_bytes'] == 250  # the first chunk
+
+
+def test_claim_lifts_the_bandwidth_limit():
+    prefetcher = Prefetcher(bandwidth=1000)  # 1 KB/s: 10 KB would take seconds
+    prefetcher.submit('a', fetch_of(10_000, chunks=10))
+    wait_for(lambda: prefetcher.stats()['in_flight'] == 1)
+    time.sleep(0.05)
+
+    started = time.monotonic()
+    assert prefetcher.claim('a')
+    wait_for(lambda: prefetcher.stats()['in_flight'] == 0)
+    assert time.monotonic() - started < 1
+    assert prefetcher.stats()['hits'] == 1
+
+
+def test_nothing_fetched_counts_as_redundant():
+    prefetcher = Prefetcher(bandwidth=0)
+    prefetcher.submit('cached', lambda hook: 1000)
+    wait_for(lambda: prefetcher.stats()['redundant'] == 1)
+    assert not prefetcher.claim('cached')
+
+
+def test_unclaimed_files_are_wasted_after_the_window():
+    prefetcher = Prefetcher(bandwidth=0, window=0.05)
+    prefetcher.submit('a', fetch_of(1000))
+    wait_for(lambda: prefetcher.stats()['completed'] == 1)
+    time.sleep(0.06)
+    assert prefetcher.stats()['wasted_bytes'] == 1000
+    assert not prefetcher.claim('a')
+
+
+def test_bandwidth_paces_with_a_second_of_burst():
+    bandwidth = _Bandwidth(1000)
+    assert bandwidth.delay(1000) == pytest.approx(1.0, abs=0.05)
+    assert bandwidth.delay(500) == pytest.approx(1.5, abs=0.05)
+
+    # After a long idle spell only one second's worth is available at once
+    bandwidth._paid_until -= 10
+    assert bandwidth.delay(1000) == pytest.approx(0, abs=0.05)
+    assert bandwidth.delay(500) == pytest.approx(0.5, abs=0.05)
+    assert _Bandwidth(0).delay(10 ** 9) == 0.0
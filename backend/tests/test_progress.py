@@ -0,0 +1,136 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+import yt_dlp
+
+from conftest import MediaHandler
+from progress import DownloadAbandoned, ProgressHub
+
+
+def downloading(done, total=100):
+    return {'status': 'downloading', 'downloaded_bytes': done, 'total_bytes': total}
+
+
+def test_requests_sharing_a_download_see_its_progress():
+    hub = ProgressHub()
+    with hub.track('video', 'first') as download, hub.track('video', 'second') as same:
+        assert download is same
+        download.progress_hook(downloading(25))
+        first, second = hub.get('first'), hub.get('second')
+        assert first.state['percent'] == 25.0 and second.state['percent'] == 25.0
+        download.postprocessor_hook({'status': 'started', 'postprocessor': 'Merger'})
+        assert first.state['phase'] == 'merging'
+
+    # Finished channels stay around for streams opened late
+    assert hub.get('first').state['phase'] == 'finished'
+    assert hub.stats()['downloads'] == 0
+
+
+def test_events_coalesce_updates_and_end_with_done():
+    hub = ProgressHub()
+    with hub.track('video', 'id') as download:
+        channel = hub.get('id')
+        events = hub.events(channel, interval=0)
+        download.progress_hook(downloading(10))
+        download.progress_hook(downloading(20))
+        event = next(events)
+    assert event.startswith('event: progress\n')
+    assert json.loads(event.split('data: ', 1)[1])['downloaded_bytes'] == 20
+    event = next(events)
+    assert event.startswith('event: done\n')
+    assert json.loads(event.split('data: ', 1)[1])['phase'] == 'finished'
+
+
+def close_stream(hub, progress_id):
+    events = hub.events(hub.get(progress_id), interval=0)
+    next(events)
+    events.close()
+
+
+def test_download_is_cancelled_once_every_stream_is_gone():
+    hub = ProgressHub(grace=0)
+    with pytest.raises(DownloadAbandoned):
+        with hub.track('video', 'id') as download:
+            download.progress_hook(downloading(1))
+            close_stream(hub, 'id')
+            download.progress_hook(downloading(2))
+    assert hub.get('id').state['phase'] == 'failed'
+
+
+def test_download_carries_on_while_anyone_may_be_waiting():
+    hub = ProgressHub(grace=0)
+    # The second request never opened a stream, so it may still be waiting
+    with hub.track('video', 'watched') as download, hub.track('video', 'blind'):
+        download.progress_hook(downloading(1))
+        close_stream(hub, 'watched')
+        download.progress_hook(downloading(2))
+
+    # Jobs are never cancelled
+    with hub.track('job', 'job-id', cancellable=False) as download:
+        download.progress_hook(downloading(1))
+        close_stream(hub, 'job-id')
+        download.progress_hook(downloading(2))
+
+
+def test_get_waits_for_the_request_to_arrive():
+    hub = ProgressHub()
+    release = threading.Event()
+
+    def request():
+        with hub.track('video', 'late'):
+            release.wait(5)
+
+    threading.Timer(0.05, threading.Thread(target=request).start).start()
+    assert hub.get('late', timeout=5) is not None
+    release.set()
+    assert hub.get('unknown') is None
+
+
+class SlowMedia(MediaHandler):
+    def reply(self, status, body, content_type='video/mp4', extra=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        try:
+            for i in range(0, len(body), 16 * 1024):
+                self.wfile.write(body[i:i + 16 * 1024])
+                time.sleep(0.05)
+        except OSError:
+            pass
+
+
+def test_closing_the_progress_stream_cancels_the_download(serve, monkeypatch):
+    import app
+
+    base = serve(type('Handler', (SlowMedia,), {'data': os.urandom(512 * 1024), 'ranges': False,
+                                                 'requests': []}))
+
+    def stub_extract_info(self, url, download=False, **kwargs):
+        return {'id': 'abandoned', 'title': 'Abandoned', 'extractor': 'generic', 'extractor_key': 'Generic',
+                'webpage_url': url,
+                'formats': [{'format_id': 'h264', 'url': base + '/v.mp4', 'ext': 'mp4', 'protocol': 'http',
+                             'vcodec': 'h264', 'acodec': 'aac', 'height': 360}]}
+
+    monkeypatch.setattr(yt_dlp.YoutubeDL, 'extract_info', stub_extract_info)
+    monkeypatch.setattr(app.progress_hub, 'grace', 0)
+    client = app.app.test_client()
+    result = {}
+
+    def download():
+        with client.post('/api/download', json={'url': 'https://example.com/videos/abandoned',
+                                                'progress_id': 'abandon-me'}) as response:
+            result['status'] = response.status_code
+
+    thread = threading.Thread(target=download)
+    thread.start()
+    stream = client.get('/api/progress/abandon-me')
+    assert stream.status_code == 200
+    assert next(stream.response).startswith(b'event: progress')
+    stream.close()
+    thread.join(10)
+
+    assert result['status'] == 499
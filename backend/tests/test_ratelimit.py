@@ -0,0 +1,84 @@
+import io
+import time
+
+import pytest
+from yt_dlp.networking import Response
+from yt_dlp.networking.exceptions import HTTPError
+
+from deadline import Deadline, DeadlineExceeded
+from ratelimit import AdaptiveScheduler
+
+
+def scheduler(**kwargs):
+    return AdaptiveScheduler({'tiktok': (20.0, 2), 'other': (100.0, 10)}, **kwargs)
+
+
+def test_burst_then_paced():
+    pacer = scheduler()
+    started = time.monotonic()
+    for _ in range(2):
+        pacer.acquire('tiktok')
+    assert time.monotonic() - started < 0.03
+    for _ in range(3):
+        pacer.acquire('tiktok')
+    # Three more tokens at 20/s
+    assert time.monotonic() - started >= 0.14
+
+
+def test_throttling_halves_the_rate_once_per_cooldown():
+    pacer = scheduler(cooldown=60)
+    pacer.throttled('tiktok')
+    pacer.throttled('tiktok')
+    stats = pacer.stats()['tiktok']
+    assert stats['rate'] == 10.0
+    assert stats['throttles'] == 2
+    assert stats['tokens'] <= 0
+
+
+def test_rate_is_floored_and_recovers_additively():
+    pacer = scheduler(cooldown=0, min_rate=4.0, recovery=0.25)
+    for _ in range(5):
+        pacer.throttled('tiktok')
+    assert pacer.stats()['tiktok']['rate'] == 4.0
+
+    pacer.succeeded('tiktok')
+    assert pacer.stats()['tiktok']['rate'] == 9.0  # + 0.25 * 20
+    for _ in range(10):
+        pacer.succeeded('tiktok')
+    assert pacer.stats()['tiktok']['rate'] == 20.0
+
+
+def test_unknown_platforms_share_the_other_bucket():
+    pacer = scheduler(cooldown=0)
+    pacer.throttled('youtube')
+    assert pacer.stats()['other']['rate'] == 50.0
+
+
+def test_wait_past_the_deadline_raises_without_taking_a_token():
+    pacer = scheduler()
+    pacer.throttled('tiktok')  # no tokens left, 10/s
+    with pytest.raises(DeadlineExceeded):
+        pacer.acquire('tiktok', Deadline(0.01))
+    assert pacer.stats()['tiktok']['tokens'] == pytest.approx(0, abs=0.05)
+
+
+def test_urlopen_reports_throttling_and_paces_only_platform_hosts():
+    pacer = scheduler(cooldown=0)
+    requests = []
+
+    def urlopen(url):
+        requests.append(url)
+        if url.endswith('/throttled'):
+            raise HTTPError(Response(io.BytesIO(b''), url, {}, status=429))
+        return url
+
+    scheduled = pacer.wrap_urlopen(urlopen, 'tiktok')
+    with pytest.raises(HTTPError):
+        scheduled('https://www.tiktok.com/throttled')
+    assert pacer.stats()['tiktok']['rate'] == 10.0
+
+    # CDN fetches take no token but still count as successes
+    tokens = pacer.stats()['tiktok']['tokens']
+    scheduled('https://v16.tiktokcdn.com/video.mp4')
+    assert pacer.stats()['tiktok']['tokens'] == pytest.approx(tokens, abs=0.1)
+    assert pacer.stats()['tiktok']['rate'] == 11.0
@@ -0,0 +1,108 @@
+import json
+import os
+
+import pytest
+
+import segmented
+from ydl_pool import YoutubeDLPool
+
+DATA = os.urandom(1024 * 1024)
+PARAMS = {'quiet': True, 'no_warnings': True, 'noprogress': True, 'format': 'best', 'cachedir': False}
+
+
+@pytest.fixture(autouse=True)
+def small_segments(monkeypatch):
+    monkeypatch.setattr(segmented, 'MIN_SEGMENT_SIZE', 128 * 1024)
+
+
+def download(tmp_path, url, connections, protocol='http', hooks=()):
+    pool = YoutubeDLPool('test', PARAMS, size=1)
+    info = {'id': 'clip', 'title': 'clip', 'ext': 'mp4', 'extractor': 'generic', 'extractor_key': 'Generic',
+            'webpage_url': url, 'formats': [{'format_id': 'f', 'url': url, 'ext': 'mp4', 'protocol': protocol,
+                                             'vcodec': 'h264', 'acodec': 'aac'}]}
+    with pool.checkout(outtmpl=str(tmp_path / '%(id)s.%(ext)s'), connections=connections,
+                       progress_hooks=list(hooks)) as ydl:
+        result = ydl.process_ie_result(info, download=True)
+    path = result['requested_downloads'][0]['filepath']
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def ranges(handler):
+    return sorted(r for path, r in handler.requests if r and r != 'bytes=0-0')
+
+
+def test_file_is_split_across_connections(tmp_path, media):
+    base, handler = media(DATA)
+    hooks = []
+
+    assert download(tmp_path, base + '/v.mp4', 4, hooks=[hooks.append]) == DATA
+
+    assert ('/v.mp4', 'bytes=0-0') in handler.requests
+    assert len(ranges(handler)) == 4
+    # Reported before any segment arrives: the first hook marks the start
+    assert hooks[0]['status'] == 'downloading' and hooks[0]['downloaded_bytes'] == 0
+    assert hooks[-1]['status'] == 'finished'
+    assert sorted(os.listdir(tmp_path)) == ['clip.mp4']
+
+
+def test_server_without_range_support_gets_one_connection(tmp_path, media):
+    base, handler = media(DATA, ranges=False)
+
+    assert download(tmp_path, base + '/v.mp4', 4) == DATA
+    assert len([r for r in handler.requests if r[1] is None]) == 1
+
+
+def test_small_file_is_not_split(tmp_path, media):
+    base, handler = media(DATA[:200 * 1024])
+
+    assert download(tmp_path, base + '/v.mp4', 4) == DATA[:200 * 1024]
+    assert ranges(handler) == []
+
+
+def write_partial(tmp_path, bounds, written):
+    part = tmp_path / 'clip.mp4.part'
+    data = bytearray(len(DATA))
+    for start, done in zip(bounds, written):
+        data[start:start + done] = DATA[start:start + done]
+    (tmp_path / 'clip.mp4.part.segmented').write_bytes(bytes(data))
+    (tmp_path / 'clip.mp4.part.segments').write_text(
+        json.dumps({'size': len(DATA), 'bounds': bounds, 'written': written}))
+    return part
+
+
+def test_segments_resume_where_they_stopped(tmp_path, media):
+    base, handler = media(DATA)
+    bounds = [len(DATA) * i // 4 for i in range(5)]
+    write_partial(tmp_path, bounds, [1000, 0, 5000, 65536])
+
+    assert download(tmp_path, base + '/v.mp4', 4) == DATA
+    starts = sorted(int(r.split('=')[1].split('-')[0]) for r in ranges(handler))
+    assert starts == [bounds[0] + 1000, bounds[1], bounds[2] + 5000, bounds[3] + 65536]
+
+
+def test_single_connection_resumes_the_contiguous_prefix(tmp_path, media):
+    base, handler = media(DATA)
+    bounds = [len(DATA) * i // 4 for i in range(5)]
+    # The first segment is complete and the second half done; the rest is a hole
+    write_partial(tmp_path, bounds, [bounds[1], bounds[1] // 2, 4096, 0])
+
+    assert download(tmp_path, base + '/v.mp4', 1) == DATA
+    assert ranges(handler) == [f'bytes={bounds[1] + bounds[1] // 2}-']
+    assert sorted(os.listdir(tmp_path)) == ['clip.mp4']
+
+
+def test_segmented_attempt_takes_over_a_single_connection_part(tmp_path, media):
+    base, handler = media(DATA)
+    (tmp_path / 'clip.mp4.part').write_bytes(DATA[:300 * 1024])
+
+    assert download(tmp_path, base + '/v.mp4', 4) == DATA
+    starts = sorted(int(r.split('=')[1].split('-')[0]) for r in ranges(handler))
+    # Segment 0 (0-256 KiB) is already done; segment 1 continues at 300 KiB
+    assert starts == [300 * 1024, 512 * 1024, 768 * 1024]
+
+
+def test_hls_fragments_over_several_connections(tmp_path, media):
+    base, _ = media(DATA)
+
+    assert download(tmp_path, base + '/v.m3u8', 4, protocol='m3u8_native') == DATA
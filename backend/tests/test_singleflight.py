@@ -0,0 +1,91 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import SingleFlight
+
+N = 8
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def extract():
+        calls.append(1)
+        release.wait(5)
+        return {'id': 'abc'}
+
+    with ThreadPoolExecutor(N) as pool:
+        futures = [pool.submit(flight.do, 'url', extract) for _ in range(N)]
+        wait_for(lambda: flight.coalesced == N - 1)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.in_flight() == 0
+
+
+def test_concurrent_callers_share_the_error():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def extract():
+        calls.append(1)
+        release.wait(5)
+        raise ValueError('private video')
+
+    with ThreadPoolExecutor(N) as pool:
+        futures = [pool.submit(flight.do, 'url', extract) for _ in range(N)]
+        wait_for(lambda: flight.coalesced == N - 1)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError, match='private video'):
+                future.result()
+
+    assert len(calls) == 1
+
+
+def test_video_info_requests_share_one_extraction(monkeypatch):
+    import yt_dlp
+    import app
+
+    calls = []
+    release = threading.Event()
+
+    def stub_extract_info(self, url, download=False, **kwargs):
+        calls.append(url)
+        release.wait(5)
+        return {'id': 'abc', 'title': 'Stub', 'extractor': 'generic', 'extractor_key': 'Generic',
+                'webpage_url': url,
+                'formats': [{'format_id': '18', 'url': 'https://cdn.example.com/v.mp4', 'ext': 'mp4',
+                             'protocol': 'https', 'vcodec': 'avc1', 'acodec': 'mp4a', 'height': 360}]}
+
+    monkeypatch.setattr(yt_dlp.YoutubeDL, 'extract_info', stub_extract_info)
+    url = 'https://example.com/videos/singleflight'
+    coalesced = app.inflight.coalesced
+
+    def post():
+        return app.app.test_client().post('/api/video-info', json={'url': url})
+
+    with ThreadPoolExecutor(N) as pool:
+        futures = [pool.submit(post) for _ in range(N)]
+        wait_for(lambda: app.inflight.coalesced - coalesced == N - 1)
+        release.set()
+        responses = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    assert [r.status_code for r in responses] == [200] * N
+    assert {r.get_json()['title'] for r in responses} == {'Stub'}
@@ -0,0 +1,42 @@
+import threading
+import time
+
+from store import SQLiteStore, open_store
+
+
+def test_values_round_trip_per_namespace(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'state.db'))
+    store.set('metadata', 'k', {'title': 'A', 'formats': [1, 2]})
+    store.set('jobs', 'k', 'other namespace')
+
+    assert store.get('metadata', 'k')[0] == {'title': 'A', 'formats': [1, 2]}
+    assert store.items('jobs') == [('k', 'other namespace')]
+    store.delete('metadata', 'k')
+    assert store.get('metadata', 'k') is None
+
+
+def test_entries_expire(tmp_path):
+    store = SQLiteStore(str(tmp_path / 'state.db'))
+    store.set('metadata', 'short', 1, ttl=0.05)
+    store.set('metadata', 'long', 2, ttl=60)
+    value, expires_at = store.get('metadata', 'long')
+    assert value == 2 and expires_at > time.time()
+
+    time.sleep(0.06)
+    assert store.get('metadata', 'short') is None
+    assert store.items('metadata') == [('long', 2)]
+    assert store.purge() == 1
+
+
+def test_connections_see_each_others_writes(tmp_path):
+    path = str(tmp_path / 'state.db')
+    writer, reader = SQLiteStore(path), open_store(f'sqlite:{path}')
+
+    threads = [threading.Thread(target=writer.set, args=('jobs', str(i), i)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(value for _, value in reader.items('jobs')) == list(range(8))
+    assert open_store('') is None
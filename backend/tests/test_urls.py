@@ -0,0 +1,29 @@
+import pytest
+
+from utils import canonicalize_url, detect_platform
+
+
+@pytest.mark.parametrize('url, expected', [
+    ('https://www.youtube.com/watch?v=abc&si=x&t=30', 'https://youtube.com/watch?v=abc'),
+    ('https://youtu.be/abc?si=x', 'https://youtube.com/watch?v=abc'),
+    ('https://x.com/a/status/1?s=20&t=abc', 'https://twitter.com/a/status/1'),
+    ('https://old.reddit.com/r/a/comments/b/c/?context=3', 'https://reddit.com/r/a/comments/b/c'),
+    # Generic names only go on the platforms that use them for sharing
+    ('https://example.com/v.php?t=3&lang=de&utm_source=x&fbclid=1', 'https://example.com/v.php?lang=de&t=3'),
+])
+def test_canonicalize_url(url, expected):
+    assert canonicalize_url(url) == expected
+
+
+def test_malformed_url_is_left_as_is():
+    assert canonicalize_url('http://[bad') == 'http://[bad'
+    assert detect_platform('http://[bad') == 'other'
+
+
+def test_malformed_url_gets_a_json_error():
+    import app
+
+    response = app.app.test_client().post('/api/video-info', json={'url': 'http://[bad'})
+
+    assert response.status_code == 400
+    assert response.get_json()['type'] == 'extraction_failed'
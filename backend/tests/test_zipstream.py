@@ -0,0 +1,88 @@
+import io
+import os
+import struct
+import zipfile
+
+import yt_dlp
+
+from zipstream import ZipStream
+
+
+def build(entries, chunk_size=1024):
+    archive = ZipStream(chunk_size=chunk_size)
+    chunks = []
+    for name, data, tmp_path in entries:
+        if tmp_path is None:
+            chunks.extend(archive.add_bytes(name, data))
+        else:
+            path = tmp_path / name
+            path.write_bytes(data)
+            with open(path, 'rb') as f:
+                chunks.extend(archive.add_file(name, f))
+    chunks.extend(archive.close())
+    return chunks
+
+
+def test_archive_reads_back(tmp_path):
+    video = os.urandom(10_000)
+    chunks = build([('001 - a.mp4', video, tmp_path), ('errors.txt', b'002 failed\n', None)])
+
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == ['001 - a.mp4', 'errors.txt']
+        assert archive.read('001 - a.mp4') == video
+        assert all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist())
+
+
+def test_entries_are_streamed_with_data_descriptors(tmp_path):
+    video = os.urandom(10_000)
+    chunks = build([('a.mp4', video, tmp_path)], chunk_size=1024)
+
+    # Output comes a chunk at a time rather than as one archive-sized blob
+    assert max(len(chunk) for chunk in chunks) < 2048
+    data = b''.join(chunks)
+    signature, _, flags = struct.unpack('<IHH', data[:8])
+    assert signature == 0x04034b50
+    # Bit 3: sizes and CRC follow the data in a descriptor
+    assert flags & 0x08
+
+
+def test_large_entries_use_zip64(tmp_path, monkeypatch):
+    # Stand-in for files over 4 GiB
+    monkeypatch.setattr(zipfile, 'ZIP64_LIMIT', 1000)
+    video = os.urandom(5000)
+    data = b''.join(build([('big.mp4', video, tmp_path)]))
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        # Header id 1 is the ZIP64 extended information field
+        assert struct.unpack('<H', archive.getinfo('big.mp4').extra[:2]) == (0x0001,)
+        assert archive.read('big.mp4') == video
+
+
+def test_batch_download_streams_a_zip(media, monkeypatch):
+    import app
+
+    videos = {'one': os.urandom(50_000), 'two': os.urandom(70_000)}
+    bases = {name: media(data)[0] for name, data in videos.items()}
+
+    def stub_extract_info(self, url, download=False, **kwargs):
+        name = url.rsplit('/', 1)[1]
+        if name not in videos:
+            raise yt_dlp.utils.ExtractorError('Video unavailable')
+        return {'id': 'zip-' + name, 'title': name, 'extractor': 'generic', 'extractor_key': 'Generic',
+                'webpage_url': url,
+                'formats': [{'format_id': 'h264', 'url': bases[name] + '/v.mp4', 'ext': 'mp4', 'protocol': 'http',
+                             'vcodec': 'h264', 'acodec': 'aac', 'height': 360}]}
+
+    monkeypatch.setattr(yt_dlp.YoutubeDL, 'extract_info', stub_extract_info)
+    urls = [f'https://example.com/zip/{name}' for name in ('one', 'two', 'gone')]
+
+    with app.app.test_client().post('/api/download/batch', json={'urls': urls}) as response:
+        assert response.status_code == 200
+        data = response.get_data()
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        members = {name.split(' - ', 1)[-1]: archive.read(name) for name in archive.namelist()}
+    assert members['one.mp4'] == videos['one']
+    assert members['two.mp4'] == videos['two']
+    assert b'gone' in members['errors.txt']
@@ -1,9 +1,15 @@
 import os
+import re
 import logging
+import calendar
+import time
 from functools import lru_cache
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
 from flask import jsonify
 import yt_dlp
 
+from cache import TTLCache
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -34,22 +40,212 @@ YDL_OPTS = {
     },
 }
 
+# Query parameters that only track where a link was shared from, on any site
+# (utm_* as well)
+TRACKING_PARAMS = {'fbclid', 'gclid'}
+
+# Share parameters of the sites we know. Names like 's', 't' or 'lang' select
+# content on other sites, so they are only dropped for these
+PLATFORM_TRACKING_PARAMS = {
+    'youtube': {'si', 'feature', 'pp'},
+    'twitter': {'s', 't', 'ref_src', 'ref_url'},
+    'reddit': {'ref', 'context', 'share_id'},
+    'tiktok': {'share_id', 'is_from_webapp', 'sender_device', 'sender_web_id', 'web_id',
+               'is_copy_url', 'lang'},
+    'instagram': {'igshid', 'igsh', 'img_index'},
+}
+
+# Host aliases that resolve to the same content
+HOST_ALIASES = {
+    'x.com': 'twitter.com',
+    'mobile.twitter.com': 'twitter.com',
+    'mobile.x.com': 'twitter.com',
+    'old.reddit.com': 'reddit.com',
+    'new.reddit.com': 'reddit.com',
+    'm.youtube.com': 'youtube.com',
+    'music.youtube.com': 'youtube.com',
+    'm.tiktok.com': 'tiktok.com',
+    'instagr.am': 'instagram.com',
+}
+
 def normalize_url(url):
     """Normalize social media URLs."""
     if not url:
         return url
     return url.replace('x.com', 'twitter.com')
 
+@lru_cache(maxsize=4096)
+def canonicalize_url(url):
+    """Reduce a video URL to a canonical form usable as a cache key.
+
+    Lowercases the host, folds mirror domains together (x.com/twitter.com,
+    old/www reddit, youtu.be), drops tracking query parameters (and the
+    share parameters of known platforms) and fragments, and strips trailing
+    slashes.
+    """
+    if not url:
+        return url
+    url = url.strip()
+    if '://' not in url:
+        url = 'https://' + url
+
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        # Malformed (an unclosed IPv6 bracket, say): leave it for the
+        # extractor to reject rather than failing the request here
+        return url
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    host = HOST_ALIASES.get(host, host)
+    path = parts.path.rstrip('/') or '/'
+    dropped = TRACKING_PARAMS | PLATFORM_TRACKING_PARAMS.get(_host_platform(host), set())
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in dropped and not k.lower().startswith('utm_')
+    ]
+
+    if host == 'youtu.be' and path != '/':
+        query = [('v', path.lstrip('/'))]
+        host, path = 'youtube.com', '/watch'
+    elif host == 'youtube.com' and path.startswith('/shorts/'):
+        query = [('v', path.split('/')[2])]
+        path = '/watch'
+    elif host == 'youtube.com' and path == '/watch':
+        query = [(k, v) for k, v in query if k == 'v']
+
+    return urlunsplit(('https', host, path, urlencode(sorted(query)), ''))
+
+def detect_platform(url):
+    """Classify a URL as youtube/twitter/reddit/tiktok/instagram/other."""
+    try:
+        host = urlsplit(canonicalize_url(url) or '').hostname or ''
+    except ValueError:
+        return 'other'
+    return _host_platform(host)
+
+def _host_platform(host):
+    if host.endswith('youtube.com') or host == 'youtu.be':
+        return 'youtube'
+    if host.endswith('twitter.com'):
+        return 'twitter'
+    if host.endswith('reddit.com') or host == 'redd.it':
+        return 'reddit'
+    if host.endswith('tiktok.com'):
+        return 'tiktok'
+    if host.endswith('instagram.com'):
+        return 'instagram'
+    return 'other'
+
+# Substrings of yt-dlp error messages that mean a URL will keep failing the
+# same way for a while. Checked in order: "Video unavailable. This video is
+# private" is private, not unavailable. Bot checks, rate limits and Instagram's
+# "login required" are transient and deliberately absent.
+FAILURE_REASONS = (
+    ('geo_blocked', ('available in your country', 'geo restricted', 'geo-restricted',
+                     'not available from your location')),
+    ('private', ('private video', 'video is private', 'account is private', 'post is private',
+                 'members-only', 'members only')),
+    ('unavailable', ('video unavailable', 'has been removed', 'no longer available', 'does not exist',
+                     'been deleted', 'http error 404', 'http error 410')),
+    ('unsupported', ('unsupported url',)),
+)
+
+def classify_failure(error):
+    """Map an extraction error to a lasting failure reason, or None if transient."""
+    original = getattr(error, 'exc_info', None)
+    original = original[1] if original else error
+    if isinstance(original, yt_dlp.utils.GeoRestrictedError):
+        return 'geo_blocked'
+    if isinstance(original, yt_dlp.utils.UnsupportedError):
+        return 'unsupported'
+    message = str(error).lower()
+    for reason, patterns in FAILURE_REASONS:
+        if any(pattern in message for pattern in patterns):
+            return reason
+    return None
+
+# Query parameters signed CDN URLs use for their expiry time (unix seconds)
+EXPIRY_PARAMS = ('expire', 'expires', 'x-expires', 'exp', 'expiry', 'validto')
+
+def _plausible_timestamp(value):
+    # Between 2001 and 2100; anything else is not an expiry time
+    return value if 1_000_000_000 < value < 4_102_444_800 else None
+
+def parse_url_expiry(url):
+    """Unix time at which a signed media URL stops working, or None if unknown.
+
+    Understands the usual CDN schemes: expire=/x-expires=/Expires= style
+    parameters (YouTube, TikTok, CloudFront), hex ``oe=`` (Instagram and
+    Facebook CDNs), AWS SigV4 (X-Amz-Date + X-Amz-Expires), Akamai tokens
+    (``exp=`` inside hdnts/__token__) and YouTube's path-style ``/expire/<ts>/``.
+    """
+    if not url:
+        return None
+    parts = urlsplit(url)
+    query = {key.lower(): value for key, value in parse_qsl(parts.query)}
+
+    for name in EXPIRY_PARAMS:
+        value = query.get(name)
+        if value and value.isdigit():
+            stamp = int(value)
+            # Some CDNs sign with milliseconds
+            return _plausible_timestamp(stamp // 1000 if len(value) == 13 else stamp)
+
+    if query.get('oe'):
+        try:
+            return _plausible_timestamp(int(query['oe'], 16))
+        except ValueError:
+            pass
+
+    if query.get('x-amz-date') and (query.get('x-amz-expires') or '').isdigit():
+        try:
+            signed = calendar.timegm(time.strptime(query['x-amz-date'], '%Y%m%dT%H%M%SZ'))
+            return signed + int(query['x-amz-expires'])
+        except ValueError:
+            pass
+
+    for name in ('hdnts', '__token__'):
+        match = re.search(r'(?:^|~)exp=(\d{10})', query.get(name, ''))
+        if match:
+            return _plausible_timestamp(int(match.group(1)))
+
+    match = re.search(r'/expire/(\d{10})(?:/|$)', parts.path)
+    if match:
+        return _plausible_timestamp(int(match.group(1)))
+    return None
+
+def dir_size(path):
+    """Total size in bytes of the files under a directory (0 if missing)."""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
 def create_error_response(message, status_code=400):
     """Create a standardized error response."""
     logger.error(f"Error: {message}")
     return jsonify({'error': message}), status_code
 
+_info_cache = TTLCache(maxsize=256, ttl=600)
+
 def get_video_info(url):
     """Get video info using yt-dlp with caching."""
+    key = canonicalize_url(url)
+    info = _info_cache.get(key)
+    if info is not None:
+        return info
     try:
-        with yt_dlp.YoutubeDriver(YDL_OPTS) as ydl:
-            return ydl.extract_info(url, download=False)
+        with yt_dlp.YoutubeDL(YDL_OPTS) as ydl:
+            info = ydl.extract_info(url, download=False)
     except Exception as e:
         logger.error(f"Error getting video info: {str(e)}")
         return None
+    if info:
+        _info_cache.set(key, info)
+    return info
@@ -0,0 +1,137 @@
+import copy
+import queue
+import threading
+from contextlib import contextmanager
+
+import yt_dlp
+
+import segmented
+
+_MISSING = object()
+
+
+class YoutubeDLPool:
+    """Pool of pre-built YoutubeDL instances sharing one options profile.
+
+    Building a YoutubeDL sets up the extractor list, cookie jar and HTTP
+    handlers; checking an instance out of a pool skips that and reuses its
+    open connections. Per-request settings (output template, progress hooks,
+    option overrides, a Deadline) are applied on checkout and undone on return.
+    With a ``scheduler`` (ratelimit.AdaptiveScheduler), checkouts that name the
+    ``platform`` they work for have their upstream requests paced by it.
+    ``connections`` above 1 downloads HLS/DASH fragments and Range-capable
+    HTTP files over that many connections at once; any ``connections`` routes
+    HTTP downloads through segmented.SegmentedHttpFD, so a single-connection
+    attempt resumes cleanly from a multi-connection one.
+    """
+
+    def __init__(self, name, params, size=4, scheduler=None):
+        self.name = name
+        self.params = params
+        self.size = size
+        self.scheduler = scheduler
+        # LIFO so the most recently used instance (warmest connections) goes first
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def _create(self):
+        with self._lock:
+            self.created += 1
+        return yt_dlp.YoutubeDL(copy.deepcopy(self.params))
+
+    def warm(self, count=1):
+        """Pre-build up to ``count`` idle instances."""
+        for _ in range(count - self._idle.qsize()):
+            try:
+                self._idle.put_nowait(self._create())
+            except queue.Full:
+                break
+
+    @contextmanager
+    def checkout(self, outtmpl=None, progress_hooks=None, postprocessor_hooks=None, deadline=None,
+                 platform=None, connections=None, **overrides):
+        if deadline is not None:
+            deadline.check()
+        if self.scheduler is not None and platform:
+            overrides.setdefault('retry_sleep_functions', self.scheduler.retry_sleep_functions(platform))
+        if connections and connections > 1:
+            overrides.setdefault('concurrent_fragment_downloads', connections)
+        try:
+            ydl = self._idle.get_nowait()
+            with self._lock:
+                self.reused += 1
+        except queue.Empty:
+            ydl = self._create()
+
+        saved = {key: ydl.params.get(key, _MISSING) for key in overrides}
+        ydl.params.update(overrides)
+        # YoutubeDL compiles params['format'] once, when it is built
+        selector = _MISSING
+        if 'format' in overrides:
+            selector = ydl.format_selector
+            ydl.format_selector = self._build_selector(ydl, overrides['format'])
+        if outtmpl:
+            ydl.params['outtmpl'] = outtmpl
+            ydl._parse_outtmpl()
+        for hook in progress_hooks or ():
+            ydl.add_progress_hook(hook)
+        for hook in postprocessor_hooks or ():
+            ydl.add_postprocessor_hook(hook)
+        if connections:
+            ydl.dl = segmented.wrap_dl(ydl, connections)
+        # Extractors and downloaders all go through ydl.urlopen, so that is
+        # where requests get paced and where a request that ran out of time
+        # stops making new calls
+        if self.scheduler is not None and platform:
+            ydl.urlopen = self.scheduler.wrap_urlopen(ydl.urlopen, platform, deadline)
+        if deadline is not None:
+            ydl.urlopen = deadline.wrap_urlopen(
+                ydl.urlopen, overrides.get('socket_timeout') or self.params.get('socket_timeout') or 20)
+            ydl.add_progress_hook(deadline.progress_hook)
+
+        try:
+            yield ydl
+        finally:
+            self._reset(ydl, saved, selector)
+            try:
+                self._idle.put_nowait(ydl)
+            except queue.Full:
+                ydl.close()
+
+    @staticmethod
+    def _build_selector(ydl, spec):
+        """What YoutubeDL.__init__ makes of a 'format' param."""
+        if spec in (None, '-') or callable(spec):
+            return spec
+        return ydl.build_format_selector(spec)
+
+    def _reset(self, ydl, saved, selector=_MISSING):
+        """Undo per-request state so the next user gets a clean instance."""
+        for key, value in saved.items():
+            if value is _MISSING:
+                ydl.params.pop(key, None)
+            else:
+                ydl.params[key] = value
+        if selector is not _MISSING:
+            ydl.format_selector = selector
+        ydl.params['outtmpl'] = copy.deepcopy(self.params.get('outtmpl', {}))
+        ydl._parse_outtmpl()
+        # yt-dlp keeps hooks and per-run counters on private attributes
+        del ydl._progress_hooks[:]
+        del ydl._postprocessor_hooks[:]
+        ydl.__dict__.pop('urlopen', None)
+        ydl.__dict__.pop('dl', None)
+        ydl._download_retcode = 0
+        ydl._num_downloads = 0
+        ydl._playlist_urls.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'idle': self._idle.qsize(),
+                'created': self.created,
+                'reused': self.reused,
+            }
@@ -0,0 +1,73 @@
+import os
+import time
+import zipfile
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class _Sink:
+    """Write-only, non-seekable file object that collects what zipfile writes."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ZipStream:
+    """Build a ZIP archive incrementally and hand out its bytes as produced.
+
+    Entries are stored uncompressed (video is already compressed). Because the
+    output is not seekable, zipfile writes sizes and CRCs in data descriptors
+    after each entry, so the archive never has to exist as a whole in memory
+    or on disk; only about one chunk is buffered at a time.
+    """
+
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self._sink = _Sink()
+        self._zip = zipfile.ZipFile(self._sink, 'w', compression=zipfile.ZIP_STORED, allowZip64=True)
+
+    def _info(self, name, size):
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        # Lets zipfile decide up front whether the entry needs ZIP64
+        info.file_size = size
+        return info
+
+    def add_file(self, name, fileobj):
+        """Yield archive bytes while copying an open file into entry ``name``."""
+        size = os.fstat(fileobj.fileno()).st_size
+        with self._zip.open(self._info(name, size), 'w') as dest:
+            while True:
+                chunk = fileobj.read(self.chunk_size)
+                if not chunk:
+                    break
+                dest.write(chunk)
+                yield self._sink.drain()
+        yield self._sink.drain()
+
+    def add_bytes(self, name, data):
+        """Yield archive bytes for a small in-memory entry."""
+        self._zip.writestr(self._info(name, len(data)), data)
+        yield self._sink.drain()
+
+    def close(self):
+        """Yield the central directory that ends the archive."""
+        self._zip.close()
+        yield self._sink.drain()
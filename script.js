@@ -240,6 +240,39 @@ function formatDuration(seconds) {
         : `${m}:${s.toString().padStart(2, '0')}`;
 }
 
+/**
+ * Shows live progress of a backend download on the download button.
+ * Closing the returned EventSource tells the backend nobody is waiting any more.
+ * @param {string} progressId - The progress_id sent with the download request
+ * @param {HTMLElement} button - The button whose label is updated
+ * @returns {EventSource} The open progress stream
+ */
+function watchDownloadProgress(progressId, button) {
+    const phases = {
+        merging: 'Merging audio and video...',
+        remuxing: 'Converting to MP4...',
+        postprocessing: 'Finishing up...',
+        downloaded: 'Finishing up...',
+    };
+    const source = new EventSource(`${BACKEND_URL}/api/progress/${progressId}`);
+    source.addEventListener('progress', (event) => {
+        const progress = JSON.parse(event.data);
+        let label = phases[progress.phase] || 'Preparing download...';
+        if (progress.phase === 'downloading') {
+            const mb = (progress.downloaded_bytes / 1048576).toFixed(1);
+            label = progress.percent != null ? `Downloading ${progress.percent}%` : `Downloading ${mb} MB`;
+            if (progress.eta) {
+                label += ` (${formatDuration(progress.eta)} left)`;
+            }
+        }
+        button.innerHTML = `<span class="material-symbols-rounded spin">hourglass_empty</span> ${label}`;
+    });
+    source.addEventListener('done', () => source.close());
+    // No retries: the download request itself reports any failure
+    source.onerror = () => source.close();
+    return source;
+}
+
 /**
  * Displays the fetched video data (thumbnail and title) in the center preview section.
  * @param {object} videoData - The video data from our backend.
@@ -253,6 +286,8 @@ function displayVideoData(videoData) {
     
     // Store the current video URL for download
     window.currentVideoUrl = videoData.url || videoData.webpage_url || '';
+    // Proxy link for the already-resolved media file, if the backend found one
+    window.currentStreamUrl = videoData.stream_url || '';
     console.log('Setting currentVideoUrl to:', window.currentVideoUrl);
     console.log('Full videoData:', videoData);
     
@@ -373,6 +408,7 @@ function clearVideoPreview() {
     
     // Clear the current video URL
     window.currentVideoUrl = '';
+    window.currentStreamUrl = '';
 }
 
 /**
@@ -505,6 +541,7 @@ async function handleDownload() {
     const originalHTML = downloadButton.innerHTML;
     downloadButton.disabled = true;
     downloadButton.innerHTML = '<span class="material-symbols-rounded spin">hourglass_empty</span> Preparing...';
+    let progressSource = null;
     
     try {
         // Check if it's a TikTok URL
@@ -528,15 +565,32 @@ async function handleDownload() {
             console.log('Processing Reddit URL:', processedUrl);
         }
         
-        // Start the download
-        console.log('Sending download request to backend for URL:', processedUrl);
-        const response = await fetch(`${BACKEND_URL}${endpoint}`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({ url: processedUrl })
-        });
+        // Videos we've already looked up can be fetched straight from the
+        // resolved media URL; fall back to a full download if the link expired
+        let response = null;
+        if (window.currentStreamUrl) {
+            console.log('Fetching resolved stream:', window.currentStreamUrl);
+            response = await fetch(`${BACKEND_URL}${window.currentStreamUrl}`);
+            if (!response.ok) {
+                console.warn(`Stream link failed (${response.status}), falling back to ${endpoint}`);
+                window.currentStreamUrl = '';
+                response = null;
+            }
+        }
+        
+        // Start the download, following its progress over SSE
+        if (!response) {
+            console.log('Sending download request to backend for URL:', processedUrl);
+            const progressId = crypto.randomUUID();
+            progressSource = watchDownloadProgress(progressId, downloadButton);
+            response = await fetch(`${BACKEND_URL}${endpoint}`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ url: processedUrl, progress_id: progressId })
+            });
+        }
 
         if (!response.ok) {
             let errorData = {};
@@ -602,6 +656,9 @@ async function handleDownload() {
         const errorMessage = error.message || 'An unknown error occurred';
         alert(`❌ Download Failed\n\n${errorMessage}\n\nPlease try again or contact support if the problem persists.`);
     } finally {
+        if (progressSource) {
+            progressSource.close();
+        }
         // Reset button state
         if (downloadButton) {
             downloadButton.disabled = false;